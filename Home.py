@@ -1,11 +1,27 @@
 import streamlit as st
 import os
+import json
+import time
+import uuid
 import streamlit.components.v1 as components
-from elevenlabs_handler import get_latest_conversation
+from conversation_poller import POLL_MAX_INTERVAL, POLL_TIMEOUT
+from conversation_tracker import SESSION_VARIABLE, get_shared_poller
+from metrics import set_labels
+from scenarios import get_scenario, selectable_scenarios
+from session_store import SESSION_HISTORY_ENABLED, session_store
 from streamlit_autorefresh import st_autorefresh
+from webhook_receiver import start_webhook_receiver
+from config import get_setting
 
 AGENT_ID = st.secrets["AGENT_ID"]
 
+# With the post-call webhook, polling is only a slow fallback
+WEBHOOKS_ENABLED = start_webhook_receiver()
+WEBHOOK_FALLBACK_POLL_SECONDS = get_setting("WEBHOOK_FALLBACK_POLL_SECONDS", 30.0, cast=float)
+# How often a session rereads its call from the tracker; rereads make no API calls, so the
+# webhook's result shows up promptly while fetches stay on the slow fallback schedule
+WEBHOOK_RERUN_SECONDS = get_setting("WEBHOOK_RERUN_SECONDS", 2.0, cast=float)
+
 # Set page config
 st.set_page_config(
     page_title="Voice Role-Play Trainer",
@@ -108,15 +124,59 @@ for key, default in {
     "scenario_selected": False,
     "conversation_started": False,
     "conversation_finished": False,
-    "messages_appended": False
+    "messages_appended": False,
+    "watch_started_at": None,
+    "latest_conversation": None,
+    "session_id": None,
+    "transcript_cursor": 0,
+    "transcript_html": "",
+    "live_turn": None,
+    "trainee": "",
+    "history_id": None
 }.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
-# Scenario intro message
-scenario_intros = {
-    "Timing the Market": "Hi, yeah, I just got a note from my lawyer that we're closing in March, and honestly, I'm kind of stressing because I still need to sell my townhouse. But with how slow the market's been lately… I don't know if it's even a good time to list."
-}
+if st.session_state.session_id is None:
+    st.session_state.session_id = uuid.uuid4().hex
+
+def bubble_html(message):
+    """Return the chat bubble markup for a message dict."""
+    if message["role"] == "user":
+        return f'<div class="user-bubble"><strong>👤</strong> {message["content"]}</div>'
+    return f'<div class="assistant-bubble"><strong>🤖</strong> {message["content"]}</div>'
+
+def append_turns(transcript):
+    """
+    Append the transcript turns that have not been added yet.
+
+    Only turns past `transcript_cursor` are processed, and their bubbles are
+    appended to the prebuilt transcript HTML, so each refresh costs as much as
+    the new turns rather than the whole conversation.
+
+    Args:
+        transcript (list): Transcript items of the conversation (role, message).
+    """
+    first_position = len(st.session_state.conversation)
+    for item in transcript[st.session_state.transcript_cursor:]:
+        if not item.message or item.message.strip() == "":
+            continue
+        role = "assistant" if item.role == "agent" else "user"
+        message = {"role": role, "content": item.message}
+        st.session_state.messages.append(message)
+        st.session_state.conversation.append({
+            "role": role,
+            "content": item.message,
+            # Turn start times give the speaking pace on the Evaluation page
+            "time_in_call_secs": getattr(item, "time_in_call_secs", None)
+        })
+        st.session_state.transcript_html += bubble_html(message)
+    st.session_state.transcript_cursor = max(st.session_state.transcript_cursor, len(transcript))
+
+    # Queued for the background writer, so the run doesn't wait on the disk
+    if st.session_state.history_id:
+        session_store.add_turns(st.session_state.history_id, first_position,
+                                st.session_state.conversation[first_position:])
 
 # Sidebar layout
 with st.sidebar:
@@ -124,14 +184,19 @@ with st.sidebar:
     st.image("https://img.icons8.com/fluency/96/000000/microphone.png", width=80)
 
     st.markdown("### Conversation Settings")
+    # Not a keyed widget, so the name survives visits to other pages
+    st.session_state.trainee = st.text_input("Your Name", value=st.session_state.trainee).strip()
     st.session_state.scenario = st.selectbox(
         "Scenario",
-        ["Select Scenario", "Timing the Market"]
+        ["Select Scenario"] + selectable_scenarios()
     )
 
     if st.button("Evaluate"):
         st.switch_page("pages/Evaluation.py")
 
+    if SESSION_HISTORY_ENABLED and st.button("History"):
+        st.switch_page("pages/History.py")
+
     st.markdown("---")
     st.markdown("### About")
     st.markdown("""
@@ -161,46 +226,84 @@ if st.session_state.scenario != "Select Scenario":
 if st.session_state.previous_scenario != "Select Scenario":
     st.session_state.scenario = st.session_state.previous_scenario
 
+# Label timing spans recorded during this run with the session and scenario
+set_labels(session=st.session_state.session_id, scenario=st.session_state.scenario)
+
 # Conversation logic
 if st.session_state.scenario_selected:
-    intro_msg = scenario_intros.get(st.session_state.scenario, None)
+    intro_msg = get_scenario(st.session_state.scenario).intro
 
+    # The widget tags the call with this session's id, so the call can be told apart from other trainees'
+    dynamic_variables = json.dumps({SESSION_VARIABLE: st.session_state.session_id})
     html_code = f"""
     <div style="position: fixed; bottom: 20px; left: 63%; transform: translateX(-50%); z-index: 9999;">
-        <elevenlabs-convai agent-id="{AGENT_ID}"></elevenlabs-convai>
+        <elevenlabs-convai agent-id="{AGENT_ID}" dynamic-variables='{dynamic_variables}'></elevenlabs-convai>
     </div>
     <script src="https://elevenlabs.io/convai-widget/index.js" async type="text/javascript"></script>
     """
     components.html(html_code, height=180)
 
-    if intro_msg:
-        st.session_state.conversation = []
+    if not st.session_state.conversation_finished:
+        if intro_msg and st.session_state.transcript_cursor == 0:
+            st.session_state.conversation = []
 
-    while True:
-        latest_conversation = get_latest_conversation()
+        # One background poller per process follows every session's call; this run only
+        # reads the latest state of this session's call and schedules a rerun for the next check.
+        tracker = get_shared_poller(WEBHOOK_FALLBACK_POLL_SECONDS if WEBHOOKS_ENABLED else POLL_MAX_INTERVAL)
+        if st.session_state.watch_started_at is None:
+            st.session_state.watch_started_at = time.time()
+        tracker.watch(st.session_state.session_id, since=st.session_state.watch_started_at)
+        latest_conversation = tracker.get(st.session_state.session_id)
 
-        if latest_conversation.status == "in-progress":
-            st.session_state.conversation_started = True
+        st.session_state.latest_conversation = latest_conversation
+        status = getattr(latest_conversation, "status", None)
 
-        if st.session_state.conversation_started and latest_conversation.status == "done":
+        # Only this session's call is ever returned, so a call that is already over counts too
+        if status in ("in-progress", "done"):
+            st.session_state.conversation_started = True
+            if SESSION_HISTORY_ENABLED and st.session_state.history_id is None:
+                st.session_state.history_id = uuid.uuid4().hex
+                metadata = getattr(latest_conversation, "metadata", None)
+                session_store.start_session(st.session_state.history_id, st.session_state.scenario,
+                                            trainee=st.session_state.trainee,
+                                            started_at=getattr(metadata, "start_time_unix_secs", None))
+
+        if status == "in-progress":
+            # Show turns as they happen; the newest one may still change, so it isn't stored yet
+            transcript = latest_conversation.transcript or []
+            append_turns(transcript[:-1])
+            latest_turn = transcript[-1] if transcript else None
+            st.session_state.live_turn = None
+            if latest_turn is not None and latest_turn.message and latest_turn.message.strip():
+                role = "assistant" if latest_turn.role == "agent" else "user"
+                st.session_state.live_turn = {"role": role, "content": latest_turn.message}
+
+        if status == "done":
             st.session_state.conversation_finished = True
-            break
-
-# Fix: Avoid appending empty/None messages
+            tracker.unwatch(st.session_state.session_id)
+            if st.session_state.history_id:
+                session_store.finish_session(
+                    st.session_state.history_id,
+                    conversation_id=latest_conversation.conversation_id,
+                    duration_secs=getattr(getattr(latest_conversation, "metadata", None), "call_duration_secs", None)
+                )
+        elif time.time() - st.session_state.watch_started_at > POLL_TIMEOUT:
+            st.warning("Timed out waiting for the conversation to finish. Reset the conversation to try again.")
+        else:
+            next_check = tracker.seconds_until_next_poll(st.session_state.session_id)
+            if WEBHOOKS_ENABLED:
+                next_check = min(next_check, WEBHOOK_RERUN_SECONDS)
+            st_autorefresh(interval=max(250, int(next_check * 1000)), key="conversation_poll")
+
+# Add the turns that weren't shown live
 if st.session_state.conversation_finished and not st.session_state.messages_appended:
-    for item in latest_conversation.transcript:
-        if not item.message or item.message.strip() == "":
-            continue
-        role = "assistant" if item.role == "agent" else "user"
-        st.session_state.messages.append({"role": role, "content": item.message})
-        st.session_state.conversation.append({
-            "role": "system" if role == "assistant" else "user",
-            "content": item.message
-        })
+    latest_conversation = st.session_state.latest_conversation
+    append_turns(latest_conversation.transcript)
+    st.session_state.live_turn = None
     st.session_state.messages_appended = True
 
 # Display chat and reset button only after conversation starts
-if st.session_state.messages:
+if st.session_state.messages or st.session_state.live_turn:
     with st.container():
         st.markdown("### 💬 Conversation")
 
@@ -210,13 +313,19 @@ if st.session_state.messages:
             st.session_state.conversation_started = False
             st.session_state.conversation_finished = False
             st.session_state.messages_appended = False
+            get_shared_poller().unwatch(st.session_state.session_id)
+            st.session_state.watch_started_at = None
+            st.session_state.latest_conversation = None
+            st.session_state.transcript_cursor = 0
+            st.session_state.transcript_html = ""
+            st.session_state.live_turn = None
+            st.session_state.history_id = None
             st.session_state.previous_scenario = None
             st.session_state.scenario = "Select Scenario"
             st.session_state.scenario_selected = False
             count = st_autorefresh(interval=2000, limit=1, key="fizzbuzzcounter")
 
-        for message in st.session_state.messages:
-            if message["role"] == "user":
-                st.markdown(f'<div class="user-bubble"><strong>👤</strong> {message["content"]}</div>', unsafe_allow_html=True)
-            else:
-                st.markdown(f'<div class="assistant-bubble"><strong>🤖</strong> {message["content"]}</div>', unsafe_allow_html=True)
+        # One element for the settled turns, one for the turn still in progress
+        st.markdown(st.session_state.transcript_html, unsafe_allow_html=True)
+        if st.session_state.live_turn:
+            st.markdown(bubble_html(st.session_state.live_turn), unsafe_allow_html=True)
@@ -1,155 +1,432 @@
 import os
-import tempfile
 import pyaudio
 import wave
 import uuid
 import time
 import threading
+import queue
+import numpy as np
 from faster_whisper import WhisperModel
-from elevenlabs.client import ElevenLabs
+from elevenlabs_handler import get_client
+from media_server import MEDIA_SERVER_PUBLIC_URL, register_stream
+from tts_cache import TTSCache, TTS_CACHE_ENABLED, tts_cache
 import streamlit as st
 import base64
+from config import get_setting
+from metrics import span, timed_iter
+from vad import VAD_ENABLED, EndpointDetector, prepare_for_transcription
+from transcription_service import WHISPER_SERVICE_ADDRESS, WHISPER_SERVICE_FALLBACK, ServiceBusy, transcribe_remote
+from whisper_calibration import WHISPER_CALIBRATE_ON_STARTUP, calibrated_defaults, ensure_calibrated
 
-def load_model():
+# Unset model options come from this host's saved calibration, then the defaults below
+WHISPER_MODEL_SIZE = get_setting("WHISPER_MODEL_SIZE")
+WHISPER_DEVICE = get_setting("WHISPER_DEVICE", "cpu")
+WHISPER_COMPUTE_TYPE = get_setting("WHISPER_COMPUTE_TYPE")
+WHISPER_CPU_THREADS = get_setting("WHISPER_CPU_THREADS", cast=int)
+# Number of transcriptions the shared model may run in parallel across sessions
+WHISPER_NUM_WORKERS = get_setting("WHISPER_NUM_WORKERS", 2, cast=int)
+WHISPER_PRELOAD = get_setting("WHISPER_PRELOAD", True, cast=bool)
+
+# Streaming transcription: how often to re-decode, and what counts as the end of speech
+STREAM_STEP_SECONDS = get_setting("STREAM_STEP_SECONDS", 0.5, cast=float)
+STREAM_SILENCE_SECONDS = get_setting("STREAM_SILENCE_SECONDS", 0.4, cast=float)
+STREAM_SILENCE_THRESHOLD = get_setting("STREAM_SILENCE_THRESHOLD", 0.01, cast=float)
+STREAM_MAX_WINDOW_SECONDS = get_setting("STREAM_MAX_WINDOW_SECONDS", 10.0, cast=float)
+
+# Each recorder keeps at most this many seconds in its preallocated ring buffer
+RECORDING_MAX_SECONDS = get_setting("RECORDING_MAX_SECONDS", 120.0, cast=float)
+# If set, every recording is also written to this directory as a WAV file for debugging
+AUDIO_DEBUG_DIR = get_setting("AUDIO_DEBUG_DIR")
+
+TTS_VOICE_ID = get_setting("TTS_VOICE_ID", "JBFqnCBsd6RMkjVDRZzb")
+TTS_MODEL_ID = get_setting("TTS_MODEL_ID", "eleven_multilingual_v2")
+# e.g. "mp3_22050_32" or "opus_48000_32" for a much smaller stream
+TTS_OUTPUT_FORMAT = get_setting("TTS_OUTPUT_FORMAT", "mp3_44100_128")
+# Stream TTS through the local media server instead of embedding a data URI; only
+# on by default once the browser has an address for the server
+TTS_STREAMING = get_setting("TTS_STREAMING", bool(MEDIA_SERVER_PUBLIC_URL), cast=bool)
+
+# Process-wide model registry: one loaded model per configuration
+_models = {}
+_model_stats = {}
+_models_lock = threading.Lock()
+
+def _resident_memory_mb():
+    """Return the resident memory of this process in MB, or None if unavailable."""
     try:
-        model = WhisperModel("small", device="cpu", compute_type="int8")
-        return model
-    except Exception as e:
-        print(f"Error loading Whisper model: {e}")
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except Exception:
         return None
-    
+
+def model_settings():
+    """
+    Resolve the Whisper model options for this host.
+
+    Explicit settings win, then the saved calibration (see whisper_calibration.py),
+    then small/int8 with CTranslate2's default thread count.
+
+    Returns:
+        dict: model_size, device, compute_type and cpu_threads.
+    """
+    calibrated = calibrated_defaults(WHISPER_DEVICE)
+    return {
+        "model_size": WHISPER_MODEL_SIZE or calibrated.get("model_size", "small"),
+        "device": WHISPER_DEVICE,
+        "compute_type": WHISPER_COMPUTE_TYPE or calibrated.get("compute_type", "int8"),
+        "cpu_threads": WHISPER_CPU_THREADS if WHISPER_CPU_THREADS is not None else calibrated.get("cpu_threads", 0)
+    }
+
+def load_model(model_size=None, device=None, compute_type=None):
+    """
+    Return the shared Whisper model for the given configuration, loading it on first use.
+
+    Every session gets the same instance; the model is created with
+    `WHISPER_NUM_WORKERS` workers so several sessions can transcribe at once.
+
+    Args:
+        model_size (str, optional): Whisper model size. Defaults to `model_settings()`.
+        device (str, optional): Inference device. Defaults to WHISPER_DEVICE.
+        compute_type (str, optional): CTranslate2 compute type. Defaults to `model_settings()`.
+
+    Returns:
+        WhisperModel: The loaded model, or None if loading failed.
+    """
+    settings = model_settings()
+    key = (model_size or settings["model_size"], device or settings["device"], compute_type or settings["compute_type"])
+
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        size, device, compute_type = key
+        memory_before = _resident_memory_mb()
+        start = time.perf_counter()
+        try:
+            with span("model_load", model=size, device=device, compute_type=compute_type):
+                model = WhisperModel(
+                    size,
+                    device=device,
+                    compute_type=compute_type,
+                    cpu_threads=settings["cpu_threads"],
+                    num_workers=WHISPER_NUM_WORKERS
+                )
+        except Exception as e:
+            print(f"Error loading Whisper model: {e}")
+            return None
+
+        load_seconds = time.perf_counter() - start
+        memory_after = _resident_memory_mb()
+        _model_stats[key] = {
+            "model_size": size,
+            "device": device,
+            "compute_type": compute_type,
+            "cpu_threads": settings["cpu_threads"],
+            "load_seconds": load_seconds,
+            "resident_memory_mb": memory_after,
+            "model_memory_mb": memory_after - memory_before if memory_before is not None and memory_after is not None else None
+        }
+        print(f"Loaded Whisper model '{size}' ({device}/{compute_type}) in {load_seconds:.2f}s, "
+              f"resident memory {memory_after or 0:.0f} MB")
+
+        _models[key] = model
+        return model
+
+def preload_model(background=True):
+    """
+    Load the configured Whisper model ahead of the first transcription.
+
+    With WHISPER_CALIBRATE_ON_STARTUP, an uncalibrated host is calibrated first
+    so the model that gets loaded is the one chosen for it.
+
+    Args:
+        background (bool): If True, load in a daemon thread and return immediately.
+    """
+    def preload():
+        if WHISPER_CALIBRATE_ON_STARTUP:
+            ensure_calibrated(WHISPER_DEVICE)
+        load_model()
+
+    if background:
+        threading.Thread(target=preload, daemon=True).start()
+    else:
+        preload()
+
+def get_model_stats():
+    """
+    Report load time and memory for every model in the registry.
+
+    Returns:
+        list: One dict per loaded model configuration.
+    """
+    with _models_lock:
+        return [dict(stats) for stats in _model_stats.values()]
+
 def load_ElevenLabs_client():
     try:
-        client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
-        return client
+        return get_client()
     except Exception as e:
         print(f"Error loading ElevenLabs client: {e}")
         return None
 
-def record_audio(duration=None, sample_rate=16000, start_only=False, stop_recording=None):
+def _write_debug_wav(samples, sample_rate):
+    """Write a recording to AUDIO_DEBUG_DIR for inspection and return its path."""
+    os.makedirs(AUDIO_DEBUG_DIR, exist_ok=True)
+    audio_file = os.path.join(AUDIO_DEBUG_DIR, f"recording_{uuid.uuid4()}.wav")
+
+    wf = wave.open(audio_file, 'wb')
+    wf.setnchannels(1)
+    wf.setsampwidth(2)
+    wf.setframerate(sample_rate)
+    wf.writeframes(samples.tobytes())
+    wf.close()
+
+    return audio_file
+
+class Recorder:
+    """
+    Records the microphone into a preallocated ring buffer owned by this recorder.
+
+    Each recorder has its own PyAudio stream, buffer and thread, so any number can
+    record at once in one process. The buffer holds `max_seconds` of audio; a longer
+    take keeps only the most recent `max_seconds` (or ends the recording, with
+    `stop_when_full=True`), so memory never grows with the length of a take.
+    With `auto_stop=True` the recording also ends by itself once the speaker
+    goes quiet after speaking.
+
+    Example:
+        recorder = Recorder(on_chunk=transcriber.feed)
+        recorder.start()
+        ...
+        samples = recorder.stop()
+    """
+
+    def __init__(self, sample_rate=16000, max_seconds=RECORDING_MAX_SECONDS, on_chunk=None,
+                 stop_when_full=False, auto_stop=False, frames_per_buffer=1024):
+        """
+        Args:
+            sample_rate (int): Sample rate for the audio recording.
+            max_seconds (float): Capacity of the ring buffer in seconds.
+            on_chunk (callable, optional): Called from the recording thread with each
+                int16 chunk, e.g. `StreamingTranscriber.feed`.
+            stop_when_full (bool): End the recording once the buffer is full instead of
+                overwriting the oldest audio.
+            auto_stop (bool): End the recording at the end of speech (see vad.EndpointDetector).
+            frames_per_buffer (int): Frames read from the stream at a time.
+        """
+        self.sample_rate = sample_rate
+        self.on_chunk = on_chunk
+        self.stop_when_full = stop_when_full
+        self.frames_per_buffer = frames_per_buffer
+        self.endpoint = EndpointDetector(sample_rate) if auto_stop else None
+
+        self._buffer = np.zeros(int(max_seconds * sample_rate), dtype=np.int16)
+        self._written = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.error = None
+
+    @property
+    def is_recording(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def overflowed(self):
+        """True if the take was longer than the buffer and its start was overwritten."""
+        return self._written > len(self._buffer)
+
+    @property
+    def duration(self):
+        """Seconds of audio currently held by the recorder."""
+        return min(self._written, len(self._buffer)) / self.sample_rate
+
+    def start(self, stream=None):
+        """
+        Open the microphone and start recording in a background thread.
+
+        Args:
+            stream (optional): An open input stream to record from instead of the
+                microphone, with PyAudio's `read`, `stop_stream` and `close`
+                (e.g. a clip played back by benchmark.py).
+
+        Returns:
+            Recorder: self, for chaining.
+        """
+        audio = None
+        if stream is None:
+            audio = pyaudio.PyAudio()
+            try:
+                stream = audio.open(
+                    format=pyaudio.paInt16,
+                    channels=1,
+                    rate=self.sample_rate,
+                    input=True,
+                    frames_per_buffer=self.frames_per_buffer
+                )
+            except Exception:
+                audio.terminate()
+                raise
+
+        self._thread = threading.Thread(target=self._record, args=(audio, stream), daemon=True)
+        self._thread.start()
+        return self
+
+    def _record(self, audio, stream):
+        try:
+            while not self._stop_event.is_set():
+                chunk = np.frombuffer(stream.read(self.frames_per_buffer), dtype=np.int16)
+                if not self._write(chunk):
+                    break
+                if self.on_chunk:
+                    self.on_chunk(chunk)
+                if self.endpoint is not None and self.endpoint.feed(chunk):
+                    break
+        except Exception as e:
+            print(f"Error recording audio: {e}")
+            self.error = e
+        finally:
+            stream.stop_stream()
+            stream.close()
+            if audio is not None:
+                audio.terminate()
+
+    def _write(self, chunk):
+        """Copy a chunk into the ring buffer; return False once a stop_when_full buffer is full."""
+        capacity = len(self._buffer)
+        with self._lock:
+            if self.stop_when_full:
+                chunk = chunk[:capacity - self._written]
+            elif len(chunk) > capacity:
+                chunk = chunk[-capacity:]
+
+            start = self._written % capacity
+            first = min(len(chunk), capacity - start)
+            self._buffer[start:start + first] = chunk[:first]
+            self._buffer[:len(chunk) - first] = chunk[first:]
+            self._written += len(chunk)
+            return not (self.stop_when_full and self._written >= capacity)
+
+    def samples(self):
+        """
+        Return a copy of the recorded audio in chronological order.
+
+        Returns:
+            numpy.ndarray: int16 samples (16 kHz mono by default).
+        """
+        with self._lock:
+            capacity = len(self._buffer)
+            if self._written <= capacity:
+                return self._buffer[:self._written].copy()
+            start = self._written % capacity
+            return np.concatenate((self._buffer[start:], self._buffer[:start]))
+
+    def wait(self, timeout=None):
+        """Wait for a stop_when_full or auto_stop recording to end on its own."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self, timeout=2.0):
+        """
+        Stop recording, wait for the recording thread to finish and return the audio.
+
+        Args:
+            timeout (float): Seconds to wait for the thread (one stream read at most).
+
+        Returns:
+            numpy.ndarray: The recorded int16 samples.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print("Recording thread did not stop in time; returning the audio recorded so far")
+
+        samples = self.samples()
+        if AUDIO_DEBUG_DIR:
+            _write_debug_wav(samples, self.sample_rate)
+        return samples
+
+def record_audio(duration=None, sample_rate=16000, start_only=False, stop_recording=None, on_chunk=None,
+                 auto_stop=False):
     """
     Record audio using the microphone.
+
+    Kept for existing callers; new code can use `Recorder` directly. Each call
+    with start_only=True gets its own Recorder, so concurrent sessions don't
+    share any state.
     
     Args:
         duration (int, optional): Duration in seconds to record. If None, records until stopped.
         sample_rate (int): Sample rate for the audio recording.
         start_only (bool): If True, only starts recording and returns the recorder object.
-        stop_recording (object): Recorder object to stop recording and save audio.
+        stop_recording (Recorder): Recorder object to stop recording and return the audio.
+        on_chunk (callable, optional): Called with each int16 chunk as it is recorded
+            (only used with start_only=True), e.g. `StreamingTranscriber.feed`.
+        auto_stop (bool): With start_only=True, stop by itself at the end of speech
+            (check `recorder.is_recording`, then call stop to collect the audio).
         
     Returns:
-        str: Path to the recorded audio file or recorder object if start_only=True.
+        numpy.ndarray: The recorded int16 samples, or the Recorder if start_only=True.
     """
-    global frames, is_recording, stop_recording_event
-    
     if stop_recording is not None:
-        # We're stopping an existing recording
-        stop_recording_event.set()  # Signal the recording thread to stop
-        time.sleep(0.5)  # Give it a moment to finish
-        
-        # Save the recorded audio to a file
-        temp_dir = tempfile.gettempdir()
-        audio_file = os.path.join(temp_dir, f"recording_{uuid.uuid4()}.wav")
-        
-        wf = wave.open(audio_file, 'wb')
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(sample_rate)
-        wf.writeframes(b''.join(frames))
-        wf.close()
-        
-        # Reset the global variables
-        frames = []
-        is_recording = False
-        stop_recording_event = None
-        
-        return audio_file
+        return stop_recording.stop()
     
     if start_only:
-        # Initialize PyAudio
-        p = pyaudio.PyAudio()
-        
-        # Reset globals
-        frames = []
-        is_recording = True
-        stop_recording_event = threading.Event()
-        
-        # Open stream
-        stream = p.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=sample_rate,
-            input=True,
-            frames_per_buffer=1024
-        )
-        
-        # Start recording in a separate thread
-        def record_thread():
-            global frames, is_recording
-            while is_recording and not stop_recording_event.is_set():
-                data = stream.read(1024)
-                frames.append(data)
-            
-            # Close and terminate when done
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
-        
-        # Start the recording thread
-        threading.Thread(target=record_thread).start()
-        
-        # Return a recorder object (in this case, just a dummy object as identifier)
-        return "recorder_active"
-    
-    # If we're here, it's the original fixed-duration recording method
-    # This is kept for backward compatibility but shouldn't be used in the new implementation
-    p = pyaudio.PyAudio()
-    
-    stream = p.open(
-        format=pyaudio.paInt16,
-        channels=1,
-        rate=sample_rate,
-        input=True,
-        frames_per_buffer=1024
-    )
+        return Recorder(sample_rate=sample_rate, on_chunk=on_chunk, auto_stop=auto_stop).start()
     
+    # Fixed-duration recording
     print("* Recording audio...")
-    
-    frames = []
-    for i in range(0, int(sample_rate / 1024 * duration)):
-        data = stream.read(1024)
-        frames.append(data)
-    
+    recorder = Recorder(sample_rate=sample_rate, max_seconds=duration, stop_when_full=True).start()
+    recorder.wait()
     print("* Recording complete.")
-    
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
-    
-    # Save the recorded audio to a file
-    temp_dir = tempfile.gettempdir()
-    audio_file = os.path.join(temp_dir, f"recording_{uuid.uuid4()}.wav")
-    
-    wf = wave.open(audio_file, 'wb')
-    wf.setnchannels(1)
-    wf.setsampwidth(2)
-    wf.setframerate(sample_rate)
-    wf.writeframes(b''.join(frames))
-    wf.close()
-    
-    return audio_file
+    return recorder.stop()
+
+def to_float32(samples):
+    """
+    Convert int16 PCM samples to the float32 [-1, 1] array Whisper expects.
+
+    float32 input is returned as is; int16 input is converted in a single pass.
 
-def transcribe_audio(audio_file):
+    Args:
+        samples (numpy.ndarray): int16 or float32 mono samples.
+
+    Returns:
+        numpy.ndarray: float32 samples.
     """
-    Transcribe the audio file using faster-whisper.
+    if samples.dtype == np.float32:
+        return samples
+    audio = np.empty(samples.shape, dtype=np.float32)
+    np.multiply(samples, 1.0 / 32768.0, out=audio, casting="unsafe")
+    return audio
+
+def transcribe_audio(audio):
+    """
+    Transcribe recorded audio using faster-whisper.
+
+    Args:
+        audio (numpy.ndarray | str): Samples returned by `record_audio` (16 kHz mono),
+            or the path of an audio file.
     
     Returns:
         str: Transcribed text or error/fallback message.
     """
-    if not audio_file or not os.path.exists(audio_file):
+    audio_file = audio if isinstance(audio, str) else None
+
+    if audio is None or (audio_file is not None and not os.path.exists(audio_file)) or len(audio) == 0:
         return "Sorry, I couldn't capture any audio."
 
     # Handle fallback text file (demo mode)
-    if audio_file.endswith(".txt"):
+    if audio_file and audio_file.endswith(".txt"):
         try:
             with open(audio_file, "r") as file:
                 return file.read() + " (Demo mode - microphone not available)"
@@ -157,14 +434,39 @@ def transcribe_audio(audio_file):
             print(f"Error reading fallback text file: {e}")
             return "Unable to read the fallback file. Microphone may be unavailable."
 
+    # Don't spend Whisper time on silence: trim both ends and shorten long pauses
+    if audio_file is None and VAD_ENABLED:
+        audio, vad_stats = prepare_for_transcription(audio)
+        if len(audio) == 0:
+            return "I couldn't understand the audio. Please try again."
+        print(f"VAD kept {vad_stats['speech_seconds']:.1f}s of {vad_stats['input_seconds']:.1f}s "
+              f"({vad_stats['saved_seconds']:.1f}s saved)")
+
+    # Hand the utterance to the shared worker pool if one is configured
+    if WHISPER_SERVICE_ADDRESS and audio_file is None:
+        try:
+            with span("transcription", service=True):
+                text = transcribe_remote(audio)
+            return text or "I couldn't understand the audio. Please try again."
+        except (ServiceBusy, TimeoutError) as e:
+            # A slow service is overloaded; transcribing here as well would only add to the load
+            print(f"Transcription service busy: {e}")
+            return "Transcription is busy right now. Please try again in a moment."
+        except (OSError, EOFError, RuntimeError) as e:
+            if not WHISPER_SERVICE_FALLBACK:
+                print(f"Transcription service unavailable: {e}")
+                return "Transcription is unavailable right now. Please try again in a moment."
+            print(f"Transcription service unavailable, transcribing in-process: {e}")
+
     model = load_model()
     if not model:
         return "Model failed to load. Please check system resources or model path."
 
     try:
-        print("Model loaded successfully. Transcribing audio...")
-        segments, _ = model.transcribe(audio_file)
-        full_text = " ".join(segment.text for segment in segments)
+        with span("transcription"):
+            segments, _ = model.transcribe(audio_file or to_float32(audio))
+            # Segments are decoded lazily, so join them inside the span
+            full_text = " ".join(segment.text for segment in segments)
         return full_text.strip() if full_text else "I couldn't understand the audio. Please try again."
 
     except Exception as e:
@@ -174,17 +476,239 @@ def transcribe_audio(audio_file):
     finally:
         # Clean up the audio file
         try:
-            if os.path.exists(audio_file):
+            if audio_file and os.path.exists(audio_file):
                 os.remove(audio_file)
         except Exception as cleanup_err:
             print(f"Failed to remove temporary file: {cleanup_err}")
 
-def play_audio(message):
+class StreamingTranscriber:
+    """
+    Transcribe audio incrementally while the user is still speaking.
+
+    Raw int16 chunks are pushed with `feed()` (for example straight from the
+    recording thread) and `events()` yields `("partial", text)` while the
+    utterance is in progress and `("final", text)` once text is settled.
+    Only the audio since the last settled segment is re-decoded, so the final
+    text is ready shortly after the user goes quiet.
+    """
+
+    def __init__(self, model=None, sample_rate=16000, step_seconds=STREAM_STEP_SECONDS,
+                 silence_seconds=STREAM_SILENCE_SECONDS, silence_threshold=STREAM_SILENCE_THRESHOLD,
+                 max_window_seconds=STREAM_MAX_WINDOW_SECONDS, language=None):
+        """
+        Args:
+            model (WhisperModel, optional): Model to use. Defaults to the shared registry model.
+            sample_rate (int): Sample rate of the incoming audio.
+            step_seconds (float): Amount of new audio that triggers a partial decode.
+            silence_seconds (float): Trailing silence that ends an utterance.
+            silence_threshold (float): RMS level (0-1) below which a chunk counts as silence.
+            max_window_seconds (float): Audio length after which settled segments are committed.
+            language (str, optional): Language code passed to Whisper to skip detection.
+        """
+        self.model = model
+        self.sample_rate = sample_rate
+        self.step_samples = int(step_seconds * sample_rate)
+        self.silence_samples = int(silence_seconds * sample_rate)
+        self.silence_threshold = silence_threshold
+        self.max_window_samples = int(max_window_seconds * sample_rate)
+        self.language = language
+        self._chunks = queue.Queue()
+
+    def feed(self, chunk):
+        """Queue an int16 audio chunk (bytes or a NumPy array) for transcription."""
+        self._chunks.put(chunk)
+
+    def close(self):
+        """Signal that recording has stopped; `events()` finishes after the final segment."""
+        self._chunks.put(None)
+
+    def _decode(self, audio):
+        with span("transcription_partial"):
+            segments, _ = self.model.transcribe(
+                audio,
+                language=self.language,
+                beam_size=1,
+                condition_on_previous_text=False
+            )
+            return list(segments)
+
+    def _next_chunks(self):
+        """Block for one chunk, then drain whatever else has arrived so decoding never lags."""
+        chunks = [self._chunks.get()]
+        while chunks[-1] is not None:
+            try:
+                chunks.append(self._chunks.get_nowait())
+            except queue.Empty:
+                break
+        return chunks
+
+    def events(self):
+        """
+        Yield transcription events as audio arrives.
+
+        Yields:
+            tuple: ("partial", text) for the utterance in progress, ("final", text) for settled text.
+        """
+        if self.model is None:
+            self.model = load_model()
+        if self.model is None:
+            return
+
+        window = np.empty(0, dtype=np.float32)
+        undecoded = 0
+        trailing_silence = 0
+        heard_speech = False
+        finished = False
+
+        while not finished:
+            for chunk in self._next_chunks():
+                if chunk is None:
+                    finished = True
+                    break
+                samples = to_float32(np.frombuffer(chunk, dtype=np.int16))
+                window = np.concatenate((window, samples))
+                undecoded += len(samples)
+
+                if samples.size and np.sqrt(np.mean(samples * samples)) < self.silence_threshold:
+                    trailing_silence += len(samples)
+                else:
+                    trailing_silence = 0
+                    heard_speech = True
+
+            if not heard_speech:
+                # Nothing but silence so far; don't let it pile up
+                window = window[-self.silence_samples:]
+                continue
+
+            if finished or trailing_silence >= self.silence_samples:
+                text = " ".join(segment.text.strip() for segment in self._decode(window)).strip()
+                if text:
+                    yield ("final", text)
+                window = np.empty(0, dtype=np.float32)
+                undecoded = 0
+                trailing_silence = 0
+                heard_speech = False
+                continue
+
+            if undecoded < self.step_samples:
+                continue
+
+            segments = self._decode(window)
+            undecoded = 0
+
+            # Commit everything but the last segment once the window grows long,
+            # so later decodes only cover the unsettled tail.
+            if len(segments) > 1 and len(window) >= self.max_window_samples:
+                settled = segments[:-1]
+                yield ("final", " ".join(segment.text.strip() for segment in settled).strip())
+                window = window[int(settled[-1].end * self.sample_rate):]
+                segments = segments[-1:]
+
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+            if text:
+                yield ("partial", text)
+
+def start_streaming_transcription(on_event=None, sample_rate=16000, **kwargs):
+    """
+    Start recording and transcribe the audio while it is being recorded.
+
+    Stop with `recorder.stop()` followed by `transcriber.close()`.
+
+    Args:
+        on_event (callable, optional): If given, called with each (kind, text) event
+            from a background thread instead of iterating `transcriber.events()`.
+        sample_rate (int): Sample rate for the recording.
+        **kwargs: Passed to StreamingTranscriber.
+
+    Returns:
+        tuple: (Recorder, transcriber)
+    """
+    transcriber = StreamingTranscriber(sample_rate=sample_rate, **kwargs)
+    recorder = Recorder(sample_rate=sample_rate, on_chunk=transcriber.feed).start()
+
+    if on_event:
+        def event_thread():
+            for kind, text in transcriber.events():
+                on_event(kind, text)
+        threading.Thread(target=event_thread, daemon=True).start()
+
+    return recorder, transcriber
+
+def _mime_type(output_format):
+    """Return the browser content type for an ElevenLabs output format such as "mp3_44100_128"."""
+    codec = output_format.split("_", 1)[0]
+    return {"mp3": "audio/mpeg", "opus": "audio/ogg", "wav": "audio/wav"}.get(codec, "audio/mpeg")
+
+def _render_audio(src, mime_type):
+    audio_tag = f"""
+        <audio id="hidden-audio" autoplay hidden>
+            <source src="{src}" type="{mime_type}">
+        </audio>
+        <script>
+            const audio = document.getElementById("hidden-audio");
+            audio.onended = () => {{
+                const url = new URL(window.location.href);
+                url.searchParams.set('__playback_done', '1');
+                window.location.href = url.toString();
+            }};
+        </script>
+    """
+    st.markdown(audio_tag, unsafe_allow_html=True)
+
+def synthesize_speech(elevenlabs_client, message):
+    """
+    Synthesize a message with ElevenLabs, serving repeated phrases from the TTS cache.
+
+    Args:
+        elevenlabs_client (ElevenLabs): Client used on a cache miss.
+        message (str): The text to speak.
+
+    Returns:
+        iterator: Audio chunks in TTS_OUTPUT_FORMAT.
+    """
+    cache_key = TTSCache.key(message, TTS_VOICE_ID, TTS_MODEL_ID, TTS_OUTPUT_FORMAT)
+    cached_audio = tts_cache.get(cache_key) if TTS_CACHE_ENABLED else None
+    if cached_audio is not None:
+        return iter([cached_audio])
+
+    # audio is a generator of chunks, produced while the audio is synthesized
+    audio_generator = elevenlabs_client.text_to_speech.convert(
+        text=message,
+        voice_id=TTS_VOICE_ID,
+        model_id=TTS_MODEL_ID,
+        output_format=TTS_OUTPUT_FORMAT
+    )
+    audio_generator = timed_iter("tts", audio_generator, first_stage="tts_first_chunk", characters=len(message))
+    if TTS_CACHE_ENABLED:
+        audio_generator = tts_cache.tee(cache_key, audio_generator)
+    return audio_generator
+
+def _play_chunks(audio_generator, stream):
+    mime_type = _mime_type(TTS_OUTPUT_FORMAT)
+    stream_url = register_stream(audio_generator, mime_type) if stream else None
+    if stream_url:
+        _render_audio(stream_url, mime_type)
+    else:
+        audio_bytes = b"".join(audio_generator)
+        b64_audio = base64.b64encode(audio_bytes).decode()
+        _render_audio(f"data:{mime_type};base64,{b64_audio}", mime_type)
+
+    # Show a message while audio plays
+    st.info("🔊 Playing audio... Please wait.")
+
+def play_audio(message, stream=None):
     """
     Play the audio message using ElevenLabs and increase its volume.
+
+    In streaming mode the audio element points at the local media server, which
+    forwards TTS chunks as they arrive, so playback starts on the first chunk.
+    Otherwise the whole clip is synthesized and embedded as a base64 data URI.
+    Phrases synthesized before with the same voice, model and format are served
+    from the TTS cache without calling ElevenLabs.
     
     Args:
         message (str): The message to be played.
+        stream (bool, optional): Use streaming playback. Defaults to TTS_STREAMING.
         
     Returns:
         str: A message indicating the status of the audio playback.
@@ -193,35 +717,53 @@ def play_audio(message):
     if not elevenlabs_client:
         return "ElevenLabs client failed to load."
 
+    if stream is None:
+        stream = TTS_STREAMING
+
     try:
-        print("Client loaded successfully. Generating speech...")
-
-        # audio is now a generator, so we must join all chunks into bytes
-        audio_generator = elevenlabs_client.text_to_speech.convert(
-            text=message,
-            voice_id="JBFqnCBsd6RMkjVDRZzb",
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_128"
-        )
-        audio_bytes = b"".join(audio_generator)
+        _play_chunks(synthesize_speech(elevenlabs_client, message), stream)
+    except Exception as e:
+        print(f"Error generating speech: {str(e)}")
+        return "I'm having trouble generating speech. Please try again."
 
-        b64_audio = base64.b64encode(audio_bytes).decode()
-        audio_tag = f"""
-            <audio id="hidden-audio" autoplay hidden>
-                <source src="data:audio/mp3;base64,{b64_audio}" type="audio/mp3">
-            </audio>
-            <script>
-                const audio = document.getElementById("hidden-audio");
-                audio.onended = () => {{
-                    const url = new URL(window.location.href);
-                    url.searchParams.set('__playback_done', '1');
-                    window.location.href = url.toString();
-                }};
-            </script>
-        """
-        st.markdown(audio_tag, unsafe_allow_html=True)
-        # Show a message while audio plays
-        st.info("🔊 Playing audio... Please wait.")
+def play_audio_stream(sentences, stream=None):
+    """
+    Speak a reply sentence by sentence while it is still being generated.
+
+    Each sentence is sent to TTS as soon as it is complete and its audio is
+    appended to a single playback stream, so the persona starts talking after
+    the first sentence. Use an MP3 TTS_OUTPUT_FORMAT, since MP3 streams can be
+    concatenated.
+
+    Example:
+        reply = []
+        sentences = split_sentences(stream_openai_response(user_input, history, scenario))
+        play_audio_stream(reply.append(s) or s for s in sentences)
+
+    Args:
+        sentences (iterable): Speakable chunks, e.g. from `openai_handler.split_sentences`.
+        stream (bool, optional): Use streaming playback. Defaults to TTS_STREAMING.
+
+    Returns:
+        str: A message indicating the status of the audio playback.
+    """
+    elevenlabs_client = load_ElevenLabs_client()
+    if not elevenlabs_client:
+        return "ElevenLabs client failed to load."
+
+    if stream is None:
+        stream = TTS_STREAMING
+
+    def speech_chunks():
+        for sentence in sentences:
+            yield from synthesize_speech(elevenlabs_client, sentence)
+
+    try:
+        _play_chunks(speech_chunks(), stream)
     except Exception as e:
         print(f"Error generating speech: {str(e)}")
-        return "I'm having trouble generating speech. Please try again."
\ No newline at end of file
+        return "I'm having trouble generating speech. Please try again."
+
+# With the transcription service the model lives in its workers, not in this process
+if WHISPER_PRELOAD and not WHISPER_SERVICE_ADDRESS:
+    preload_model()
@@ -0,0 +1,254 @@
+"""
+Grade a backlog of role-play transcripts from the command line.
+
+Usage:
+    python batch_evaluate.py transcripts.jsonl --output results.jsonl
+    python batch_evaluate.py transcripts/ --output results.jsonl --concurrency 16 --tokens-per-minute 200000
+
+Input is a JSONL file (one transcript per line) or a directory of .json/.jsonl
+files. A transcript is either a list of {"role", "content"} messages or an
+object {"id": ..., "conversation": [...]}. Results are appended to the output
+JSONL file as they finish, together with the speech metrics measured locally
+for every transcript; rerunning the same command resumes where it stopped.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from openai import APIConnectionError, AsyncOpenAI
+from conversation_poller import backoff_delay
+from evaluation_store import evaluation_store, transcript_hash
+from metrics import span
+from speech_metrics import compute_speech_metrics_batch
+from openai_handler import (
+    EVALUATION_MODEL,
+    EVALUATION_RESPONSE_FORMAT,
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    RUBRIC_VERSION,
+    SUMMARY_MODEL,
+    build_evaluation_messages,
+    parse_evaluation,
+    summarize_turns
+)
+from token_counter import count_message_tokens, count_tokens
+
+# Expected completion size, reserved from the token budget before each request
+EXPECTED_OUTPUT_TOKENS = 800
+# The same for each summary of the middle of a long session, plus its instructions
+EXPECTED_SUMMARY_TOKENS = 300
+
+class TokenRateLimiter:
+    """Token bucket that limits how many tokens per minute are sent to the API."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens):
+        """Wait until `tokens` can be spent without exceeding the rate."""
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+def _conversation(record):
+    conversation = record["conversation"] if isinstance(record, dict) else record
+    if not isinstance(conversation, list) or not all(
+            isinstance(message, dict) and "role" in message and isinstance(message.get("content") or "", str)
+            for message in conversation):
+        raise TypeError("expected a list of {\"role\", \"content\"} messages")
+    return conversation
+
+def _read_record(read, transcript_id):
+    # One malformed record is reported on its own instead of stopping the whole run
+    try:
+        record = read()
+        if isinstance(record, dict):
+            transcript_id = str(record.get("id", transcript_id))
+        return transcript_id, _conversation(record), None
+    except KeyError as e:
+        return transcript_id, None, f"Malformed transcript: missing {e}"
+    except (json.JSONDecodeError, TypeError) as e:
+        return transcript_id, None, f"Malformed transcript: {e}"
+
+def read_transcripts(path):
+    """
+    Read transcripts from a JSONL file or a directory of .json/.jsonl files.
+
+    Args:
+        path (str): File or directory.
+
+    Yields:
+        tuple: (transcript_id, conversation, error); conversation is None and error
+            says why when a record can't be read.
+    """
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "*.json")) + glob.glob(os.path.join(path, "*.jsonl")))
+    else:
+        files = [path]
+
+    for file_path in files:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        with open(file_path, encoding="utf-8") as file:
+            if file_path.endswith(".json"):
+                yield _read_record(lambda: json.load(file), name)
+                continue
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield _read_record(lambda: json.loads(line), f"{name}:{line_number}")
+
+def read_checkpoint(output_path):
+    """Return the ids already graded successfully in an existing output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run
+                continue
+            if "error" not in record.get("result", {"error": None}):
+                done.add(record["id"])
+    return done
+
+def is_retryable(error):
+    """Return True for rate limits, server errors and dropped connections; anything else fails at once."""
+    if isinstance(error, APIConnectionError):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+async def evaluate_one(client, limiter, semaphore, conversation, speech_metrics, max_retries):
+    """Grade one conversation, retrying rate-limit and server errors with backoff."""
+    loop = asyncio.get_running_loop()
+
+    def summarize(summary, turns):
+        # Runs in a worker thread; summaries count against the token budget and are retried like evaluations
+        tokens = (count_message_tokens(turns, SUMMARY_MODEL) + count_tokens(summary, SUMMARY_MODEL)
+                  + EXPECTED_SUMMARY_TOKENS)
+        for attempt in range(max_retries + 1):
+            asyncio.run_coroutine_threadsafe(limiter.acquire(tokens), loop).result()
+            try:
+                return summarize_turns(summary, turns)
+            except Exception as e:
+                if attempt == max_retries or not is_retryable(e):
+                    raise
+                time.sleep(backoff_delay(attempt))
+
+    async with semaphore:
+        # Summarizing a very long session makes blocking calls, so it runs off the event loop
+        try:
+            messages = await asyncio.to_thread(build_evaluation_messages, conversation, speech_metrics, summarize,
+                                               strict=True)
+        except Exception as e:
+            return {"error": f"Error summarizing transcript: {e}"}
+        tokens = count_message_tokens(messages, EVALUATION_MODEL) + EXPECTED_OUTPUT_TOKENS
+
+        for attempt in range(max_retries + 1):
+            await limiter.acquire(tokens)
+            try:
+                with span("evaluation", model=EVALUATION_MODEL, attempt=attempt):
+                    response = await client.chat.completions.create(
+                        model=EVALUATION_MODEL,
+                        messages=messages,
+                        response_format=EVALUATION_RESPONSE_FORMAT,
+                        temperature=0
+                    )
+                return parse_evaluation(response.choices[0].message.content, speech_metrics)
+            except Exception as e:
+                # A reply that fails validation would fail the same way again
+                if attempt == max_retries or not is_retryable(e):
+                    return {"error": str(e)}
+                await asyncio.sleep(backoff_delay(attempt))
+
+async def run(args):
+    client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+    limiter = TokenRateLimiter(args.tokens_per_minute)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    done = read_checkpoint(args.output)
+
+    counts = {"graded": 0, "stored": 0, "skipped": 0, "failed": 0}
+    started_at = time.monotonic()
+
+    with open(args.output, "a", encoding="utf-8") as output:
+        def write(transcript_id, key, speech_metrics, result, source):
+            output.write(json.dumps({"id": transcript_id, "transcript_hash": key, "source": source,
+                                     "speech_metrics": speech_metrics, "result": result}, ensure_ascii=False) + "\n")
+            output.flush()
+
+        async def handle(transcript_id, conversation, speech_metrics):
+            key = transcript_hash(conversation, RUBRIC_VERSION)
+            result = None if args.no_store else evaluation_store.get(key)
+            if result is not None:
+                counts["stored"] += 1
+                write(transcript_id, key, speech_metrics, result, "store")
+                return
+
+            result = await evaluate_one(client, limiter, semaphore, conversation, speech_metrics, args.max_retries)
+            if "error" in result:
+                counts["failed"] += 1
+            else:
+                counts["graded"] += 1
+                if not args.no_store:
+                    evaluation_store.put(key, RUBRIC_VERSION, result)
+            write(transcript_id, key, speech_metrics, result, "model")
+
+            finished = counts["graded"] + counts["stored"] + counts["failed"]
+            if finished % 10 == 0:
+                print(f"{finished} done ({counts['failed']} failed), {time.monotonic() - started_at:.0f}s elapsed",
+                      file=sys.stderr)
+
+        pending = []
+        for transcript_id, conversation, error in read_transcripts(args.input):
+            if transcript_id in done:
+                counts["skipped"] += 1
+                continue
+            if error is not None:
+                counts["failed"] += 1
+                output.write(json.dumps({"id": transcript_id, "result": {"error": error}}, ensure_ascii=False) + "\n")
+                print(f"{transcript_id}: {error}", file=sys.stderr)
+                continue
+            pending.append((transcript_id, conversation))
+
+        # Measured for the whole backlog in one vectorized pass
+        speech_metrics = compute_speech_metrics_batch([conversation for _, conversation in pending])
+        tasks = [asyncio.create_task(handle(transcript_id, conversation, metrics))
+                 for (transcript_id, conversation), metrics in zip(pending, speech_metrics)]
+        await asyncio.gather(*tasks)
+
+    print(f"Graded {counts['graded']}, reused {counts['stored']} stored, skipped {counts['skipped']} already in "
+          f"{args.output}, failed {counts['failed']} in {time.monotonic() - started_at:.1f}s", file=sys.stderr)
+    return 1 if counts["failed"] else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grade role-play transcripts concurrently.")
+    parser.add_argument("input", help="JSONL file or directory of .json/.jsonl transcripts")
+    parser.add_argument("--output", default="evaluations.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--tokens-per-minute", type=int, default=150000, help="Token budget per minute")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries for rate-limit and server errors")
+    parser.add_argument("--no-store", action="store_true", help="Don't read or write the evaluation store")
+    args = parser.parse_args(argv)
+
+    if not OPENAI_API_KEY:
+        parser.error("OPENAI_API_KEY is not set")
+
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+End-to-end turn-latency benchmark: record -> transcribe -> LLM -> TTS -> first audio.
+
+By default the OpenAI and ElevenLabs clients are pointed at the local stand-in
+from mock_servers.py, so no keys are needed and latency can be dialled in.
+
+Usage:
+    python benchmark.py --iterations 20
+    python benchmark.py --iterations 20 --audio utterance.wav --latency 0.3 --token-delay 0.03
+    python benchmark.py --no-mock --json results.json   # use the configured real services
+
+Stages (all in ms):
+    record              stop of an audio_handler.Recorder fed the clip -> samples ready for the model
+    transcribe          Whisper transcription of the utterance (skipped if no model is available)
+    llm_first_token     request -> first streamed token
+    llm_first_sentence  request -> first complete sentence handed to TTS
+    llm_total           request -> last token
+    tts_first_chunk     first sentence sent to TTS -> first audio chunk
+    first_audio         end of recording -> first audio chunk of the reply
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import wave
+import numpy as np
+from mock_servers import MockConfig, start_mock_server
+
+STAGES = ["record", "transcribe", "llm_first_token", "llm_first_sentence", "llm_total", "tts_first_chunk", "first_audio"]
+DEFAULT_UTTERANCE = "I hear you, that sounds stressful. What worries you most about the March closing?"
+
+def load_clip(path, seconds=4.0, sample_rate=16000):
+    """Load a 16 kHz mono 16-bit WAV file, or synthesize a clip if no path is given."""
+    if path:
+        with wave.open(path, "rb") as wav:
+            if wav.getframerate() != sample_rate or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise SystemExit("The benchmark clip must be a 16 kHz mono 16-bit WAV file")
+            return np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (np.sin(2 * np.pi * 220 * t) * 3000).astype(np.int16)
+
+class ClipStream:
+    """
+    Input stream that plays a clip into a Recorder in place of the microphone.
+
+    The clip is read as fast as the recorder asks for it; after that each read
+    blocks for one buffer's worth of time and returns nothing, like a microphone
+    that has gone quiet, until the recorder stops.
+    """
+
+    def __init__(self, clip, sample_rate=16000):
+        self.clip = clip
+        self.sample_rate = sample_rate
+        self.position = 0
+        self.drained = threading.Event()
+
+    def read(self, frames):
+        if self.position >= len(self.clip):
+            self.drained.set()
+            time.sleep(frames / self.sample_rate)
+            return b""
+        chunk = self.clip[self.position:self.position + frames]
+        self.position += frames
+        return chunk.tobytes()
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+def record_clip(audio_handler, clip):
+    """Play a clip through a Recorder; return the samples and the seconds from stop() to samples ready."""
+    stream = ClipStream(clip)
+    recorder = audio_handler.Recorder(max_seconds=len(clip) / stream.sample_rate + 1).start(stream)
+    stream.drained.wait()
+    start = time.perf_counter()
+    samples = recorder.stop()
+    return samples, time.perf_counter() - start
+
+def run_turn(clip, scenario, handlers):
+    """Run one simulated turn and return its stage timings in seconds."""
+    openai_handler, audio_handler, tts_client, transcribe = handlers
+    timings = {}
+
+    # Record: stopping a real Recorder and getting its ring buffer back in order
+    samples = clip
+    if audio_handler is not None:
+        samples, timings["record"] = record_clip(audio_handler, clip)
+    recording_done = time.perf_counter()
+
+    user_input = DEFAULT_UTTERANCE
+    if transcribe:
+        start = time.perf_counter()
+        audio_handler.transcribe_audio(samples)
+        timings["transcribe"] = time.perf_counter() - start
+
+    # LLM tokens are produced on their own thread, as they would arrive from the network
+    tokens = queue.Queue()
+    llm_start = time.perf_counter()
+
+    def produce_tokens():
+        for token in openai_handler.stream_openai_response(user_input, [], scenario):
+            tokens.put(token)
+        timings["llm_total"] = time.perf_counter() - llm_start
+        tokens.put(None)
+
+    threading.Thread(target=produce_tokens, daemon=True).start()
+
+    def token_stream():
+        while True:
+            token = tokens.get()
+            if token is None:
+                return
+            if "llm_first_token" not in timings:
+                timings["llm_first_token"] = time.perf_counter() - llm_start
+            yield token
+
+    for index, sentence in enumerate(openai_handler.split_sentences(token_stream())):
+        if index == 0:
+            timings["llm_first_sentence"] = time.perf_counter() - llm_start
+            tts_start = time.perf_counter()
+        chunks = audio_handler.synthesize_speech(tts_client, sentence) if audio_handler else tts_client.text_to_speech.convert(
+            voice_id="JBFqnCBsd6RMkjVDRZzb", text=sentence, model_id="eleven_multilingual_v2", output_format="mp3_44100_128"
+        )
+        for chunk_index, _ in enumerate(chunks):
+            if index == 0 and chunk_index == 0:
+                now = time.perf_counter()
+                timings["tts_first_chunk"] = now - tts_start
+                timings["first_audio"] = timings.get("record", 0.0) + (now - recording_done)
+
+    return timings
+
+def summarize(results):
+    """Return mean/p50/p95/max in ms for every stage that was measured."""
+    summary = {}
+    for stage in STAGES:
+        values = np.array([timings[stage] for timings in results if stage in timings]) * 1000
+        if values.size:
+            summary[stage] = {
+                "mean": float(values.mean()),
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+                "max": float(values.max()),
+                "n": int(values.size)
+            }
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark per-stage latency of a conversation turn.")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--audio", help="16 kHz mono WAV clip to transcribe (default: synthetic tone)")
+    parser.add_argument("--scenario", default="Timing the Market")
+    parser.add_argument("--skip-transcribe", action="store_true", help="Don't run Whisper")
+    parser.add_argument("--no-mock", action="store_true", help="Use the configured services instead of the mock server")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock: seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Mock: seconds between tokens")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="Mock: seconds between TTS chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock: probability that a request fails")
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    if not args.no_mock:
+        config = MockConfig(latency=args.latency, token_delay=args.token_delay,
+                            chunk_delay=args.chunk_delay, error_rate=args.error_rate)
+        server, base_url = start_mock_server(config, port=0)
+        os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+        os.environ["ELEVENLABS_BASE_URL"] = base_url
+        for key in ("OPENAI_API_KEY", "ELEVENLABS_API_KEY", "AGENT_ID"):
+            os.environ.setdefault(key, "mock")
+
+    # Measure synthesis, not the TTS cache, and don't load Whisper unless asked to
+    os.environ["TTS_CACHE_ENABLED"] = "0"
+    os.environ["WHISPER_PRELOAD"] = "0"
+
+    # Import after the environment is set so the clients pick up the base URLs
+    import openai_handler
+    from elevenlabs_handler import get_client
+
+    audio_handler, transcribe = None, False
+    try:
+        import audio_handler
+    except ImportError as e:
+        print(f"audio_handler unavailable ({e}); skipping the record and transcribe stages", file=sys.stderr)
+    if audio_handler is not None and not args.skip_transcribe:
+        transcribe = audio_handler.load_model() is not None
+        if not transcribe:
+            print("Whisper model unavailable; skipping the transcribe stage", file=sys.stderr)
+
+    clip = load_clip(args.audio)
+    handlers = (openai_handler, audio_handler, get_client(), transcribe)
+
+    results = []
+    for iteration in range(args.iterations):
+        try:
+            results.append(run_turn(clip, args.scenario, handlers))
+        except Exception as e:
+            print(f"Iteration {iteration + 1} failed: {e}", file=sys.stderr)
+
+    summary = summarize(results)
+    print(f"{'stage':<20}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}   (ms, {len(results)} turns)")
+    for stage, stats in summary.items():
+        print(f"{stage:<20}{stats['mean']:>10.1f}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['max']:>10.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+
+    return 0 if results else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
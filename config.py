@@ -0,0 +1,30 @@
+import os
+import streamlit as st
+
+def get_setting(name, default=None, cast=None):
+    """
+    Look up a setting from the environment first, then from Streamlit secrets.
+
+    Args:
+        name (str): Name of the setting, e.g. "POLL_TIMEOUT_SECONDS".
+        default: Value returned when the setting is not defined anywhere.
+        cast (callable, optional): Converter applied to the value that was found.
+
+    Returns:
+        The configured value, or the default.
+    """
+    value = os.getenv(name)
+    if value is None:
+        try:
+            value = st.secrets.get(name)
+        except Exception:
+            # No secrets.toml (e.g. when running a script outside Streamlit)
+            value = None
+
+    if value is None:
+        return default
+
+    if cast is bool and isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    return cast(value) if cast else value
@@ -0,0 +1,95 @@
+from config import get_setting
+from token_counter import count_message_tokens
+
+# Token budget for the verbatim turns sent with each request
+MEMORY_MAX_TOKENS = get_setting("MEMORY_MAX_TOKENS", 2000, cast=int)
+# After rolling turns into the summary, keep the window at this share of the budget,
+# so the summary (and the prompt prefix) changes only every few turns
+MEMORY_TARGET_RATIO = get_setting("MEMORY_TARGET_RATIO", 0.6, cast=float)
+
+def normalize_role(role):
+    """Map the roles used in Home.py (persona lines are stored as "system") to chat roles."""
+    return "user" if role == "user" else "assistant"
+
+class ConversationMemory:
+    """
+    Conversation history kept as structured chat turns within a token budget.
+
+    Recent turns are sent verbatim. When they exceed the budget, the oldest turns
+    are rolled into a running summary, so the prompt stays roughly the same size
+    however long the session gets. Keep one instance per session (e.g. in
+    st.session_state) and `add()` each user message and reply to it.
+    """
+
+    def __init__(self, max_tokens=MEMORY_MAX_TOKENS, target_ratio=MEMORY_TARGET_RATIO, model="gpt-4o"):
+        """
+        Args:
+            max_tokens (int): Token budget for the verbatim turns.
+            target_ratio (float): Share of the budget left after compaction.
+            model (str): Model whose tokenizer is used for counting.
+        """
+        self.max_tokens = max_tokens
+        self.target_tokens = int(max_tokens * target_ratio)
+        self.model = model
+        self.turns = []
+        self.summary = ""
+
+    @classmethod
+    def from_history(cls, conversation_history, **kwargs):
+        """
+        Build a memory from a list of message dicts such as st.session_state.conversation.
+
+        Args:
+            conversation_history (list): [{"role": ..., "content": ...}, ...]
+
+        Returns:
+            ConversationMemory: Memory holding the same turns.
+        """
+        memory = cls(**kwargs)
+        for message in conversation_history or []:
+            memory.add(message["role"], message["content"])
+        return memory
+
+    def add(self, role, content):
+        """Append a turn to the memory."""
+        if content and content.strip():
+            self.turns.append({"role": normalize_role(role), "content": content.strip()})
+
+    def tokens(self):
+        return count_message_tokens(self.turns, self.model) if self.turns else 0
+
+    def compact(self, summarize=None):
+        """
+        Roll the oldest turns out of the window once it exceeds the token budget.
+
+        Args:
+            summarize (callable, optional): `summarize(summary, turns) -> str` returning the
+                updated running summary. Without it, old turns are simply dropped.
+        """
+        if self.tokens() <= self.max_tokens:
+            return
+
+        rolled = []
+        while len(self.turns) > 1 and self.tokens() > self.target_tokens:
+            rolled.append(self.turns.pop(0))
+
+        if summarize and rolled:
+            try:
+                self.summary = summarize(self.summary, rolled)
+            except Exception as e:
+                print(f"Error summarizing conversation history: {e}")
+
+    def messages(self):
+        """
+        Return the memory as chat messages: the running summary (if any), then the recent turns.
+
+        Returns:
+            list: Message dicts to place after the scenario system prompt.
+        """
+        messages = []
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier part of your conversation with the user: {self.summary}"
+            })
+        return messages + [dict(turn) for turn in self.turns]
@@ -0,0 +1,125 @@
+import random
+import time
+from config import get_setting
+
+POLL_BASE_INTERVAL = get_setting("POLL_BASE_INTERVAL_SECONDS", 1.0, cast=float)
+POLL_MAX_INTERVAL = get_setting("POLL_MAX_INTERVAL_SECONDS", 8.0, cast=float)
+POLL_BACKOFF_MULTIPLIER = get_setting("POLL_BACKOFF_MULTIPLIER", 2.0, cast=float)
+POLL_JITTER = get_setting("POLL_JITTER", 0.25, cast=float)
+POLL_TIMEOUT = get_setting("POLL_TIMEOUT_SECONDS", 1800.0, cast=float)
+
+def backoff_delay(attempt, base=POLL_BASE_INTERVAL, maximum=POLL_MAX_INTERVAL,
+                  multiplier=POLL_BACKOFF_MULTIPLIER, jitter=POLL_JITTER):
+    """
+    Compute the delay before the next poll using jittered exponential backoff.
+
+    Args:
+        attempt (int): Number of consecutive polls that saw no change.
+        base (float): Delay in seconds used right after a change.
+        maximum (float): Upper bound for the delay in seconds.
+        multiplier (float): Growth factor applied per unchanged poll.
+        jitter (float): Fraction of the delay to randomise (0.25 means +/-25%).
+
+    Returns:
+        float: Delay in seconds.
+    """
+    delay = min(maximum, base * (multiplier ** attempt))
+    if jitter:
+        delay *= random.uniform(1 - jitter, 1 + jitter)
+    return max(0.0, delay)
+
+class ConversationPoller:
+    """
+    Decides when a session should next ask ElevenLabs for the conversation status.
+
+    The poller never sleeps. Each Streamlit run calls `poll()`, which only hits the
+    API when a check is due, and `seconds_until_next_poll()` tells the page when to
+    schedule the next rerun. The interval resets to the base delay whenever the
+    conversation changes (by default, its status) and backs off while it stays the same.
+    """
+
+    def __init__(self, fetch, base_interval=POLL_BASE_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 multiplier=POLL_BACKOFF_MULTIPLIER, jitter=POLL_JITTER, timeout=POLL_TIMEOUT,
+                 change_key=None):
+        """
+        Args:
+            fetch (callable): Called with the last result; returns the latest conversation
+                (with a `status`) or None.
+            base_interval (float): Delay in seconds after a status change.
+            max_interval (float): Upper bound for the delay in seconds.
+            multiplier (float): Backoff growth factor.
+            jitter (float): Fraction of each delay to randomise.
+            timeout (float): Seconds after which the poller gives up.
+            change_key (callable, optional): Maps a result to the value whose change resets
+                the backoff. Defaults to the conversation status.
+        """
+        self.fetch = fetch
+        self.change_key = change_key or (lambda result: getattr(result, "status", None))
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.timeout = timeout
+
+        self.started_at = time.monotonic()
+        self.next_poll_at = self.started_at
+        self.attempt = 0
+        self.last_status = None
+        self.last_key = None
+        self.last_result = None
+
+    @property
+    def timed_out(self):
+        return self.timeout is not None and time.monotonic() - self.started_at > self.timeout
+
+    def is_due(self):
+        return time.monotonic() >= self.next_poll_at
+
+    def seconds_until_next_poll(self):
+        return max(0.0, self.next_poll_at - time.monotonic())
+
+    def poll(self):
+        """
+        Fetch the conversation if a check is due, otherwise return the last result.
+
+        Returns:
+            The latest conversation seen, or None if nothing has been fetched yet.
+        """
+        if self.timed_out or not self.is_due():
+            return self.last_result
+
+        try:
+            result = self.fetch(self.last_result)
+        except Exception as e:
+            print(f"Error polling conversation status: {e}")
+            result = None
+
+        return self.update(result)
+
+    def update(self, result):
+        """
+        Record a fetched conversation and schedule the next poll.
+
+        Also used for results that arrive without polling, e.g. from the post-call webhook.
+
+        Args:
+            result: The conversation, or None if the fetch failed.
+
+        Returns:
+            The latest conversation seen, or None if nothing has been fetched yet.
+        """
+        key = self.change_key(result) if result is not None else None
+        if result is not None and key != self.last_key:
+            self.attempt = 0
+            self.last_key = key
+            self.last_status = getattr(result, "status", None)
+        else:
+            self.attempt += 1
+
+        if result is not None:
+            self.last_result = result
+
+        delay = backoff_delay(self.attempt, self.base_interval, self.max_interval,
+                              self.multiplier, self.jitter)
+        self.next_poll_at = time.monotonic() + delay
+        return self.last_result
@@ -0,0 +1,293 @@
+import threading
+import time
+from config import get_setting
+from conversation_poller import POLL_MAX_INTERVAL, ConversationPoller, backoff_delay
+from elevenlabs_handler import AGENT_ID, get_conversation, list_conversations, on_conversation_finished
+
+# Name of the widget dynamic variable that carries the Streamlit session id
+SESSION_VARIABLE = "session_id"
+# Sessions that stop asking for their conversation (closed tabs) are dropped after this long
+SESSION_IDLE_SECONDS = get_setting("TRACKER_SESSION_IDLE_SECONDS", 120.0, cast=float)
+# Clock difference tolerated between this server and ElevenLabs when matching by start time
+START_TIME_SLACK_SECONDS = get_setting("TRACKER_START_TIME_SLACK_SECONDS", 5.0, cast=float)
+# Listing pages read per discovery; more are only needed when many calls start at once
+DISCOVERY_MAX_PAGES = get_setting("TRACKER_DISCOVERY_MAX_PAGES", 5, cast=int)
+
+def conversation_session(conversation):
+    """
+    Return the session id a conversation was started with, from the widget's dynamic variables.
+
+    Args:
+        conversation: Conversation details from `get_conversation`.
+
+    Returns:
+        str: The session id, or None if the widget did not send one.
+    """
+    client_data = getattr(conversation, "conversation_initiation_client_data", None)
+    variables = getattr(client_data, "dynamic_variables", None) or {}
+    value = variables.get(SESSION_VARIABLE)
+    return str(value) if value is not None else None
+
+def _turns(conversation):
+    return len(getattr(conversation, "transcript", None) or [])
+
+def _start_time(summary):
+    # Missing for some conversations, e.g. ones still being set up
+    return getattr(summary, "start_time_unix_secs", None)
+
+class SharedConversationPoller:
+    """
+    Follows the ConvAI conversations of every session in the process from one background thread.
+
+    Sessions register with `watch()`. While any session is still waiting for its
+    call to start, the agent's conversations are listed, and new ones are tied to
+    a session through the `session_id` dynamic variable the widget sends, or by
+    start time if it is missing. Each claimed conversation is then fetched on its
+    own backoff schedule and the result is handed to its session via `get()`. API
+    calls therefore grow with the number of active conversations, not with the
+    number of open tabs or how often they rerun.
+
+    The listing is read newest first, following pages back to the earliest
+    waiting session but no further than DISCOVERY_MAX_PAGES pages.
+    """
+
+    def __init__(self, agent_id=AGENT_ID, max_interval=POLL_MAX_INTERVAL,
+                 session_idle_seconds=SESSION_IDLE_SECONDS, start_time_slack=START_TIME_SLACK_SECONDS):
+        """
+        Args:
+            agent_id (str): The agent whose conversations are followed.
+            max_interval (float): Upper bound for the delay between fetches of a conversation.
+            session_idle_seconds (float): Idle time after which a session is forgotten.
+            start_time_slack (float): Tolerance in seconds for start-time matching.
+        """
+        self.agent_id = agent_id
+        self.max_interval = max_interval
+        self.session_idle_seconds = session_idle_seconds
+        self.start_time_slack = start_time_slack
+
+        self._condition = threading.Condition()
+        self._sessions = {}
+        # conversation id -> session id, or None for conversations of other processes
+        self._claimed = {}
+        self._pollers = {}
+        self._discovery = ConversationPoller(
+            lambda last: self._list_recent(),
+            change_key=lambda summaries: tuple(summary.conversation_id for summary in summaries),
+            timeout=None
+        )
+        self._thread = None
+        # A finished call reported by the post-call webhook needs no further fetches
+        on_conversation_finished(self._finished)
+
+    def watch(self, session_id, since):
+        """
+        Start (or keep) following the conversation of a session.
+
+        Args:
+            session_id (str): The session, also sent to the widget as a dynamic variable.
+            since (float): Unix time after which the session's call can have started.
+        """
+        with self._condition:
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._sessions[session_id] = {"since": since, "conversation_id": None, "result": None,
+                                              "last_seen": time.monotonic()}
+                # Look for the new call promptly
+                self._discovery.attempt = 0
+                self._discovery.next_poll_at = time.monotonic()
+            else:
+                session["last_seen"] = time.monotonic()
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def unwatch(self, session_id):
+        """Stop following the conversation of a session."""
+        with self._condition:
+            session = self._sessions.pop(session_id, None)
+            if session and session["conversation_id"]:
+                self._pollers.pop(session["conversation_id"], None)
+
+    def get(self, session_id):
+        """
+        Return the latest state of a session's conversation.
+
+        Args:
+            session_id (str): The session.
+
+        Returns:
+            The conversation, or None if the session's call hasn't been found yet.
+        """
+        with self._condition:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            session["last_seen"] = time.monotonic()
+            return session["result"]
+
+    def seconds_until_next_poll(self, session_id):
+        """Return how long until the session's conversation (or the listing) is checked again."""
+        with self._condition:
+            session = self._sessions.get(session_id)
+            poller = self._pollers.get(session["conversation_id"]) if session else None
+            return (poller or self._discovery).seconds_until_next_poll()
+
+    def _finished(self, conversation):
+        with self._condition:
+            poller = self._pollers.pop(conversation.conversation_id, None)
+            if poller is None:
+                return
+            poller.update(conversation)
+            session_id = self._claimed.get(conversation.conversation_id)
+            if session_id in self._sessions:
+                self._sessions[session_id]["result"] = conversation
+
+    def _claim(self, conversation_id, session_id, conversation):
+        poller = ConversationPoller(
+            lambda last: get_conversation(conversation_id),
+            max_interval=self.max_interval,
+            change_key=lambda result: (result.status, _turns(result)),
+            timeout=None
+        )
+        poller.update(conversation)
+        self._claimed[conversation_id] = session_id
+        self._pollers[conversation_id] = poller
+        session = self._sessions[session_id]
+        session["conversation_id"] = conversation_id
+        session["result"] = conversation
+
+    def _list_recent(self):
+        """List the agent's conversations back to the earliest waiting session, a page at a time."""
+        with self._condition:
+            waiting = [session["since"] for session in self._sessions.values() if session["conversation_id"] is None]
+        if not waiting:
+            return []
+
+        earliest = min(waiting) - self.start_time_slack
+        summaries, cursor = [], None
+        for _ in range(DISCOVERY_MAX_PAGES):
+            listing = list_conversations(self.agent_id, cursor=cursor)
+            page = listing.conversations or []
+            summaries += page
+            cursor = getattr(listing, "next_cursor", None)
+            starts = [_start_time(summary) for summary in page if _start_time(summary) is not None]
+            if not getattr(listing, "has_more", False) or not cursor or (starts and min(starts) < earliest):
+                break
+        return summaries
+
+    def _discover(self):
+        summaries = self._discovery.poll()
+        if summaries is None:
+            return
+
+        with self._condition:
+            # Forget conversations that dropped off the listing
+            listed = {summary.conversation_id for summary in summaries}
+            self._claimed = {conversation_id: session_id for conversation_id, session_id in self._claimed.items()
+                             if conversation_id in listed or conversation_id in self._pollers}
+
+            waiting = {sid: s["since"] for sid, s in self._sessions.items() if s["conversation_id"] is None}
+            # Conversations without a start time can still be matched by their dynamic variable
+            candidates = [summary for summary in summaries
+                          if summary.conversation_id not in self._claimed
+                          and waiting
+                          and (_start_time(summary) is None
+                               or _start_time(summary) >= min(waiting.values()) - self.start_time_slack)]
+
+        # Oldest first, so earlier calls are matched to earlier sessions
+        for summary in sorted(candidates, key=lambda summary: _start_time(summary) or 0):
+            try:
+                conversation = get_conversation(summary.conversation_id)
+                session_id = conversation_session(conversation)
+            except Exception as e:
+                print(f"Error fetching conversation {summary.conversation_id}: {e}")
+                continue
+
+            with self._condition:
+                waiting = {sid: s["since"] for sid, s in self._sessions.items() if s["conversation_id"] is None}
+                if session_id is None and _start_time(summary) is not None:
+                    # No dynamic variable: the session that started waiting most recently before the call
+                    eligible = [sid for sid, since in waiting.items()
+                                if since <= _start_time(summary) + self.start_time_slack]
+                    session_id = max(eligible, key=waiting.get) if eligible else None
+
+                if session_id in waiting:
+                    self._claim(summary.conversation_id, session_id, conversation)
+                else:
+                    # Another process's session, or no session was waiting when it started
+                    self._claimed[summary.conversation_id] = None
+
+    def _expire_sessions(self):
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session["last_seen"] > self.session_idle_seconds:
+                del self._sessions[session_id]
+                self._pollers.pop(session["conversation_id"], None)
+                # Unclaimed, so the call is found again if the session comes back
+                self._claimed.pop(session["conversation_id"], None)
+
+    def _run(self):
+        failures = 0
+        while True:
+            try:
+                timeout = self._step()
+                failures = 0
+            except Exception as e:
+                # One bad response must not stop tracking for every session; back off like a failed poll
+                print(f"Error tracking conversations: {e}")
+                timeout = backoff_delay(failures)
+                failures += 1
+
+            with self._condition:
+                self._condition.wait(timeout)
+
+    def _step(self):
+        """Run one round of discovery and due fetches; return how long to wait before the next."""
+        with self._condition:
+            self._expire_sessions()
+            while not self._sessions:
+                self._condition.wait()
+            waiting = any(session["conversation_id"] is None for session in self._sessions.values())
+            pollers = list(self._pollers.items())
+
+        if waiting and self._discovery.is_due():
+            self._discover()
+
+        for conversation_id, poller in pollers:
+            if not poller.is_due():
+                continue
+            result = poller.poll()
+            with self._condition:
+                session_id = self._claimed.get(conversation_id)
+                if session_id in self._sessions and result is not None:
+                    self._sessions[session_id]["result"] = result
+                if getattr(result, "status", None) == "done":
+                    self._pollers.pop(conversation_id, None)
+
+        with self._condition:
+            due_times = [poller.next_poll_at for poller in self._pollers.values()]
+            if any(session["conversation_id"] is None for session in self._sessions.values()):
+                due_times.append(self._discovery.next_poll_at)
+            return max(0.05, min(due_times) - time.monotonic()) if due_times else self.session_idle_seconds
+
+_shared_poller = None
+_shared_poller_lock = threading.Lock()
+
+def get_shared_poller(max_interval=POLL_MAX_INTERVAL):
+    """
+    Return the process-wide shared poller, creating it on first use.
+
+    Args:
+        max_interval (float): Upper bound for the delay between fetches, used on creation.
+
+    Returns:
+        SharedConversationPoller: The shared poller.
+    """
+    global _shared_poller
+
+    with _shared_poller_lock:
+        if _shared_poller is None:
+            _shared_poller = SharedConversationPoller(max_interval=max_interval)
+        return _shared_poller
@@ -1,10 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+import httpx
 from elevenlabs.client import ElevenLabs
 from elevenlabs.conversational_ai.conversation import Conversation
 from elevenlabs.conversational_ai.default_audio_interface import DefaultAudioInterface
-import streamlit as st
+from config import get_setting
+from metrics import span
 
-AGENT_ID = st.secrets["AGENT_ID"]
-API_KEY = st.secrets["ELEVENLABS_API_KEY"]
+AGENT_ID = get_setting("AGENT_ID")
+API_KEY = get_setting("ELEVENLABS_API_KEY")
+# Point the client at another server, e.g. the local stand-in from mock_servers.py
+BASE_URL = get_setting("ELEVENLABS_BASE_URL")
+
+# Connection pool shared by every session in this process
+HTTP_MAX_CONNECTIONS = get_setting("ELEVENLABS_MAX_CONNECTIONS", 20, cast=int)
+HTTP_KEEPALIVE_CONNECTIONS = get_setting("ELEVENLABS_KEEPALIVE_CONNECTIONS", 10, cast=int)
+HTTP_KEEPALIVE_EXPIRY = get_setting("ELEVENLABS_KEEPALIVE_EXPIRY_SECONDS", 60.0, cast=float)
+
+# How long a conversation listing or an unfinished conversation may be reused
+CONVERSATION_CACHE_TTL = get_setting("ELEVENLABS_CACHE_TTL_SECONDS", 2.0, cast=float)
+# Finished conversations never change, so they are kept until this many are cached
+FINISHED_CONVERSATION_CACHE_SIZE = get_setting("ELEVENLABS_FINISHED_CACHE_SIZE", 1024, cast=int)
+
+_client = None
+_client_lock = threading.Lock()
+
+_cache_lock = threading.Lock()
+_conversation_lists = {}
+_conversations = {}
+_finished_conversations = OrderedDict()
+# Called with each conversation the webhook reports finished, e.g. by the shared tracker
+_finished_listeners = []
+
+def get_client():
+    """
+    Returns the ElevenLabs client shared by the whole process.
+
+    The client is built once on a pooled httpx client, so keep-alive connections
+    (and their TLS sessions) are reused across calls and Streamlit sessions.
+
+    Returns:
+    ElevenLabs: The shared client.
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+                )
+            )
+            _client = ElevenLabs(api_key=API_KEY, base_url=BASE_URL, httpx_client=http_client)
+        return _client
+
+def _prune(cache):
+    """Drop entries older than CONVERSATION_CACHE_TTL; call with _cache_lock held."""
+    now = time.monotonic()
+    for key, (fetched_at, _) in list(cache.items()):
+        if now - fetched_at >= CONVERSATION_CACHE_TTL:
+            del cache[key]
+
+def list_conversations(agent_id=AGENT_ID, cursor=None):
+    """
+    Lists the conversations of an agent, newest first, reusing a listing fetched in the last few seconds.
+
+    Args:
+    agent_id (str): The agent whose conversations are listed.
+    cursor (str, optional): `next_cursor` of the previous page; the first page if not given.
+
+    Returns:
+    One page of the conversation listing returned by the ElevenLabs API.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _conversation_lists.get((agent_id, cursor))
+        if cached and now - cached[0] < CONVERSATION_CACHE_TTL:
+            return cached[1]
+
+    with span("elevenlabs_poll", call="list_conversations"):
+        conversations = get_client().conversational_ai.get_conversations(agent_id=agent_id, cursor=cursor)
+
+    with _cache_lock:
+        # Only the first page is read often; later pages are dropped once stale so the cache stays small
+        _prune(_conversation_lists)
+        _conversation_lists[(agent_id, cursor)] = (time.monotonic(), conversations)
+    return conversations
+
+def get_conversation(conversation_id):
+    """
+    Retrieves a conversation, serving finished ones from the cache without an API call.
+
+    Args:
+    conversation_id (str): The conversation to retrieve.
+
+    Returns:
+    The conversation details returned by the ElevenLabs API.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        if conversation_id in _finished_conversations:
+            _finished_conversations.move_to_end(conversation_id)
+            return _finished_conversations[conversation_id]
+
+        cached = _conversations.get(conversation_id)
+        if cached and now - cached[0] < CONVERSATION_CACHE_TTL:
+            return cached[1]
+
+    with span("elevenlabs_poll", call="get_conversation"):
+        conversation = get_client().conversational_ai.get_conversation(
+                            conversation_id=conversation_id,
+                        )
+
+    if conversation.status == "done":
+        store_finished_conversation(conversation)
+    else:
+        with _cache_lock:
+            # Calls that ended without a webhook or were abandoned would otherwise stay here forever
+            _prune(_conversations)
+            _conversations[conversation_id] = (time.monotonic(), conversation)
+    return conversation
+
+def store_finished_conversation(conversation):
+    """
+    Caches a finished conversation and hands it to the listeners registered with `on_conversation_finished`.
+
+    Args:
+    conversation: Conversation details with `conversation_id` and a "done" status,
+        e.g. from the post-call webhook.
+    """
+    conversation_id = conversation.conversation_id
+    with _cache_lock:
+        _conversations.pop(conversation_id, None)
+        _finished_conversations[conversation_id] = conversation
+        _finished_conversations.move_to_end(conversation_id)
+        while len(_finished_conversations) > FINISHED_CONVERSATION_CACHE_SIZE:
+            _finished_conversations.popitem(last=False)
+        listeners = list(_finished_listeners)
+    for listener in listeners:
+        try:
+            listener(conversation)
+        except Exception as e:
+            print(f"Error handling finished conversation {conversation_id}: {e}")
+
+def on_conversation_finished(listener):
+    """
+    Registers a callback for conversations reported finished by the webhook.
+
+    Args:
+    listener (callable): Called with the conversation from the webhook's thread; must not block.
+    """
+    with _cache_lock:
+        _finished_listeners.append(listener)
 
 def get_latest_conversation():
     """
@@ -20,17 +170,15 @@ def get_latest_conversation():
     if not API_KEY:
        print("ELEVENLABS_API_KEY not set, assuming the agent is public\n")
 
-    try:
-        client = ElevenLabs(api_key=API_KEY)
+    latest_conversation = None
 
-        conversations = client.conversational_ai.get_conversations(agent_id=AGENT_ID)
+    try:
+        conversations = list_conversations(AGENT_ID)
         # get latest conversation
         latest_conversation_id = conversations.conversations[0].conversation_id
 
-        latest_conversation = client.conversational_ai.get_conversation(
-                                conversation_id=latest_conversation_id,
-                            )
+        latest_conversation = get_conversation(latest_conversation_id)
     except Exception as e:
         print(f"Error getting latest conversation: {e}")
 
-    return latest_conversation
\ No newline at end of file
+    return latest_conversation
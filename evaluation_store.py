@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import get_setting
+from conversation_memory import normalize_role
+
+EVALUATION_DB_PATH = get_setting(
+    "EVALUATION_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "evaluations.sqlite3")
+)
+
+def transcript_hash(conversation, rubric_version):
+    """
+    Compute the canonical key of a transcript graded with a given rubric.
+
+    Roles are normalized and whitespace is collapsed, so the same conversation
+    always hashes the same way regardless of how it was stored.
+
+    Args:
+        conversation (list): Message dicts with "role" and "content".
+        rubric_version (str): Version of the evaluation prompt and model.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    canonical = [
+        [normalize_role(message["role"]), " ".join(message["content"].split())]
+        for message in conversation
+        if message.get("content") and message["content"].strip()
+    ]
+    payload = json.dumps([rubric_version, canonical], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class EvaluationStore:
+    """
+    SQLite store of evaluation results keyed by transcript hash.
+
+    The database runs in WAL mode, so several Streamlit sessions (or replicas
+    sharing the file) can read while another writes. Each thread uses its own
+    connection.
+    """
+
+    def __init__(self, path=EVALUATION_DB_PATH):
+        """
+        Args:
+            path (str): Location of the SQLite database file.
+        """
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS evaluations (
+                    transcript_hash TEXT PRIMARY KEY,
+                    rubric_version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            connection.commit()
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        """
+        Look up a stored evaluation.
+
+        Args:
+            key (str): Key from `transcript_hash`.
+
+        Returns:
+            dict: The stored evaluation result, or None.
+        """
+        try:
+            row = self._connection().execute(
+                "SELECT result FROM evaluations WHERE transcript_hash = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading evaluation store: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, rubric_version, result):
+        """
+        Store an evaluation result.
+
+        Args:
+            key (str): Key from `transcript_hash`.
+            rubric_version (str): Version of the evaluation prompt and model.
+            result (dict): The evaluation returned by `evaluate_conversation`.
+        """
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO evaluations (transcript_hash, rubric_version, result, created_at) VALUES (?, ?, ?, ?)",
+                (key, rubric_version, json.dumps(result, ensure_ascii=False), time.time())
+            )
+            connection.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing evaluation store: {e}")
+
+evaluation_store = EvaluationStore()
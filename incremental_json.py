@@ -0,0 +1,112 @@
+import json
+import re
+
+_WHITESPACE = " \t\n\r"
+_SCALAR = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null")
+_MISSING = object()
+
+class PartialDict(dict):
+    """An object whose closing brace has not arrived yet."""
+
+class PartialList(list):
+    """An array whose closing bracket has not arrived yet."""
+
+def is_complete(value):
+    """Return True if a value returned by `parse_partial` was fully received."""
+    if isinstance(value, (PartialDict, PartialList)):
+        return False
+    if isinstance(value, dict):
+        return all(is_complete(item) for item in value.values())
+    if isinstance(value, list):
+        return all(is_complete(item) for item in value)
+    return True
+
+def _skip(text, i):
+    while i < len(text) and text[i] in _WHITESPACE:
+        i += 1
+    return i
+
+def _string(text, i):
+    try:
+        return json.decoder.scanstring(text, i + 1)
+    except json.JSONDecodeError:
+        # Unterminated string: wait for the rest
+        return _MISSING, len(text)
+
+def _value(text, i):
+    i = _skip(text, i)
+    if i >= len(text):
+        return _MISSING, i
+    char = text[i]
+    if char == "{":
+        return _object(text, i + 1)
+    if char == "[":
+        return _array(text, i + 1)
+    if char == '"':
+        return _string(text, i)
+
+    match = _SCALAR.match(text, i)
+    if not match or match.end() == len(text) or text[match.end()] not in _WHITESPACE + ",]}":
+        # A number or literal is only complete once a delimiter follows ("4" may become "45")
+        return _MISSING, len(text)
+    return json.loads(match.group()), match.end()
+
+def _object(text, i):
+    result = PartialDict()
+    while True:
+        i = _skip(text, i)
+        if i >= len(text):
+            return result, i
+        if text[i] == "}":
+            return dict(result), i + 1
+        if text[i] == ",":
+            i += 1
+            continue
+
+        key, i = _string(text, i)
+        i = _skip(text, i)
+        if key is _MISSING or i >= len(text) or text[i] != ":":
+            return result, len(text)
+
+        value, i = _value(text, i + 1)
+        if value is _MISSING:
+            return result, len(text)
+        result[key] = value
+        if not is_complete(value):
+            return result, i
+
+def _array(text, i):
+    result = PartialList()
+    while True:
+        i = _skip(text, i)
+        if i >= len(text):
+            return result, i
+        if text[i] == "]":
+            return list(result), i + 1
+        if text[i] == ",":
+            i += 1
+            continue
+
+        value, i = _value(text, i)
+        if value is _MISSING:
+            return result, len(text)
+        result.append(value)
+        if not is_complete(value):
+            return result, i
+
+def parse_partial(text):
+    """
+    Parse a JSON document that may still be arriving.
+
+    Only fully received strings, numbers and literals are included. Objects and
+    arrays that are still open are returned as PartialDict / PartialList holding
+    the members received so far.
+
+    Args:
+        text (str): The JSON text received so far.
+
+    Returns:
+        The partially parsed value, or None if nothing usable has arrived.
+    """
+    value, _ = _value(text, 0)
+    return None if value is _MISSING else value
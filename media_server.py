@@ -0,0 +1,147 @@
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import get_setting
+
+MEDIA_SERVER_HOST = get_setting("MEDIA_SERVER_HOST", "0.0.0.0")
+MEDIA_SERVER_PORT = get_setting("MEDIA_SERVER_PORT", 8502, cast=int)
+# URL the browser uses to reach the media server, e.g. an HTTPS route on the app's proxy.
+# There is no default: only the deployment knows an address the browser can reach.
+MEDIA_SERVER_PUBLIC_URL = get_setting("MEDIA_SERVER_PUBLIC_URL")
+# Finished streams stay available this long so the browser can re-request them
+MEDIA_STREAM_TTL_SECONDS = get_setting("MEDIA_STREAM_TTL_SECONDS", 120.0, cast=float)
+# Streams nobody finished reading (or whose source stalled) are dropped after this long
+MEDIA_STREAM_MAX_AGE_SECONDS = get_setting("MEDIA_STREAM_MAX_AGE_SECONDS", 600.0, cast=float)
+
+_server = None
+_server_lock = threading.Lock()
+_streams = {}
+_streams_lock = threading.Lock()
+
+class MediaStream:
+    """
+    Audio produced by a chunk generator, readable by several HTTP requests at once.
+
+    A background thread pulls chunks from the source as soon as the stream is
+    registered, so synthesis starts before the browser connects. Readers get the
+    chunks produced so far and then wait for new ones until the source is done.
+    """
+
+    def __init__(self, chunks, mime_type):
+        self.mime_type = mime_type
+        self.chunks = []
+        self.done = False
+        self.created_at = time.monotonic()
+        self.finished_at = None
+        self._condition = threading.Condition()
+        threading.Thread(target=self._produce, args=(chunks,), daemon=True).start()
+
+    def _produce(self, chunks):
+        try:
+            for chunk in chunks:
+                if chunk:
+                    with self._condition:
+                        self.chunks.append(chunk)
+                        self._condition.notify_all()
+        except Exception as e:
+            print(f"Error producing media stream: {e}")
+        finally:
+            with self._condition:
+                self.done = True
+                self.finished_at = time.monotonic()
+                self._condition.notify_all()
+
+    def read(self):
+        """Yield every chunk of the stream, waiting for chunks that are not produced yet."""
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self.chunks) and not self.done:
+                    self._condition.wait()
+                if index >= len(self.chunks):
+                    return
+                chunk = self.chunks[index]
+            index += 1
+            yield chunk
+
+class _MediaRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        token = self.path.rsplit("/", 1)[-1].split("?", 1)[0]
+        with _streams_lock:
+            stream = _streams.get(token)
+
+        if not self.path.startswith("/stream/") or stream is None:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", stream.mime_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+
+        try:
+            for chunk in stream.read():
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The browser stopped listening (e.g. the page was rerun)
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def _expire_streams():
+    now = time.monotonic()
+    with _streams_lock:
+        for token, stream in list(_streams.items()):
+            if (stream.done and now - stream.finished_at > MEDIA_STREAM_TTL_SECONDS
+                    or now - stream.created_at > MEDIA_STREAM_MAX_AGE_SECONDS):
+                del _streams[token]
+
+def start_media_server():
+    """
+    Start the local media server in a daemon thread, once per process.
+
+    Returns:
+        bool: True if the server is running.
+    """
+    global _server
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((MEDIA_SERVER_HOST, MEDIA_SERVER_PORT), _MediaRequestHandler)
+                _server.daemon_threads = True
+            except OSError as e:
+                print(f"Error starting media server: {e}")
+                return False
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"Media server listening on {MEDIA_SERVER_HOST}:{MEDIA_SERVER_PORT}")
+        return True
+
+def register_stream(chunks, mime_type="audio/mpeg"):
+    """
+    Serve a chunk generator as a streamed HTTP response.
+
+    Args:
+        chunks (iterable): Bytes chunks, e.g. the ElevenLabs TTS generator.
+        mime_type (str): Content type sent to the browser.
+
+    Returns:
+        str: URL the browser can play, or None if MEDIA_SERVER_PUBLIC_URL is not set
+            or the media server is unavailable.
+    """
+    if not MEDIA_SERVER_PUBLIC_URL or not start_media_server():
+        return None
+
+    _expire_streams()
+    token = uuid.uuid4().hex
+    with _streams_lock:
+        _streams[token] = MediaStream(chunks, mime_type)
+    return f"{MEDIA_SERVER_PUBLIC_URL.rstrip('/')}/stream/{token}"
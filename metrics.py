@@ -0,0 +1,233 @@
+import contextlib
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+import numpy as np
+from config import get_setting
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# Port of the Prometheus /metrics endpoint; 0 disables the exporter
+METRICS_PORT = get_setting("METRICS_PORT", 0, cast=int)
+METRICS_HOST = get_setting("METRICS_HOST", "0.0.0.0")
+# Recent durations kept per stage for the in-process summary
+METRICS_WINDOW = get_setting("METRICS_WINDOW", 1000, cast=int)
+
+# Stage durations range from a few ms (cache hits) to minutes (long evaluations)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Session ids are unbounded, so they go on traces only; Prometheus gets the low-cardinality labels
+_session = contextvars.ContextVar("metrics_session", default="")
+_scenario = contextvars.ContextVar("metrics_scenario", default="")
+
+_histogram = None
+_queue_gauge = None
+if prometheus_client is not None:
+    _histogram = prometheus_client.Histogram(
+        "voice_roleplay_stage_duration_seconds",
+        "Duration of each stage of a conversation turn",
+        ["stage", "scenario", "outcome"],
+        buckets=LATENCY_BUCKETS
+    )
+    _queue_gauge = prometheus_client.Gauge(
+        "voice_roleplay_queue_depth",
+        "Jobs waiting in a work queue",
+        ["queue"]
+    )
+
+_tracer = trace.get_tracer("voice_roleplay") if trace is not None else None
+
+_recent = defaultdict(lambda: deque(maxlen=METRICS_WINDOW))
+_recent_lock = threading.Lock()
+_queue_depths = {}
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+def set_labels(session=None, scenario=None):
+    """
+    Set the session and scenario attached to spans recorded from the current thread.
+
+    Args:
+        session (str, optional): Session identifier.
+        scenario (str, optional): Selected scenario.
+    """
+    if session is not None:
+        _session.set(str(session))
+    if scenario is not None:
+        _scenario.set(str(scenario))
+
+def _labels():
+    return _session.get(), _scenario.get()
+
+def record(stage, seconds, outcome="ok", labels=None):
+    """
+    Record one stage duration.
+
+    Args:
+        stage (str): Stage name, e.g. "transcription".
+        seconds (float): Measured duration.
+        outcome (str): "ok" or "error".
+        labels (tuple, optional): (session, scenario); defaults to the current labels.
+    """
+    _, scenario = labels or _labels()
+    if _histogram is not None:
+        _histogram.labels(stage=stage, scenario=scenario, outcome=outcome).observe(seconds)
+    with _recent_lock:
+        _recent[stage].append(seconds)
+
+def record_queue_depth(queue, depth):
+    """
+    Record the current number of jobs waiting in a queue.
+
+    Args:
+        queue (str): Queue name, e.g. "transcription".
+        depth (int): Jobs waiting.
+    """
+    if _queue_gauge is not None:
+        _queue_gauge.labels(queue=queue).set(depth)
+    with _recent_lock:
+        _queue_depths[queue] = depth
+
+def queue_depths():
+    """Return the last recorded depth of every queue."""
+    with _recent_lock:
+        return dict(_queue_depths)
+
+def _start_trace_span(stage, labels, attributes):
+    if _tracer is None:
+        return None
+    session, scenario = labels
+    otel_span = _tracer.start_span(stage)
+    otel_span.set_attribute("session", session)
+    otel_span.set_attribute("scenario", scenario)
+    for name, value in attributes.items():
+        otel_span.set_attribute(name, value)
+    return otel_span
+
+def _end_trace_span(otel_span, outcome):
+    if otel_span is not None:
+        otel_span.set_attribute("outcome", outcome)
+        otel_span.end()
+
+@contextlib.contextmanager
+def span(stage, **attributes):
+    """
+    Time a block of code as one stage.
+
+    Example:
+        with span("transcription", model="small"):
+            segments, _ = model.transcribe(audio)
+
+    Args:
+        stage (str): Stage name.
+        **attributes: Extra trace attributes (not used as Prometheus labels).
+    """
+    labels = _labels()
+    otel_span = _start_trace_span(stage, labels, attributes)
+    outcome = "ok"
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, outcome, labels)
+        _end_trace_span(otel_span, outcome)
+
+def timed_iter(stage, iterable, first_stage=None, **attributes):
+    """
+    Time a streamed stage, from the call until the iterable is exhausted.
+
+    Labels are captured when this is called, so the stream may be consumed on
+    another thread (e.g. the media server) and still be attributed to the session.
+
+    Args:
+        stage (str): Stage name for the whole stream.
+        iterable (iterable | callable): The stream, e.g. LLM tokens or TTS chunks, or a
+            function returning it, so that opening the stream counts towards the stage.
+        first_stage (str, optional): Stage name for the time until the first item.
+        **attributes: Extra trace attributes.
+
+    Returns:
+        iterator: The same items.
+    """
+    labels = _labels()
+    start = time.perf_counter()
+
+    def items():
+        otel_span = _start_trace_span(stage, labels, attributes)
+        outcome = "ok"
+        first = True
+        try:
+            for item in iterable() if callable(iterable) else iterable:
+                if first and first_stage:
+                    record(first_stage, time.perf_counter() - start, "ok", labels)
+                first = False
+                yield item
+        except BaseException as e:
+            # A consumer that stops early is not a failed stage
+            if not isinstance(e, GeneratorExit):
+                outcome = "error"
+            raise
+        finally:
+            record(stage, time.perf_counter() - start, outcome, labels)
+            _end_trace_span(otel_span, outcome)
+
+    return items()
+
+def stage_summary():
+    """
+    Summarize the recent durations of every stage recorded in this process.
+
+    Returns:
+        dict: stage -> {"count", "p50", "p95", "p99", "max"} in seconds.
+    """
+    with _recent_lock:
+        recent = {stage: np.array(values) for stage, values in _recent.items() if values}
+
+    summary = {}
+    for stage, values in recent.items():
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary[stage] = {"count": int(values.size), "p50": float(p50), "p95": float(p95),
+                          "p99": float(p99), "max": float(values.max())}
+    return summary
+
+def start_exporter(port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Serve the Prometheus /metrics endpoint once per process.
+
+    Args:
+        port (int): Port to listen on.
+        host (str): Interface to bind.
+
+    Returns:
+        bool: True if the exporter is running.
+    """
+    global _exporter_started
+
+    if prometheus_client is None:
+        print("prometheus_client is not installed; metrics are not exported")
+        return False
+
+    with _exporter_lock:
+        if not _exporter_started:
+            try:
+                prometheus_client.start_http_server(port, addr=host)
+                _exporter_started = True
+            except OSError as e:
+                # Another process (or Streamlit rerun) already serves this port
+                print(f"Error starting metrics exporter on port {port}: {e}")
+        return _exporter_started
+
+if METRICS_PORT:
+    start_exporter()
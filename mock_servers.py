@@ -0,0 +1,344 @@
+"""
+Local stand-ins for the OpenAI and ElevenLabs APIs, for benchmarks and tests without live keys.
+
+Usage:
+    python mock_servers.py --port 8600 --latency 0.3 --token-delay 0.02 --error-rate 0.05
+
+Then point the app at it:
+    OPENAI_BASE_URL=http://localhost:8600/v1
+    ELEVENLABS_BASE_URL=http://localhost:8600
+
+Endpoints:
+    POST /v1/chat/completions                 streaming (SSE) and non-streaming
+    POST /v1/text-to-speech/<voice_id>        chunked audio
+    GET  /v1/convai/conversations             conversation listing
+    GET  /v1/convai/conversations/<id>        conversation details with a growing transcript
+    POST /mock/conversations                  start a new simulated conversation
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MOCK_REPLY = (
+    "Honestly, I'm a little stressed about the timing. We close on the new place in March, "
+    "and I haven't even listed the townhouse yet. What would you do differently to sell it quickly? "
+    "I just want a plan that actually makes sense for our situation."
+)
+
+MOCK_TRANSCRIPT = [
+    ("agent", "Hi, yeah, I just got a note from my lawyer that we're closing in March, and honestly, I'm kind of stressing."),
+    ("user", "I hear you, that sounds like a lot of pressure. Um, what worries you most about the timing?"),
+    ("agent", "Mostly that the market is slow and we'll end up carrying two mortgages."),
+    ("user", "That makes sense. How would it feel to have a clear plan for the next six weeks?"),
+    ("agent", "Honestly, that would be a relief. What would the plan look like?"),
+    ("user", "Let's set up a quick call tomorrow and I'll walk you through pricing and timing, sound good?")
+]
+
+class MockConfig:
+    """Latency and error-injection settings shared by all request handlers."""
+
+    def __init__(self, latency=0.2, token_delay=0.02, chunk_delay=0.05, chunk_size=4096,
+                 error_rate=0.0, error_status=500, conversation_seconds=30.0, agent_id="mock-agent"):
+        """
+        Args:
+            latency (float): Seconds before the first byte of every response.
+            token_delay (float): Seconds between streamed chat completion tokens.
+            chunk_delay (float): Seconds between TTS audio chunks.
+            chunk_size (int): Bytes per TTS audio chunk.
+            error_rate (float): Probability (0-1) that a request fails.
+            error_status (int): HTTP status returned for injected failures.
+            conversation_seconds (float): How long a simulated conversation stays in progress.
+            agent_id (str): Agent id reported by the conversation endpoints.
+        """
+        self.latency = latency
+        self.token_delay = token_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.conversation_seconds = conversation_seconds
+        self.agent_id = agent_id
+        self.conversations = []
+        self.lock = threading.Lock()
+
+    def start_conversation(self):
+        """Start a simulated conversation and return its id."""
+        conversation_id = f"conv_{uuid.uuid4().hex[:16]}"
+        with self.lock:
+            self.conversations.insert(0, {"conversation_id": conversation_id, "started_at": time.time()})
+        return conversation_id
+
+def sample_from_schema(schema):
+    """Build a value that satisfies a (structured-output style) JSON schema."""
+    if "enum" in schema:
+        return random.choice(schema["enum"])
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: sample_from_schema(sub) for name, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_from_schema(schema.get("items", {"type": "string"})) for _ in range(2)]
+    if kind == "integer":
+        return random.randint(schema.get("minimum", 1), schema.get("maximum", 5))
+    if kind == "number":
+        return round(random.uniform(0, 1), 2)
+    if kind == "boolean":
+        return True
+    return "Mock feedback sentence."
+
+def _tokens(text):
+    # Roughly one token per word, keeping the whitespace
+    words = text.split(" ")
+    return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading a stream early
+            self.close_connection = True
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _inject(self):
+        """Apply the configured latency; return True if this request should fail."""
+        time.sleep(self.config.latency)
+        if random.random() < self.config.error_rate:
+            self._send_json({"error": {"message": "Injected failure", "type": "mock_error"}},
+                            status=self.config.error_status)
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts[-2:] == ["convai", "conversations"]:
+            if not self._inject():
+                self._send_json(self._list_conversations())
+        elif len(parts) >= 3 and parts[-3:-1] == ["convai", "conversations"]:
+            if not self._inject():
+                conversation = self._conversation_details(parts[-1])
+                if conversation is None:
+                    self._send_json({"detail": "Conversation not found"}, status=404)
+                else:
+                    self._send_json(conversation)
+        else:
+            self._send_json({"detail": "Not found"}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        payload = self._read_json()
+
+        if parts[-2:] == ["chat", "completions"]:
+            if not self._inject():
+                self._chat_completion(payload)
+        elif len(parts) >= 2 and parts[-2] == "text-to-speech":
+            if not self._inject():
+                self._text_to_speech(payload, parse_qs(url.query))
+        elif parts == ["mock", "conversations"]:
+            self._send_json({"conversation_id": self.config.start_conversation()})
+        else:
+            self._send_json({"detail": "Not found"}, status=404)
+
+    def _chat_completion(self, payload):
+        response_format = payload.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            content = json.dumps(sample_from_schema(response_format["json_schema"]["schema"]))
+        elif response_format.get("type") == "json_object":
+            content = json.dumps({"result": MOCK_REPLY})
+        else:
+            content = MOCK_REPLY
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = payload.get("model", "gpt-4o")
+        created = int(time.time())
+
+        if not payload.get("stream"):
+            time.sleep(self.config.token_delay * len(_tokens(content)))
+            self._send_json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": len(_tokens(content)), "total_tokens": 100 + len(_tokens(content))}
+            })
+            return
+
+        self._start_chunked("text/event-stream")
+
+        def event(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        event({"role": "assistant", "content": ""})
+        for token in _tokens(content):
+            time.sleep(self.config.token_delay)
+            event({"content": token})
+        event({}, "stop")
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_chunked()
+
+    def _text_to_speech(self, payload, query):
+        text = payload.get("text", "")
+        output_format = (query.get("output_format") or ["mp3_44100_128"])[0]
+        content_type = "audio/mpeg" if output_format.startswith("mp3") else "application/octet-stream"
+
+        # About one second of 128 kbps audio per 15 characters of text
+        total = max(self.config.chunk_size, len(text) * 16000 // 15)
+        self._start_chunked(content_type)
+        sent = 0
+        while sent < total:
+            size = min(self.config.chunk_size, total - sent)
+            self._write_chunk(b"\xff" * size)
+            sent += size
+            time.sleep(self.config.chunk_delay)
+        self._end_chunked()
+
+    def _conversation_state(self, conversation):
+        elapsed = time.time() - conversation["started_at"]
+        done = elapsed >= self.config.conversation_seconds
+        # The transcript grows evenly over the conversation
+        turns = len(MOCK_TRANSCRIPT) if done else int(len(MOCK_TRANSCRIPT) * elapsed / self.config.conversation_seconds)
+        return done, turns, elapsed
+
+    def _list_conversations(self):
+        with self.config.lock:
+            conversations = list(self.config.conversations)
+        summaries = []
+        for conversation in conversations:
+            done, turns, elapsed = self._conversation_state(conversation)
+            summaries.append({
+                "agent_id": self.config.agent_id,
+                "agent_name": "Mock Agent",
+                "conversation_id": conversation["conversation_id"],
+                "start_time_unix_secs": int(conversation["started_at"]),
+                "call_duration_secs": int(min(elapsed, self.config.conversation_seconds)),
+                "message_count": turns,
+                "status": "done" if done else "in-progress",
+                "call_successful": "success" if done else "unknown"
+            })
+        return {"conversations": summaries, "has_more": False, "next_cursor": None}
+
+    def _conversation_details(self, conversation_id):
+        with self.config.lock:
+            conversation = next((c for c in self.config.conversations if c["conversation_id"] == conversation_id), None)
+        if conversation is None:
+            return None
+
+        done, turns, elapsed = self._conversation_state(conversation)
+        step = self.config.conversation_seconds / len(MOCK_TRANSCRIPT)
+        return {
+            "agent_id": self.config.agent_id,
+            "conversation_id": conversation_id,
+            "status": "done" if done else "in-progress",
+            "transcript": [
+                {"role": role, "message": message, "time_in_call_secs": int(i * step)}
+                for i, (role, message) in enumerate(MOCK_TRANSCRIPT[:turns])
+            ],
+            "metadata": {
+                "start_time_unix_secs": int(conversation["started_at"]),
+                "call_duration_secs": int(min(elapsed, self.config.conversation_seconds))
+            }
+        }
+
+def start_mock_server(config=None, host="127.0.0.1", port=8600):
+    """
+    Start the mock server in a daemon thread.
+
+    Args:
+        config (MockConfig, optional): Latency and error settings.
+        host (str): Interface to bind.
+        port (int): Port to bind (0 picks a free port).
+
+    Returns:
+        tuple: (server, base_url)
+    """
+    config = config or MockConfig()
+    handler = type("MockRequestHandler", (_MockRequestHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run local stand-ins for the OpenAI and ElevenLabs APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first byte of every response")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed tokens")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="Seconds between TTS audio chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability that a request fails")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--conversation-seconds", type=float, default=30.0,
+                        help="How long a simulated conversation stays in progress")
+    parser.add_argument("--agent-id", default="mock-agent")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency=args.latency,
+        token_delay=args.token_delay,
+        chunk_delay=args.chunk_delay,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        conversation_seconds=args.conversation_seconds,
+        agent_id=args.agent_id
+    )
+    config.start_conversation()
+    server, base_url = start_mock_server(config, args.host, args.port)
+    print(f"Mock OpenAI/ElevenLabs server on {base_url} (OPENAI_BASE_URL={base_url}/v1, ELEVENLABS_BASE_URL={base_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
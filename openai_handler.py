@@ -1,12 +1,96 @@
 from openai import OpenAI
+import hashlib
 import json
+import re
 import streamlit as st
+import threading
+from config import get_setting
+from conversation_memory import ConversationMemory
+from incremental_json import is_complete, parse_partial
+from metrics import span, timed_iter
+from scenarios import get_scenario
+from speech_metrics import FILLER_SCORE_THRESHOLDS, compute_speech_metrics, format_speech_facts
+from token_counter import count_tokens
+from transcript_format import fit_transcript
 
-# Get API key from environment variable
-OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
+# Get API key from environment variable (or Streamlit secrets)
+OPENAI_API_KEY = get_setting("OPENAI_API_KEY")
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Point the client at another server, e.g. the local stand-in from mock_servers.py
+OPENAI_BASE_URL = get_setting("OPENAI_BASE_URL")
+
+_client = None
+_client_lock = threading.Lock()
+
+# Shortest piece of a streamed reply that is handed to TTS on its own
+MIN_SPEECH_CHUNK_CHARS = get_setting("MIN_SPEECH_CHUNK_CHARS", 12, cast=int)
+# Cheaper model used to roll old turns into the running conversation summary
+SUMMARY_MODEL = get_setting("SUMMARY_MODEL", "gpt-4o-mini")
+EVALUATION_MODEL = "gpt-4o"
+
+def get_client():
+    """
+    Returns the OpenAI client shared by the whole process.
+
+    The client is built on first use, so importing this module (e.g. from
+    batch_evaluate.py) works without OPENAI_API_KEY set.
+
+    Returns:
+        OpenAI: The shared client.
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        return _client
+
+def summarize_turns(summary, turns):
+    """
+    Fold conversation turns into the running summary of a conversation.
+
+    Args:
+        summary (str): The summary so far (may be empty).
+        turns (list): Message dicts that are leaving the verbatim window.
+
+    Returns:
+        str: The updated summary.
+    """
+    transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+    with span("llm_summary", model=SUMMARY_MODEL):
+        response = get_client().chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": "You maintain a concise running summary of a role-play conversation. "
+                                              "Keep facts, commitments, questions asked and the persona's current mood. "
+                                              "Reply with the updated summary only."},
+                {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+            ],
+            temperature=0
+        )
+    return response.choices[0].message.content.strip()
+
+def _build_messages(user_input, conversation_history, scenario):
+    """
+    Build the chat messages for a turn.
+
+    The scenario prompt comes first and never changes during a session, so the
+    provider's prompt cache can reuse it; the history follows as structured turns.
+    A ConversationMemory is compacted into its running summary when over budget;
+    a plain list is only trimmed to the budget, since it has nowhere to keep a summary.
+    """
+    if isinstance(conversation_history, ConversationMemory):
+        memory = conversation_history
+        memory.compact(summarize_turns)
+    else:
+        memory = ConversationMemory.from_history(conversation_history)
+        memory.compact()
+
+    return (
+        [{"role": "system", "content": get_system_message(scenario)}]
+        + memory.messages()
+        + [{"role": "user", "content": user_input}]
+    )
 
 def get_openai_response(user_input, conversation_history, scenario="General Conversation"):
     """
@@ -14,6 +98,7 @@ def get_openai_response(user_input, conversation_history, scenario="General Conv
     
     Args:
         user_input (str): The transcribed user message
+        conversation_history (ConversationMemory | list): The session's memory, or a list of message dicts
         scenario (str): The selected conversation scenario
         
     Returns:
@@ -26,25 +111,88 @@ def get_openai_response(user_input, conversation_history, scenario="General Conv
         return "I couldn't understand that. Could you please try speaking again?"
     
     try:
-        # Create system message based on selected scenario
-        system_message = get_system_message(scenario)
-        system_message = f"{system_message} Here is your conversation history with the user: {conversation_history}"
-        
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_input}
-            ]
-        )
+        messages = _build_messages(user_input, conversation_history, scenario)
+        with span("llm", model="gpt-4o"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o",
+                messages=messages
+            )
         
         return response.choices[0].message.content
     
     except Exception as e:
         return f"Error generating response: {str(e)}"
 
+def stream_openai_response(user_input, conversation_history, scenario="General Conversation"):
+    """
+    Stream the response from OpenAI API as tokens arrive.
+
+    Args:
+        user_input (str): The transcribed user message
+        conversation_history (ConversationMemory | list): The session's memory, or a list of message dicts
+        scenario (str): The selected conversation scenario
+
+    Yields:
+        str: Pieces of the AI response (or a single error message)
+    """
+    if not OPENAI_API_KEY:
+        yield "Error: OpenAI API key not found. Please set the OPENAI_API_KEY environment variable."
+        return
+
+    if not user_input:
+        yield "I couldn't understand that. Could you please try speaking again?"
+        return
+
+    try:
+        messages = _build_messages(user_input, conversation_history, scenario)
+        stream = timed_iter("llm", lambda: get_client().chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            stream=True
+        ), first_stage="llm_first_token", model="gpt-4o")
+
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    except Exception as e:
+        yield f"Error generating response: {str(e)}"
+
+# End of a sentence: terminal punctuation, optional closing quotes/brackets, then whitespace
+SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*\s+")
+# Words whose trailing period doesn't end a sentence
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "e.g.", "i.e.", "etc.", "approx."}
+
+def split_sentences(tokens, min_chars=MIN_SPEECH_CHUNK_CHARS):
+    """
+    Group streamed text into speakable chunks, yielding each one as soon as it is complete.
+
+    Args:
+        tokens (iterable): Pieces of text, e.g. from `stream_openai_response`.
+        min_chars (int): Shortest chunk to hand to TTS; shorter sentences are merged
+            with the next one so the speech keeps a natural rhythm.
+
+    Yields:
+        str: Complete sentences (the last one may lack terminal punctuation).
+    """
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        start = 0
+        for match in SENTENCE_END.finditer(buffer):
+            sentence = buffer[start:match.end()].strip()
+            last_word = sentence.rsplit(None, 1)[-1].lower() if sentence else ""
+            if len(sentence) < min_chars or last_word in ABBREVIATIONS:
+                continue
+            yield sentence
+            start = match.end()
+        buffer = buffer[start:]
+
+    if buffer.strip():
+        yield buffer.strip()
+
 def get_system_message(scenario):
     """
     Get the system message based on the selected scenario.
@@ -55,56 +203,219 @@ def get_system_message(scenario):
     Returns:
         str: System message for OpenAI
     """
-    scenarios = {
-        "General Conversation": 
-            "You are a helpful voice assistant. Respond to the user's questions and requests in a friendly manner.",
-
-        "Timing the Market":
-            "You are a homeowner who is trying to sell your townhouse. You've already purchased a new home, and it's set to close in March, "
-            "but you haven't listed your current townhouse for sale yet. Here's your situation:"
-            "Primary concerns:"
-                "1. You're feeling stressed and anxious about timing — your new home closes in March, and time is running out."
-                "2. You're concerned about current slow real estate market conditions and buyer demand."
-                "3. You're unsure whether now is the right time to list your property or if waiting might be smarter."
-                "4. You need to sell your townhouse to complete the transition to your new home — financially and logistically."
-            "Your personality and communication style:"
-                "- You're genuinely concerned, but you're not in panic mode."
-                "- You ask thoughtful, specific questions about market conditions and the home-selling process."
-                "- You're skeptical of real estate agent pitches and don't respond well to pressure."
-                "- You want practical, data-backed advice — not vague reassurance."
-                "- You're open to professional guidance, but only after you feel understood and heard."
-            "When speaking with real estate agents:"
-                "- Start by sharing your stress about the March closing and concerns about the slow market."
-                "- Once they respond, ask directly what sets them apart from other agents."
-                "- Focus on strategies and real action — not just promises or big talk."
-                "- Respond more openly to agents who take time to ask about your situation and offer tailored insights."
-                "- Be cautious with agents who immediately jump into sales mode or push for a listing appointment without listening."
-            "Sample dialogue to use (adapt it naturally, don't use the exact statements):"
-                "- Initial statement: 'Hi, yeah, I just got a note from my lawyer that we're closing in March, and honestly, I'm kind of stressing because I still need to sell my townhouse. But with how slow the market's been lately… I don't know if it's even a good time to list.'"
-                "- Follow-up question: 'I appreciate that… but can I ask — how do you think your team could sell my house faster than someone else? Like, what would you actually do differently?'"
-            "Your townhouse details (provide consistent responses if asked):"
-                "- It's a 3 bedroom, 2.5 bathroom townhouse"
-                "- Built in 2012"
-                "- Located in a quiet suburban neighborhood"
-                "- It has a small backyard"
-                "- Includes a 2-car garage"
-                "- You've lived there for about 7 years"
-                "- You're moving because you need more space for your growing family"
-            "Stay fully in character as the homeowner throughout the conversation. Your goal is not to evaluate or hire an agent yet — it's to ask smart questions, get clarity, and see who actually listens and understands your needs.",
+    return get_scenario(scenario).persona
+
+
+EVALUATION_PROMPT = """
+    You are a professional communication coach evaluating a conversation between a seller and an agent.
+    The transcript has one turn per line, tagged SELLER: or AGENT:; bracketed lines summarize or note omitted turns.
+    Rate the agent's performance on each category using a 1-5 scale:
+
+    Scoring Rubric:
+     5 - Outstanding: Natural, confident, empathetic, and highly value-driven  
+     4 - Strong: Good delivery with minor polish needed
+     3 - Okay: Covered the basics but lacked emotional or strategic depth  
+     2 - Incomplete: Made an attempt but missed key elements  
+     1 - Needs Work: Confusing, pitch-heavy, or disconnected from seller needs
+
+    Evaluation Categories:
+    - Friendly Greeting / Tone  
+    - Tactical Empathy: mirroring, labeling, or validating emotion  
+    - Strategic Follow-Up Questions  
+    - Storytelling or Analogies: to make a point or ease fear  
+    - Avoiding Pitching / Being Self-Centered  
+    - Positioning Seller as the Hero  
+    - Clear Next Step / Call to Action 
+
+    Measured facts about the agent's speech (word counts, filler words, questions, talk share, pace) are given
+    after the conversation. They are exact, so rely on them instead of counting or estimating these yourself.
+
+    Give a detailed performance review feedback of the agent based on tactical empathy skills (mirroring, labeling, calibrated questions, future pacing, emotional framing).
+    Focus the review on what the agent did well, what he can improve, and give a final score out of 10. Be specific and tactical.
+    The agent is using this to sharpen his/her communication and negotiation skills.
+
+    The structure of the feedback MUST be as follows:
         
-        "Technical Support": 
-            "You are a technical support specialist. Help the user troubleshoot and resolve technical issues with their devices, software, or services.",
+        What You Did Well: 
+
+        Opportunities to Improve:
+
+        Power Line to Practice:
+
+        One to two additional feedback sentences
+
+    Important:Each element of the feedback MUST be on a separate new line and the titles MUST be bold.
+
+    Here is an example feedback based on the above structure:
+    EXAMPLE FEEDBACK:
+        
+        **What You Did Well**: 
+            - **Labeling**: “It sounds like you are concerned…” was spot on and opened the door. 
+            - **Empathy + Reframing**: You acknowledged my concerns about overpaying and reframed the timing discussion with long-term thinking and historical context. 
+            - **Future Pacing & Emotional Framing**: “How would you feel if…” was a solid move to create emotional contrast. 
+            - **Handled Objections Gently**: You didn't rush or push. Instead, you used soft language like “Austin will explain…” and gave a clear next step without pressure. 
+            - **Collaborative Language**: Loved “That is my job to make sure…” — it positioned you as a partner. 
+        
+        **Opportunities to Improve**: 
+            - Some of your sentences could use light polish for smoother delivery — try reading them out loud during practice. 
+            - Consider using a mirror earlier in the convo (e.g., “Feels weird?”) to open the client up further. 
+            - Before giving advice, slip in a “Help me understand…” to make your coaching feel even more empathetic and client-led. 
         
-        "Travel Planning": 
-            "You are a travel advisor. Help the user plan their trips, recommend destinations, suggest activities, and provide travel tips.",
+        **Power Line to Practice**: 
+            “Help me understand what makes you feel like prices might drop soon — is it something specific you've seen or just a general gut feeling?” 
         
-        "Health Advice": 
-            "You are a health information assistant. Provide general health information and wellness tips. Always remind users to consult healthcare professionals for medical advice."
+        You're clearly applying what you've studied — keep sharpening that active listening and soft framing!
 
-    }
-    
-    return scenarios.get(scenario, scenarios["General Conversation"])
+    Return the result as a JSON object. "scores" maps each category name above (without its description) to its 1-5 score.
+    "feedback" holds "What You Did Well" and "Opportunities to Improve" as lists of points, and "Power Line to Practice"
+    and "Additional Feedback" as plain sentences.
+    """
+
+EVALUATION_CATEGORIES = [
+    "Friendly Greeting / Tone",
+    "Tactical Empathy",
+    "Strategic Follow-Up Questions",
+    "Storytelling or Analogies",
+    "Avoiding Pitching / Being Self-Centered",
+    "Positioning Seller as the Hero",
+    "Managing Filler Words",
+    "Clear Next Step / Call to Action"
+]
+
+# Scored locally from the measured filler rate instead of by the model
+FILLER_CATEGORY = "Managing Filler Words"
+MODEL_CATEGORIES = [category for category in EVALUATION_CATEGORIES if category != FILLER_CATEGORY]
+
+FEEDBACK_SECTIONS = ["What You Did Well", "Opportunities to Improve", "Power Line to Practice", "Additional Feedback"]
+
+# Structured-output schema: the model can only return scores for the categories it
+# grades (in this order, before the feedback) and the four feedback sections.
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scores": {
+            "type": "object",
+            "properties": {category: {"type": "integer", "enum": [1, 2, 3, 4, 5]} for category in MODEL_CATEGORIES},
+            "required": MODEL_CATEGORIES,
+            "additionalProperties": False
+        },
+        "feedback": {
+            "type": "object",
+            "properties": {
+                "What You Did Well": {"type": "array", "items": {"type": "string"}},
+                "Opportunities to Improve": {"type": "array", "items": {"type": "string"}},
+                "Power Line to Practice": {"type": "string"},
+                "Additional Feedback": {"type": "string"}
+            },
+            "required": FEEDBACK_SECTIONS,
+            "additionalProperties": False
+        }
+    },
+    "required": ["scores", "feedback"],
+    "additionalProperties": False
+}
+
+EVALUATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "evaluation", "strict": True, "schema": EVALUATION_SCHEMA}
+}
+
+# Stored evaluations are keyed by this version, so changing the rubric, schema, model
+# or the local filler scoring re-grades
+RUBRIC_VERSION = hashlib.sha256(
+    f"{EVALUATION_MODEL}\n{EVALUATION_PROMPT}\n{json.dumps(EVALUATION_SCHEMA, sort_keys=True)}\n"
+    f"{FILLER_SCORE_THRESHOLDS}".encode("utf-8")
+).hexdigest()[:16]
+
+def build_evaluation_messages(conversation_history, speech_metrics=None, summarize=None, strict=False):
+    """
+    Build the chat messages that ask the model to grade a conversation.
+
+    The transcript is sent as tagged lines within EVALUATION_TRANSCRIPT_MAX_TOKENS,
+    and the tokens saved compared with the raw message list are logged.
+
+    Args:
+        conversation_history (list): List of message dicts
+        speech_metrics (dict, optional): Result of `compute_speech_metrics` for the
+            conversation. Computed here if not given.
+        summarize (callable, optional): Summarizer for the middle of sessions over
+            budget, e.g. `summarize_turns`. Without it those turns are left out.
+        strict (bool): Raise summarizer errors instead of leaving the turns out.
+
+    Returns:
+        list: Messages for the chat completions API
+    """
+    if speech_metrics is None:
+        speech_metrics = compute_speech_metrics(conversation_history)
+    transcript, stats = fit_transcript(conversation_history, summarize=summarize, model=EVALUATION_MODEL,
+                                       strict=strict)
+
+    raw_tokens = count_tokens(str(conversation_history), EVALUATION_MODEL)
+    trimmed = ""
+    if stats["summarized_turns"] or stats["omitted_turns"] or stats["truncated_lines"]:
+        trimmed = (f", {stats['summarized_turns']} turns summarized, {stats['omitted_turns']} left out and "
+                   f"{stats['truncated_lines']} lines cut short to fit {stats['full_tokens']} tokens into the budget")
+    print(f"Evaluation transcript: {stats['tokens']} tokens instead of {raw_tokens} "
+          f"({raw_tokens - stats['tokens']} saved{trimmed})")
+
+    return [
+        {"role": "system", "content": EVALUATION_PROMPT},
+        {"role": "user", "content": f"Conversation:\n{transcript}\n\n"
+                                    f"Measured speech facts:\n{format_speech_facts(speech_metrics)}"}
+    ]
+
+def validate_evaluation(result):
+    """
+    Check an evaluation against EVALUATION_SCHEMA.
+
+    Args:
+        result (dict): Parsed evaluation
+
+    Returns:
+        dict: The same evaluation
+
+    Raises:
+        ValueError: If a category score or feedback section is missing or malformed. The
+            locally scored filler category may be missing when the trainee said nothing.
+    """
+    scores = result.get("scores")
+    feedback = result.get("feedback")
+    if not isinstance(scores, dict) or not isinstance(feedback, dict):
+        raise ValueError("Evaluation must contain 'scores' and 'feedback' objects")
 
+    for category in EVALUATION_CATEGORIES:
+        if category == FILLER_CATEGORY and category not in scores:
+            continue
+        if scores.get(category) not in (1, 2, 3, 4, 5):
+            raise ValueError(f"Invalid score for '{category}': {scores.get(category)!r}")
+
+    for section, schema in EVALUATION_SCHEMA["properties"]["feedback"]["properties"].items():
+        expected = list if schema["type"] == "array" else str
+        if not isinstance(feedback.get(section), expected):
+            raise ValueError(f"Invalid feedback section '{section}'")
+
+    return result
+
+def parse_evaluation(content, speech_metrics):
+    """
+    Parse the model's evaluation reply and add the locally scored categories.
+
+    Args:
+        content (str): The JSON text returned by the model
+        speech_metrics (dict): Result of `compute_speech_metrics` for the conversation
+
+    Returns:
+        dict: Scores (in EVALUATION_CATEGORIES order, without the filler category if
+            the trainee said nothing) and feedback
+    """
+    result = json.loads(content.strip())
+    scores = result.get("scores")
+    if isinstance(scores, dict):
+        if speech_metrics["filler_score"] is not None:
+            scores = dict(scores, **{FILLER_CATEGORY: speech_metrics["filler_score"]})
+        result["scores"] = {category: scores.get(category) for category in EVALUATION_CATEGORIES
+                            if category in scores or category != FILLER_CATEGORY}
+    return validate_evaluation(result)
 
 def evaluate_conversation(conversation_history):
     """
@@ -112,107 +423,74 @@ def evaluate_conversation(conversation_history):
     
     Args:
         conversation_history (list): List of message dicts in format:
-            [{"role": "system"|"assistant"|"user", "content": "..."}, ...]
+            [{"role": "assistant"|"user", "content": "..."}, ...]
     
     Returns:
         dict: Scores for each evaluation category (1-5 scale)
     """
-    EVALUATION_PROMPT = """
-        You are a professional communication coach evaluating a conversation between a seller and an agent.
-        Rate the agent's performance on each category using a 1-5 scale:
-
-        Scoring Rubric:
-         5 - Outstanding: Natural, confident, empathetic, and highly value-driven  
-         4 - Strong: Good delivery with minor polish needed
-         3 - Okay: Covered the basics but lacked emotional or strategic depth  
-         2 - Incomplete: Made an attempt but missed key elements  
-         1 - Needs Work: Confusing, pitch-heavy, or disconnected from seller needs
-
-        Evaluation Categories:
-        - Friendly Greeting / Tone  
-        - Tactical Empathy (mirroring, labeling, or validating emotion)  
-        - Strategic Follow-Up Questions  
-        - Storytelling or Analogies (to make a point or ease fear)  
-        - Avoiding Pitching / Being Self-Centered  
-        - Positioning Seller as the Hero  
-        - Managing Filler Words (e.g., um, like, sort of)  
-        - Clear Next Step / Call to Action 
-
-        Give a detailed performance review feedback of the agent based on tactical empathy skills (mirroring, labeling, calibrated questions, future pacing, emotional framing).
-        Focus the review on what the agent did well, what he can improve, and give a final score out of 10. Be specific and tactical.
-        The agent is using this to sharpen his/her communication and negotiation skills.
-
-        The structure of the feedback MUST be as follows:
-            
-            What You Did Well: 
-
-            Opportunities to Improve:
-
-            Power Line to Practice:
-
-            One to two additional feedback sentences
-
-        Important:Each element of the feedback MUST be on a separate new line and the titles MUST be bold.
-
-        Here is an example feedback based on the above structure:
-        EXAMPLE FEEDBACK:
-            
-            **What You Did Well**: 
-                - **Labeling**: “It sounds like you are concerned…” was spot on and opened the door. 
-                - **Empathy + Reframing**: You acknowledged my concerns about overpaying and reframed the timing discussion with long-term thinking and historical context. 
-                - **Future Pacing & Emotional Framing**: “How would you feel if…” was a solid move to create emotional contrast. 
-                - **Handled Objections Gently**: You didn't rush or push. Instead, you used soft language like “Austin will explain…” and gave a clear next step without pressure. 
-                - **Collaborative Language**: Loved “That is my job to make sure…” — it positioned you as a partner. 
-            
-            **Opportunities to Improve**: 
-                - Some of your sentences could use light polish for smoother delivery — try reading them out loud during practice. 
-                - Consider using a mirror earlier in the convo (e.g., “Feels weird?”) to open the client up further. 
-                - Before giving advice, slip in a “Help me understand…” to make your coaching feel even more empathetic and client-led. 
-            
-            **Power Line to Practice**: 
-                “Help me understand what makes you feel like prices might drop soon — is it something specific you've seen or just a general gut feeling?” 
-            
-            You're clearly applying what you've studied — keep sharpening that active listening and soft framing!
-
-        Only return the scores and feedback in a valid JSON object format, like below:
-        {
-            "scores": {
-                "Friendly Greeting / Tone": 4,
-                "Tactical Empathy": 5,
-                ...
-            },
-            "feedback": {
-              "What You Did Well": [
-                "Labeling: 'It sounds like you are concerned…' was spot on and opened the door.",
-                "Empathy + Reframing: You acknowledged my concerns and used historical context to shift the conversation.",
-                "Collaborative Language: 'That is my job to make sure…' positioned you as a trusted partner."
-                ],
-              "Opportunities to Improve": [
-                "Use a warmer opening to establish a stronger initial connection.",
-                "Incorporate mirroring earlier to open the client up further.",
-                "Try using 'Help me understand…' before giving advice."
-                ],
-              "Power Line to Practice": "Help me understand what makes you feel like prices might drop soon — is it something specific you've seen or just a general gut feeling?",
-              "Additional Feedback": "You're clearly applying what you've studied — keep sharpening that active listening and soft framing!"
-            }
-        }
-
-        Important: The response should NOT include any other text, just the JSON object without wrapping quotes.
-        """
-
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": EVALUATION_PROMPT},
-                {"role": "user", "content": f"Here is the full conversation:\n\n{conversation_history}"}
-            ],
-            temperature=0
-        )
+        speech_metrics = compute_speech_metrics(conversation_history)
+        with span("evaluation", model=EVALUATION_MODEL):
+            response = get_client().chat.completions.create(
+                model=EVALUATION_MODEL,
+                messages=build_evaluation_messages(conversation_history, speech_metrics, summarize_turns),
+                response_format=EVALUATION_RESPONSE_FORMAT,
+                temperature=0
+            )
         
-        content = response.choices[0].message.content.strip()
-        return json.loads(content)
+        return parse_evaluation(response.choices[0].message.content, speech_metrics)
 
     except Exception as e:
         return {"error": str(e)}
 
+def stream_evaluation(conversation_history):
+    """
+    Evaluate a conversation in streaming mode, reporting each part as soon as it arrives.
+
+    The locally measured filler score is reported first; the reply is then parsed
+    incrementally, so a category's score is reported as soon as its value is
+    complete, followed by each feedback section.
+
+    Args:
+        conversation_history (list): List of message dicts
+
+    Yields:
+        tuple: ("score", category, score), ("feedback", section, value), then either
+            ("result", evaluation) with the validated evaluation or ("error", message)
+    """
+    try:
+        speech_metrics = compute_speech_metrics(conversation_history)
+        if speech_metrics["filler_score"] is not None:
+            yield ("score", FILLER_CATEGORY, speech_metrics["filler_score"])
+
+        stream = timed_iter("evaluation", lambda: get_client().chat.completions.create(
+            model=EVALUATION_MODEL,
+            messages=build_evaluation_messages(conversation_history, speech_metrics, summarize_turns),
+            response_format=EVALUATION_RESPONSE_FORMAT,
+            temperature=0,
+            stream=True
+        ), first_stage="evaluation_first_token", model=EVALUATION_MODEL)
+
+        content = ""
+        reported = set()
+        for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            content += chunk.choices[0].delta.content
+
+            partial = parse_partial(content)
+            if not isinstance(partial, dict):
+                continue
+            for category, score in (partial.get("scores") or {}).items():
+                if ("score", category) not in reported:
+                    reported.add(("score", category))
+                    yield ("score", category, score)
+            for section, value in (partial.get("feedback") or {}).items():
+                if ("feedback", section) not in reported and is_complete(value):
+                    reported.add(("feedback", section))
+                    yield ("feedback", section, value)
+
+        yield ("result", parse_evaluation(content, speech_metrics))
+
+    except Exception as e:
+        yield ("error", str(e))
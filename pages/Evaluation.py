@@ -1,6 +1,10 @@
 import streamlit as st
 import numpy as np
-from openai_handler import evaluate_conversation
+from openai_handler import EVALUATION_CATEGORIES, FILLER_CATEGORY, RUBRIC_VERSION, stream_evaluation
+from evaluation_store import evaluation_store, transcript_hash
+from metrics import set_labels
+from session_store import session_store
+from speech_metrics import compute_speech_metrics
 
 # Set page config
 st.set_page_config(
@@ -90,72 +94,134 @@ with st.sidebar:
 # === Main Content ===
 st.markdown('<h1 class="main-header">📋 Agent Evaluation Scorecard</h1>', unsafe_allow_html=True)
 
-@st.cache_data(show_spinner=True)
-def get_evaluation_result(conversation):
-    return evaluate_conversation(conversation)
-
-conversation = st.session_state.get("conversation", [])
-
-if not conversation:
-    st.warning("No conversation found. Please interact with the assistant first.")
-else:
-    evaluation_result = get_evaluation_result(conversation)
-    evaluation_scores = evaluation_result.get("scores", {})
-    feedback = evaluation_result.get("feedback", "")
-
-    st.subheader("🌟 Evaluation Results")
-
-    for idx, (criterion, score) in enumerate(evaluation_scores.items(), start=1):
-        stars = "⭐" * int(score) + "☆" * (5 - int(score))
-        with st.container():
-            st.markdown(f"""
-            <div class="card">
-                <div style="display: flex; justify-content: space-between;">
-                    <div><strong>{idx}. {criterion}</strong></div>
-                    <div class="star-score">{stars}</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-
+def render_score_card(placeholder, idx, criterion, score=None):
+    # Cards are drawn empty first and filled in as soon as their score arrives
+    stars = "⭐" * int(score) + "☆" * (5 - int(score)) if score is not None else "⏳"
+    placeholder.markdown(f"""
+    <div class="card">
+        <div style="display: flex; justify-content: space-between;">
+            <div><strong>{idx}. {criterion}</strong></div>
+            <div class="star-score">{stars}</div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+def render_average(placeholder, evaluation_scores):
     average_score = np.mean(list(evaluation_scores.values()))
-    st.divider()
-    
     score_label = get_score_label(average_score)
-    st.subheader(f"🎯 Average Score: {average_score:.2f} / 10.00 - {score_label}")
-
-    # Construct the feedback box content
+    placeholder.subheader(f"🎯 Average Score: {average_score:.2f} / 10.00 - {score_label}")
+
+def render_speech_metrics(speech):
+    # Measured locally from the transcript, so these show before the model replies
+    st.subheader("🗣️ Speech Metrics")
+    talk_share, pace, fillers, questions, turns = st.columns(5)
+    talk_share.metric("Your Talk Share", f"{speech['talk_ratio']:.0%}" if speech["talk_ratio"] is not None else "–")
+    pace.metric("Pace", f"{speech['words_per_minute']:.0f} wpm" if speech["words_per_minute"] is not None else "–")
+    fillers.metric("Filler Words", speech["filler_count"],
+                   help=f"{speech['filler_rate']:.1f} per 100 words" if speech["filler_rate"] is not None else None)
+    questions.metric("Questions", speech["questions"], help=f"{speech['open_questions']} open-ended")
+    turns.metric("Avg Turn", f"{speech['average_turn_words']:.0f} words",
+                 help=f"Longest: {speech['longest_turn_words']} words")
+    if speech["fillers"]:
+        st.caption("Fillers: " + ", ".join(f"{word} ×{count}" for word, count in speech["fillers"].items()))
+
+def build_feedback_box(feedback):
+    # Only the sections received so far are included
     feedback_box = """
     <div class="feedback-box">
         <h4>✅ Performance Review:</h4>
-        <h6>What You Did Well:</h6>
-        <ul>
     """
 
-    for item in feedback["What You Did Well"]:
-        feedback_box += f"<li>{item}</li>"
+    if "What You Did Well" in feedback:
+        feedback_box += "<h6>What You Did Well:</h6><ul>"
+        for item in feedback["What You Did Well"]:
+            feedback_box += f"<li>{item}</li>"
+        feedback_box += "</ul>"
 
-    feedback_box += """
-        </ul>
-        <h6>Opportunities to Improve:</h6>
-        <ul>
-    """
+    if "Opportunities to Improve" in feedback:
+        feedback_box += "<h6>Opportunities to Improve:</h6><ul>"
+        for item in feedback["Opportunities to Improve"]:
+            feedback_box += f"<li>{item}</li>"
+        feedback_box += "</ul>"
 
-    for item in feedback["Opportunities to Improve"]:
-        feedback_box += f"<li>{item}</li>"
-   
-    feedback_box += f"""
-        </ul>
+    if "Power Line to Practice" in feedback:
+        feedback_box += f"""
         <h6>Power Line to Practice:</h6>
         "{feedback["Power Line to Practice"]}"
-    """
-
-    feedback_box += "<br/><br/>"
+        """
 
-    feedback_box += f"""
+    if "Additional Feedback" in feedback:
+        feedback_box += "<br/><br/>"
+        feedback_box += f"""
         {feedback["Additional Feedback"]}
-    """
-    
+        """
+
     feedback_box += "</div>"
+    return feedback_box
+
+conversation = st.session_state.get("conversation", [])
+set_labels(session=st.session_state.get("session_id"), scenario=st.session_state.get("scenario"))
+
+if not conversation:
+    st.warning("No conversation found. Please interact with the assistant first.")
+else:
+    # Results are stored by transcript hash, so a conversation is only graded once
+    # across reruns, page refreshes, redeploys and replicas sharing the database.
+    key = transcript_hash(conversation, RUBRIC_VERSION)
+    evaluation_result = evaluation_store.get(key)
+    speech_metrics = compute_speech_metrics(conversation)
+    if evaluation_result:
+        categories = list(evaluation_result["scores"])
+    else:
+        # Filler words can't be scored when the trainee said nothing
+        categories = [category for category in EVALUATION_CATEGORIES
+                      if category != FILLER_CATEGORY or speech_metrics["filler_score"] is not None]
+
+    render_speech_metrics(speech_metrics)
+    st.divider()
+
+    st.subheader("🌟 Evaluation Results")
+
+    score_slots = {}
+    for idx, criterion in enumerate(categories, start=1):
+        with st.container():
+            score_slots[criterion] = st.empty()
+        render_score_card(score_slots[criterion], idx, criterion,
+                          evaluation_result["scores"][criterion] if evaluation_result else None)
 
-    # Render everything in a single markdown call
-    st.markdown(feedback_box, unsafe_allow_html=True)
+    st.divider()
+    average_slot = st.empty()
+    feedback_slot = st.empty()
+
+    if evaluation_result is None:
+        # Stream the evaluation and fill in each score and feedback section as it arrives
+        evaluation_scores, feedback = {}, {}
+        for event in stream_evaluation(conversation):
+            kind = event[0]
+            if kind == "score":
+                _, criterion, score = event
+                evaluation_scores[criterion] = score
+                if criterion in score_slots:
+                    render_score_card(score_slots[criterion], categories.index(criterion) + 1, criterion, score)
+                if len(evaluation_scores) == len(categories):
+                    render_average(average_slot, evaluation_scores)
+            elif kind == "feedback":
+                _, section, value = event
+                feedback[section] = value
+                feedback_slot.markdown(build_feedback_box(feedback), unsafe_allow_html=True)
+            elif kind == "result":
+                evaluation_result = event[1]
+                evaluation_store.put(key, RUBRIC_VERSION, evaluation_result)
+            elif kind == "error":
+                st.error(f"Evaluation failed: {event[1]}")
+
+    if evaluation_result:
+        render_average(average_slot, evaluation_result["scores"])
+        # Render the whole feedback box in a single markdown call
+        feedback_slot.markdown(build_feedback_box(evaluation_result["feedback"]), unsafe_allow_html=True)
+
+        # Once per session, however often the page reruns
+        history_id = st.session_state.get("history_id")
+        if history_id and st.session_state.get("history_evaluated") != (history_id, key):
+            session_store.save_evaluation(history_id, evaluation_result["scores"], speech_metrics)
+            st.session_state.history_evaluated = (history_id, key)
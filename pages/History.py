@@ -0,0 +1,163 @@
+import datetime
+import html
+import streamlit as st
+from config import get_setting
+from session_store import session_store
+
+# Sessions fetched per "Load more", and turns per "More turns"
+HISTORY_PAGE_SIZE = get_setting("HISTORY_PAGE_SIZE", 20, cast=int)
+HISTORY_TURNS_PAGE_SIZE = get_setting("HISTORY_TURNS_PAGE_SIZE", 50, cast=int)
+
+# Set page config
+st.set_page_config(
+    page_title="Voice Role-Play Trainer",
+    page_icon="🎤",
+    initial_sidebar_state="expanded",
+    layout="wide"
+)
+
+# === Custom Styling ===
+st.markdown("""
+<style>
+    .main-header {
+        font-size: 2.5rem;
+        color: #0D47A1;
+        text-align: center;
+        margin-bottom: 1rem;
+        padding-bottom: 1rem;
+        border-bottom: 2px solid #e0e0e0;
+        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    }
+
+    .card {
+        background-color: #F4F6F8;
+        padding: 1.25rem;
+        border-radius: 12px;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.04);
+        margin-bottom: 0.6rem;
+    }
+
+    .sidebar-title {
+        text-align: center;
+        font-size: 1.6rem;
+        color: #1565C0;
+        padding-bottom: 1rem;
+        border-bottom: 1px solid #ccc;
+    }
+
+    .user-bubble, .assistant-bubble {
+        padding: 0.75rem 1rem;
+        border-radius: 12px;
+        margin: 0.4rem 0;
+        max-width: 80%;
+        font-family: 'Segoe UI', sans-serif;
+    }
+
+    .user-bubble {
+        background-color: #F0F9FF;
+        margin-left: auto;
+    }
+
+    .assistant-bubble {
+        background-color: #F9FBE7;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+for key, default in {
+    "history_filters": None,
+    "history_rows": [],
+    "history_done": False,
+    "history_turns": {}
+}.items():
+    if key not in st.session_state:
+        st.session_state[key] = default
+
+# === Sidebar ===
+with st.sidebar:
+    st.markdown('<h1 class="sidebar-title">Voice Role-Play Trainer</h1>', unsafe_allow_html=True)
+    st.image("https://img.icons8.com/fluency/96/000000/microphone.png", width=80)
+    st.markdown("---")
+    st.markdown("### Filters")
+    trainees = session_store.distinct_values("trainee")
+    default_trainee = st.session_state.get("trainee")
+    trainee = st.selectbox("Trainee", ["All trainees"] + trainees,
+                           index=trainees.index(default_trainee) + 1 if default_trainee in trainees else 0)
+    scenario = st.selectbox("Scenario", ["All scenarios"] + session_store.distinct_values("scenario"))
+    since = st.date_input("Since", value=None)
+
+    st.markdown("---")
+    if st.button("Back to Trainer"):
+        st.switch_page("Home.py")
+
+# === Main Content ===
+st.markdown('<h1 class="main-header">🗂️ Session History</h1>', unsafe_allow_html=True)
+
+filters = {
+    "trainee": None if trainee == "All trainees" else trainee,
+    "scenario": None if scenario == "All scenarios" else scenario,
+    "since": datetime.datetime.combine(since, datetime.time()).timestamp() if since else None
+}
+
+# Only the pages asked for are kept; changing a filter starts again from the newest session
+if filters != st.session_state.history_filters:
+    st.session_state.history_filters = filters
+    st.session_state.history_rows = []
+    st.session_state.history_done = False
+
+def load_sessions():
+    rows = st.session_state.history_rows
+    page = session_store.list_sessions(**filters, after=rows[-1] if rows else None, limit=HISTORY_PAGE_SIZE)
+    st.session_state.history_rows = rows + page
+    st.session_state.history_done = len(page) < HISTORY_PAGE_SIZE
+
+def load_turns(session):
+    turns = st.session_state.history_turns.setdefault(session["id"], [])
+    turns += session_store.get_turns(session["id"], offset=len(turns), limit=HISTORY_TURNS_PAGE_SIZE)
+
+def render_session(session):
+    started = datetime.datetime.fromtimestamp(session["started_at"]).strftime("%Y-%m-%d %H:%M")
+    details = [f"{session['turn_count']} turns"]
+    if session["duration_secs"]:
+        details.append(f"{session['duration_secs'] / 60:.1f} min")
+    if session["average_score"] is not None:
+        details.append(f"average score {session['average_score']:.2f}")
+    st.markdown(f"""
+    <div class="card">
+        <strong>{html.escape(session['scenario'])}</strong> · {html.escape(session['trainee'] or 'Unnamed trainee')}
+        <div style="color: #555;">{started} · {' · '.join(details)}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Turns are only read from the database once the transcript is opened
+    with st.expander("Transcript and scores"):
+        if session["scores"]:
+            st.markdown(" · ".join(f"{category}: {'⭐' * score}" for category, score in session["scores"].items()))
+        if session["id"] not in st.session_state.history_turns:
+            if st.button("Show transcript", key=f"show_{session['id']}"):
+                load_turns(session)
+                st.rerun()
+            return
+
+        turns = st.session_state.history_turns[session["id"]]
+        for turn in turns:
+            bubble = "user-bubble" if turn["role"] == "user" else "assistant-bubble"
+            icon = "👤" if turn["role"] == "user" else "🤖"
+            st.markdown(f'<div class="{bubble}"><strong>{icon}</strong> {html.escape(turn["content"])}</div>',
+                        unsafe_allow_html=True)
+        if len(turns) < session["turn_count"] and st.button("More turns", key=f"more_{session['id']}"):
+            load_turns(session)
+            st.rerun()
+
+if not st.session_state.history_rows and not st.session_state.history_done:
+    load_sessions()
+
+if not st.session_state.history_rows:
+    st.info("No sessions recorded yet.")
+
+for session in st.session_state.history_rows:
+    render_session(session)
+
+if not st.session_state.history_done and st.button("Load more sessions"):
+    load_sessions()
+    st.rerun()
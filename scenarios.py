@@ -0,0 +1,90 @@
+import glob
+import json
+import os
+import threading
+import unicodedata
+from config import get_setting
+from token_counter import count_tokens
+
+SCENARIO_DIR = get_setting("SCENARIO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenario_data"))
+DEFAULT_SCENARIO = "General Conversation"
+
+_registry = None
+_registry_lock = threading.Lock()
+
+class Scenario:
+    """
+    A role-play scenario: the persona prompt sent to the LLM and the UI details.
+
+    The persona is normalized once when it is loaded and then reused as the same
+    string on every request, so it forms a byte-stable prompt prefix.
+    """
+
+    def __init__(self, name, persona, intro=None, selectable=False, order=0):
+        self.name = name
+        self.persona = unicodedata.normalize("NFC", persona.strip())
+        self.intro = intro
+        self.selectable = selectable
+        self.order = order
+        self.prompt_tokens = count_tokens(self.persona)
+
+    def __repr__(self):
+        return f"Scenario({self.name!r}, prompt_tokens={self.prompt_tokens})"
+
+def load_scenarios(directory=SCENARIO_DIR):
+    """
+    Load every scenario defined in the JSON files of a directory.
+
+    Each file holds one scenario: {"name", "order", "selectable", "intro", "persona"},
+    where "persona" is a list of prompt lines.
+
+    Args:
+        directory (str): Directory containing the scenario files.
+
+    Returns:
+        dict: Scenarios by name, in display order.
+    """
+    scenarios = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            persona = data["persona"]
+            scenarios.append(Scenario(
+                data["name"],
+                "\n".join(line.strip() for line in persona) if isinstance(persona, list) else persona,
+                intro=data.get("intro"),
+                selectable=data.get("selectable", False),
+                order=data.get("order", 0)
+            ))
+        except Exception as e:
+            print(f"Error loading scenario file {path}: {e}")
+
+    scenarios.sort(key=lambda scenario: scenario.order)
+    return {scenario.name: scenario for scenario in scenarios}
+
+def get_registry():
+    """Return the scenario registry, loading it on first use."""
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            _registry = load_scenarios()
+        return _registry
+
+def get_scenario(name):
+    """
+    Look up a scenario, falling back to the default scenario.
+
+    Args:
+        name (str): Scenario name.
+
+    Returns:
+        Scenario: The scenario, or the default one if the name is unknown.
+    """
+    registry = get_registry()
+    return registry.get(name) or registry[DEFAULT_SCENARIO]
+
+def selectable_scenarios():
+    """Return the names of the scenarios offered in the scenario picker."""
+    return [name for name, scenario in get_registry().items() if scenario.selectable]
@@ -0,0 +1,311 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from config import get_setting
+from conversation_poller import backoff_delay
+
+SESSION_DB_PATH = get_setting(
+    "SESSION_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.sqlite3")
+)
+SESSION_HISTORY_ENABLED = get_setting("SESSION_HISTORY_ENABLED", True, cast=bool)
+# Upper bound for the delay between attempts to open the database for writing
+WRITER_RECONNECT_MAX_SECONDS = 60.0
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        trainee TEXT NOT NULL DEFAULT '',
+        scenario TEXT NOT NULL,
+        conversation_id TEXT,
+        started_at REAL NOT NULL,
+        ended_at REAL,
+        duration_secs REAL,
+        turn_count INTEGER NOT NULL DEFAULT 0,
+        average_score REAL,
+        scores TEXT,
+        speech_metrics TEXT
+    );
+    CREATE TABLE IF NOT EXISTS turns (
+        session_id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        time_in_call_secs REAL,
+        PRIMARY KEY (session_id, position)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS sessions_by_trainee ON sessions (trainee, started_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS sessions_by_scenario ON sessions (scenario, started_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS sessions_by_date ON sessions (started_at DESC, id DESC);
+"""
+
+SESSION_COLUMNS = ["id", "trainee", "scenario", "conversation_id", "started_at", "ended_at", "duration_secs",
+                   "turn_count", "average_score", "scores", "speech_metrics"]
+
+def _session_row(row):
+    session = dict(zip(SESSION_COLUMNS, row))
+    for column in ("scores", "speech_metrics"):
+        session[column] = json.loads(session[column]) if session[column] else None
+    return session
+
+class SessionStore:
+    """
+    SQLite history of training sessions: their turns, scenario, timings and scores.
+
+    The database runs in WAL mode with indexes on trainee, scenario and start
+    time, so history pages are read a page at a time while sessions are written.
+    Writes are queued and applied by one background thread in batched
+    transactions, so a Streamlit run never waits on the disk; each queued write
+    runs in its own savepoint, so one that fails doesn't undo the others. Reads
+    use a connection per thread.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH):
+        """
+        Args:
+            path (str): Location of the SQLite database file.
+        """
+        self.path = path
+        self._local = threading.local()
+        self._writes = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps the database consistent with NORMAL; only the last commits can be lost on power failure
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _enqueue(self, sql, rows):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+        self._writes.put((sql, rows))
+
+    def _connect_writer(self):
+        # Writes keep queueing while the database can't be opened, so keep trying rather than give up
+        attempt = 0
+        while True:
+            try:
+                connection = self._connect()
+                # Transactions and savepoints are managed explicitly below
+                connection.isolation_level = None
+                return connection
+            except (sqlite3.Error, OSError) as e:
+                delay = backoff_delay(attempt, maximum=WRITER_RECONNECT_MAX_SECONDS)
+                print(f"Error opening session history: {e}; retrying in {delay:.0f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def _write_loop(self):
+        connection = self._connect_writer()
+        while True:
+            batch = [self._writes.get()]
+            # Everything queued meanwhile goes into the same transaction
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                connection.execute("BEGIN")
+                for sql, rows in batch:
+                    if sql is None:
+                        continue
+                    connection.execute("SAVEPOINT write")
+                    try:
+                        connection.executemany(sql, rows)
+                    except sqlite3.Error as e:
+                        connection.execute("ROLLBACK TO write")
+                        print(f"Error writing session history, skipping one write: {e}")
+                    connection.execute("RELEASE write")
+                connection.execute("COMMIT")
+            except sqlite3.Error as e:
+                print(f"Error writing session history: {e}")
+                connection.close()
+                connection = self._connect_writer()
+
+            for sql, rows in batch:
+                if sql is None:
+                    rows.set()
+
+    def flush(self, timeout=5.0):
+        """
+        Wait until every write queued so far has been committed.
+
+        Returns:
+            bool: True if the writes were committed within the timeout.
+        """
+        done = threading.Event()
+        self._enqueue(None, done)
+        return done.wait(timeout)
+
+    def start_session(self, session_id, scenario, trainee="", started_at=None):
+        """
+        Record the start of a session.
+
+        Args:
+            session_id (str): Id of the session in the history.
+            scenario (str): Scenario being practised.
+            trainee (str): Name of the trainee.
+            started_at (float, optional): Unix start time. Defaults to now.
+        """
+        self._enqueue(
+            "INSERT OR IGNORE INTO sessions (id, trainee, scenario, started_at) VALUES (?, ?, ?, ?)",
+            [(session_id, trainee or "", scenario, started_at or time.time())]
+        )
+
+    def add_turns(self, session_id, first_position, turns):
+        """
+        Record turns of a session.
+
+        Args:
+            session_id (str): Id of the session in the history.
+            first_position (int): Position of the first turn in the conversation.
+            turns (list): Message dicts with "role", "content" and optionally "time_in_call_secs".
+        """
+        if not turns:
+            return
+        self._enqueue(
+            "INSERT OR REPLACE INTO turns (session_id, position, role, content, time_in_call_secs) VALUES (?, ?, ?, ?, ?)",
+            [(session_id, position, turn["role"], turn["content"], turn.get("time_in_call_secs"))
+             for position, turn in enumerate(turns, start=first_position)]
+        )
+        self._enqueue(
+            "UPDATE sessions SET turn_count = MAX(turn_count, ?) WHERE id = ?",
+            [(first_position + len(turns), session_id)]
+        )
+
+    def finish_session(self, session_id, conversation_id=None, duration_secs=None, ended_at=None):
+        """
+        Record the end of a session.
+
+        Args:
+            session_id (str): Id of the session in the history.
+            conversation_id (str, optional): The ElevenLabs conversation.
+            duration_secs (float, optional): Length of the call.
+            ended_at (float, optional): Unix end time. Defaults to now.
+        """
+        self._enqueue(
+            "UPDATE sessions SET conversation_id = COALESCE(?, conversation_id), duration_secs = COALESCE(?, duration_secs), "
+            "ended_at = ? WHERE id = ?",
+            [(conversation_id, duration_secs, ended_at or time.time(), session_id)]
+        )
+
+    def save_evaluation(self, session_id, scores, speech_metrics=None):
+        """
+        Record the evaluation of a session.
+
+        Args:
+            session_id (str): Id of the session in the history.
+            scores (dict): Category scores from the evaluation; unscored categories are left out.
+            speech_metrics (dict, optional): Result of `compute_speech_metrics`.
+        """
+        scores = {category: score for category, score in scores.items() if score is not None}
+        average = sum(scores.values()) / len(scores) if scores else None
+        self._enqueue(
+            "UPDATE sessions SET scores = ?, average_score = ?, speech_metrics = ? WHERE id = ?",
+            [(json.dumps(scores, ensure_ascii=False), average,
+              json.dumps(speech_metrics) if speech_metrics is not None else None, session_id)]
+        )
+
+    def list_sessions(self, trainee=None, scenario=None, since=None, until=None, after=None, limit=20):
+        """
+        Return one page of sessions, newest first, without their turns.
+
+        Pages are fetched by keyset: pass the last session of a page as `after`
+        to get the next one, which stays fast however deep the history goes.
+
+        Args:
+            trainee (str, optional): Only this trainee's sessions.
+            scenario (str, optional): Only sessions of this scenario.
+            since (float, optional): Only sessions started at or after this unix time.
+            until (float, optional): Only sessions started before this unix time.
+            after (dict, optional): Last session of the previous page.
+            limit (int): Page size.
+
+        Returns:
+            list: Session dicts (see SESSION_COLUMNS), with scores and speech_metrics decoded.
+        """
+        conditions, params = [], []
+        if trainee is not None:
+            conditions.append("trainee = ?")
+            params.append(trainee)
+        if scenario is not None:
+            conditions.append("scenario = ?")
+            params.append(scenario)
+        if since is not None:
+            conditions.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("started_at < ?")
+            params.append(until)
+        if after is not None:
+            conditions.append("(started_at, id) < (?, ?)")
+            params += [after["started_at"], after["id"]]
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            rows = self._connection().execute(
+                f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions {where} "
+                "ORDER BY started_at DESC, id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading session history: {e}")
+            return []
+        return [_session_row(row) for row in rows]
+
+    def get_turns(self, session_id, offset=0, limit=50):
+        """
+        Return a page of a session's turns.
+
+        Args:
+            session_id (str): Id of the session in the history.
+            offset (int): Position of the first turn to return.
+            limit (int): Maximum number of turns.
+
+        Returns:
+            list: Message dicts with "role", "content" and "time_in_call_secs".
+        """
+        try:
+            rows = self._connection().execute(
+                "SELECT role, content, time_in_call_secs FROM turns WHERE session_id = ? AND position >= ? "
+                "ORDER BY position LIMIT ?",
+                (session_id, offset, limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading session history: {e}")
+            return []
+        return [{"role": role, "content": content, "time_in_call_secs": seconds} for role, content, seconds in rows]
+
+    def distinct_values(self, column):
+        """Return the distinct trainees or scenarios in the history, for filters."""
+        if column not in ("trainee", "scenario"):
+            raise ValueError(f"Unknown column: {column}")
+        try:
+            rows = self._connection().execute(f"SELECT DISTINCT {column} FROM sessions ORDER BY {column}").fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading session history: {e}")
+            return []
+        return [row[0] for row in rows if row[0]]
+
+session_store = SessionStore()
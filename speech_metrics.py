@@ -0,0 +1,209 @@
+import re
+import numpy as np
+from config import get_setting
+
+# Filler words and phrases counted in the trainee's speech; "like" only counts when set off by commas
+FILLER_WORDS = ["um", "uh", "erm", "er", "ah", "hmm", "like", "you know", "i mean", "sort of", "kind of",
+                "basically", "actually", "literally"]
+# Filler rate (per 100 words) at or below which each score from 5 down to 2 is given; above the last is 1
+FILLER_SCORE_THRESHOLDS = [1.0, 2.5, 5.0, 8.0]
+# Questions starting with these invite the seller to talk rather than answer yes or no
+OPEN_QUESTION_STARTS = ("what", "how", "why", "tell me", "help me", "walk me", "describe", "which", "where", "when")
+# Skipped at the start of a question before looking for those, as in "So, what..." or "Okay, um, how..."
+DISCOURSE_MARKERS = ["so", "okay", "ok", "and", "but", "well", "right", "alright", "now", "then"]
+# Gaps between turns longer than this are not counted as speaking time
+SPEECH_MAX_TURN_SECONDS = get_setting("SPEECH_MAX_TURN_SECONDS", 60.0, cast=float)
+
+# Which code points belong to words; anything past the table (e.g. CJK) is treated as a word character
+_WORD_CHARS = np.array([chr(code).isalnum() or chr(code) in "_'\u2019" for code in range(0x3000)] + [True])
+_FILLER = re.compile(
+    r"(?<![\w'])(?:"
+    + "|".join(re.escape(word).replace(r"\ ", r"\s+") for word in FILLER_WORDS if word != "like")
+    + r"|(?<=,\s)like(?=\s*,)|like(?=,))(?![\w'])",
+    re.IGNORECASE
+)
+# Turns are joined with newlines, so a question never runs into the previous turn
+_QUESTION = re.compile(r"[^.!?\n]*\?+")
+_LEAD_IN = re.compile(
+    r"^(?:(?:" + "|".join(re.escape(word).replace(r"\ ", r"\s+") for word in DISCOURSE_MARKERS + FILLER_WORDS)
+    + r")(?![\w'])[\s,;:-]*)+",
+    re.IGNORECASE
+)
+_FILLER_INDEX = {word: index for index, word in enumerate(FILLER_WORDS)}
+
+def _find(pattern, joined, starts):
+    """Find a pattern in all turns with one pass over the joined text; return the matches and their turns."""
+    matches = list(pattern.finditer(joined))
+    ends = np.fromiter((match.end() - 1 for match in matches), dtype=np.int64, count=len(matches))
+    return matches, np.searchsorted(starts, ends, side="right") - 1
+
+def _word_counts(joined, starts, turns):
+    """Count the words of each turn by classifying every character of the joined text at once."""
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+    in_word = _WORD_CHARS[np.minimum(codes, len(_WORD_CHARS) - 1)]
+    word_starts = np.flatnonzero(in_word & ~np.concatenate(([False], in_word[:-1])))
+    return np.bincount(np.searchsorted(starts, word_starts, side="right") - 1, minlength=turns)
+
+def _speaking_seconds(message, next_time):
+    words = message.get("words")
+    if words:
+        # Whisper word timestamps: [(start, end), ...] or [{"start": ..., "end": ...}, ...]
+        spans = np.array([(w["start"], w["end"]) if isinstance(w, dict) else w for w in words], dtype=np.float64)
+        return float(np.sum(spans[:, 1] - spans[:, 0]))
+    start = message.get("time_in_call_secs")
+    if start is None or next_time is None:
+        return np.nan
+    # ElevenLabs only gives turn start times, so a turn lasts until the next one starts
+    seconds = next_time - start
+    return seconds if 0 < seconds <= SPEECH_MAX_TURN_SECONDS else np.nan
+
+def filler_score(filler_rate):
+    """
+    Score filler usage on the 1-5 rubric scale.
+
+    Args:
+        filler_rate (float): Fillers per 100 words spoken by the trainee.
+
+    Returns:
+        int: 5 for (almost) no fillers down to 1 for frequent fillers.
+    """
+    for score, limit in zip((5, 4, 3, 2), FILLER_SCORE_THRESHOLDS):
+        if filler_rate <= limit:
+            return score
+    return 1
+
+def compute_speech_metrics_batch(conversations):
+    """
+    Measure the trainee's speech in many conversations at once.
+
+    All turns are flattened into one text: words are counted by classifying its
+    characters as one array, fillers and questions are found with a single regex
+    pass each, and everything is summed per conversation with `numpy.bincount`,
+    which keeps thousands of transcripts fast.
+
+    The trainee's turns have role "user". Speaking time comes from Whisper word
+    timestamps when a message has "words", otherwise from the gap between the
+    "time_in_call_secs" of consecutive turns; without either, pace is None.
+
+    Args:
+        conversations (list): Conversations, each a list of message dicts with
+            "role" and "content" and optionally "time_in_call_secs" or "words".
+
+    Returns:
+        list: One dict of metrics per conversation (see `compute_speech_metrics`).
+    """
+    owners, is_trainee, texts, seconds = [], [], [], []
+    for index, conversation in enumerate(conversations):
+        messages = [message for message in conversation if message.get("content") and message["content"].strip()]
+        for position, message in enumerate(messages):
+            following = messages[position + 1] if position + 1 < len(messages) else {}
+            owners.append(index)
+            is_trainee.append(message["role"] == "user")
+            texts.append(message["content"])
+            seconds.append(_speaking_seconds(message, following.get("time_in_call_secs")))
+
+    conversation_count, turn_count = len(conversations), len(texts)
+    owners = np.array(owners, dtype=np.int64)
+    is_trainee = np.array(is_trainee, dtype=bool)
+    seconds = np.array(seconds, dtype=np.float64)
+
+    joined = "\n".join(texts)
+    starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]]) if texts else np.empty(0, dtype=np.int64)
+    words = _word_counts(joined, starts, turn_count)
+    filler_matches, filler_turns = _find(_FILLER, joined, starts)
+    fillers = np.bincount(filler_turns, minlength=turn_count)
+    question_matches, question_turns = _find(_QUESTION, joined, starts)
+    questions = np.bincount(question_turns, minlength=turn_count)
+    is_open = np.fromiter((_LEAD_IN.sub("", match.group().strip()).lower().startswith(OPEN_QUESTION_STARTS)
+                           for match in question_matches),
+                          dtype=bool, count=len(question_matches))
+    open_questions = np.bincount(question_turns[is_open], minlength=turn_count)
+
+    def per_conversation(values, mask=is_trainee):
+        return np.bincount(owners[mask], weights=values[mask], minlength=conversation_count)
+
+    trainee_words = per_conversation(words)
+    all_words = per_conversation(words, np.ones(turn_count, dtype=bool))
+    trainee_turns = per_conversation(np.ones(turn_count))
+    trainee_fillers = per_conversation(fillers)
+    trainee_questions = per_conversation(questions)
+    trainee_open = per_conversation(open_questions)
+    longest = np.zeros(conversation_count)
+    np.maximum.at(longest, owners[is_trainee], words[is_trainee])
+
+    timed = is_trainee & ~np.isnan(seconds)
+    timed_words = np.bincount(owners[timed], weights=words[timed], minlength=conversation_count)
+    timed_seconds = np.bincount(owners[timed], weights=seconds[timed], minlength=conversation_count)
+
+    # Filler breakdown: one row per conversation, one column per filler word
+    filler_words = np.fromiter((_FILLER_INDEX[" ".join(match.group().lower().split())] for match in filler_matches),
+                               dtype=np.int64, count=len(filler_matches))
+    counted = is_trainee[filler_turns]
+    breakdown = np.bincount(owners[filler_turns[counted]] * len(FILLER_WORDS) + filler_words[counted],
+                            minlength=conversation_count * len(FILLER_WORDS)).reshape(conversation_count, len(FILLER_WORDS))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        talk_ratio = trainee_words / all_words
+        filler_rate = trainee_fillers * 100 / trainee_words
+        average_turn = trainee_words / trainee_turns
+        pace = timed_words * 60 / timed_seconds
+
+    results = []
+    for index in range(conversation_count):
+        # With nothing said (or transcribed) there is no filler rate to score
+        rate = float(filler_rate[index]) if trainee_words[index] else None
+        results.append({
+            "trainee_words": int(trainee_words[index]),
+            "trainee_turns": int(trainee_turns[index]),
+            "talk_ratio": float(talk_ratio[index]) if all_words[index] else None,
+            "filler_count": int(trainee_fillers[index]),
+            "filler_rate": rate,
+            "filler_score": filler_score(rate) if rate is not None else None,
+            "fillers": {word: int(count) for word, count in zip(FILLER_WORDS, breakdown[index]) if count},
+            "questions": int(trainee_questions[index]),
+            "open_questions": int(trainee_open[index]),
+            "words_per_minute": float(pace[index]) if timed_seconds[index] > 0 else None,
+            "average_turn_words": float(average_turn[index]) if trainee_turns[index] else 0.0,
+            "longest_turn_words": int(longest[index])
+        })
+    return results
+
+def compute_speech_metrics(conversation):
+    """
+    Measure the trainee's speech in one conversation.
+
+    Args:
+        conversation (list): Message dicts; see `compute_speech_metrics_batch`.
+
+    Returns:
+        dict: trainee_words, trainee_turns, talk_ratio (trainee share of all words),
+            filler_count, filler_rate (per 100 words), filler_score (1-5; both None
+            when the trainee said nothing), fillers (count per filler word), questions,
+            open_questions, words_per_minute (None without timing), average_turn_words
+            and longest_turn_words.
+    """
+    return compute_speech_metrics_batch([conversation])[0]
+
+def format_speech_facts(metrics):
+    """
+    Summarize speech metrics as a few compact lines for the evaluation prompt.
+
+    Args:
+        metrics (dict): Result of `compute_speech_metrics`.
+
+    Returns:
+        str: One fact per line.
+    """
+    fillers = ", ".join(f"{word} x{count}" for word, count in metrics["fillers"].items()) or "none"
+    lines = [
+        f"Agent words: {metrics['trainee_words']} in {metrics['trainee_turns']} turns "
+        f"(avg {metrics['average_turn_words']:.0f}, longest {metrics['longest_turn_words']})",
+        f"Filler words: {metrics['filler_count']} ({metrics['filler_rate']:.1f} per 100 words; {fillers})"
+        if metrics["filler_rate"] is not None else "Filler words: not measured (the agent said nothing)",
+        f"Questions asked: {metrics['questions']} ({metrics['open_questions']} open-ended)"
+    ]
+    if metrics["talk_ratio"] is not None:
+        lines.append(f"Agent share of words spoken: {metrics['talk_ratio']:.0%}")
+    if metrics["words_per_minute"] is not None:
+        lines.append(f"Speaking pace: {metrics['words_per_minute']:.0f} words per minute")
+    return "\n".join(lines)
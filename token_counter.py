@@ -0,0 +1,54 @@
+import functools
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Fallback when tiktoken (or its encoding files) is unavailable: ~4 characters per token
+CHARS_PER_TOKEN = 4
+# Per-message overhead of the chat format (role, separators)
+TOKENS_PER_MESSAGE = 4
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"Error loading tiktoken encoding, estimating token counts instead: {e}")
+        return None
+
+def count_tokens(text, model="gpt-4o"):
+    """
+    Count the tokens of a piece of text.
+
+    Args:
+        text (str): Text to count.
+        model (str): Model whose tokenizer is used.
+
+    Returns:
+        int: Exact count with tiktoken, otherwise an estimate.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+def count_message_tokens(messages, model="gpt-4o"):
+    """
+    Count the prompt tokens of a list of chat messages.
+
+    Args:
+        messages (list): Message dicts with "role" and "content".
+        model (str): Model whose tokenizer is used.
+
+    Returns:
+        int: Token count including the per-message overhead.
+    """
+    return sum(count_tokens(message["content"], model) + TOKENS_PER_MESSAGE for message in messages) + 2
@@ -0,0 +1,165 @@
+from config import get_setting
+from conversation_memory import normalize_role
+from token_counter import count_tokens
+
+# Longest transcript sent for evaluation; longer sessions are trimmed or summarized in the middle
+EVALUATION_TRANSCRIPT_MAX_TOKENS = get_setting("EVALUATION_TRANSCRIPT_MAX_TOKENS", 12000, cast=int)
+# Opening turns always kept verbatim, since the greeting and rapport are graded
+EVALUATION_KEEP_OPENING_TURNS = get_setting("EVALUATION_KEEP_OPENING_TURNS", 4, cast=int)
+# Size of each chunk of middle turns folded into one summary line
+EVALUATION_SUMMARY_CHUNK_TOKENS = get_setting("EVALUATION_SUMMARY_CHUNK_TOKENS", 2000, cast=int)
+# Share of the budget set aside for the summary lines
+EVALUATION_SUMMARY_RATIO = get_setting("EVALUATION_SUMMARY_RATIO", 0.2, cast=float)
+
+# The trainee speaks as "user"; the persona's lines (stored as "assistant", or "system" in older sessions) are the seller's
+SPEAKER_TAGS = {"user": "AGENT", "assistant": "SELLER"}
+
+def transcript_lines(conversation):
+    """
+    Encode a conversation as one tagged line per turn.
+
+    Whitespace is collapsed, empty messages are skipped and consecutive messages
+    from the same speaker are joined into one line.
+
+    Args:
+        conversation (list): Message dicts with "role" and "content".
+
+    Returns:
+        list: Lines such as "SELLER: ..." and "AGENT: ...".
+    """
+    lines, speakers = [], []
+    for message in conversation:
+        content = " ".join((message.get("content") or "").split())
+        if not content:
+            continue
+        speaker = SPEAKER_TAGS[normalize_role(message["role"])]
+        if speakers and speakers[-1] == speaker:
+            lines[-1] += " " + content
+        else:
+            lines.append(f"{speaker}: {content}")
+            speakers.append(speaker)
+    return lines
+
+def format_transcript(conversation):
+    """Return the conversation as tagged lines joined by newlines."""
+    return "\n".join(transcript_lines(conversation))
+
+def _line_turns(lines):
+    # Back to message dicts, for the summarizer
+    return [{"role": "user" if line.startswith("AGENT:") else "assistant", "content": line.split(": ", 1)[1]}
+            for line in lines]
+
+def _truncate(line, max_tokens, model):
+    # Keep the speaker tag and as much of the start of the turn as fits, marked as cut;
+    # a bracketed summary line stays bracketed
+    tag, content = line.split(": ", 1) if ": " in line else ("", line)
+    closing = "]" if line.startswith("[") and content.endswith("]") else ""
+    content = content[:-1] if closing else content
+    low, high = 0, len(content)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(f"{tag}: {content[:middle]} …{closing}", model) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return f"{tag}: {content[:low].rstrip()} …{closing}"
+
+def _fit_lines(lines, max_tokens, model):
+    """Shorten the longest lines (opening turns and summaries included) until the transcript fits."""
+    lines, truncated = list(lines), set()
+    while True:
+        excess = count_tokens("\n".join(lines), model) - max_tokens
+        if excess <= 0 or not lines:
+            return lines, len(truncated)
+        tokens = [count_tokens(line, model) for line in lines]
+        # Cap the longest lines at a common length, so the cut is shared instead of emptying one line
+        target, low, high = sum(tokens) - excess, 1, max(tokens)
+        while low < high:
+            cap = (low + high + 1) // 2
+            if sum(min(count, cap) for count in tokens) <= target:
+                low = cap
+            else:
+                high = cap - 1
+
+        shortened = False
+        for index, count in enumerate(tokens):
+            if count > low:
+                line = _truncate(lines[index], low, model)
+                if count_tokens(line, model) < count:
+                    lines[index] = line
+                    truncated.add(index)
+                    shortened = True
+        if not shortened:
+            # Every line is down to its tag: the budget is too small for this many turns
+            return lines, len(truncated)
+
+def fit_transcript(conversation, max_tokens=EVALUATION_TRANSCRIPT_MAX_TOKENS, summarize=None, model="gpt-4o",
+                   strict=False):
+    """
+    Encode a conversation within a token budget.
+
+    A transcript over budget keeps its opening turns and as many of its latest
+    turns as fit. The turns in between are summarized chunk by chunk with
+    `summarize(summary, turns)` into one bracketed line (the chunk summaries are
+    folded together if they are still too long), or replaced by a note of how
+    many turns were left out if no summarizer is given (or it fails, unless
+    `strict` is set). If the result is still over budget, e.g. because of a very
+    long opening turn or summary, the longest lines are cut short until it fits.
+
+    Args:
+        conversation (list): Message dicts with "role" and "content".
+        max_tokens (int): Token budget for the transcript.
+        summarize (callable, optional): Summarizer, e.g. `openai_handler.summarize_turns`.
+        model (str): Model whose tokenizer is used for counting.
+        strict (bool): Raise summarizer errors instead of leaving the turns out,
+            for callers that retry them.
+
+    Returns:
+        tuple: (transcript, stats) where stats has tokens, full_tokens, omitted_turns,
+            summarized_turns and truncated_lines.
+    """
+    lines = transcript_lines(conversation)
+    line_tokens = [count_tokens(line, model) + 1 for line in lines]
+    full_tokens = sum(line_tokens)
+    stats = {"tokens": full_tokens, "full_tokens": full_tokens, "omitted_turns": 0, "summarized_turns": 0,
+             "truncated_lines": 0}
+    if full_tokens <= max_tokens:
+        return "\n".join(lines), stats
+
+    opening = min(EVALUATION_KEEP_OPENING_TURNS, len(lines))
+    reserve = int(max_tokens * EVALUATION_SUMMARY_RATIO) if summarize else 20
+    available = max_tokens - sum(line_tokens[:opening]) - reserve
+    latest = len(lines)
+    while latest > opening and available - line_tokens[latest - 1] >= 0:
+        latest -= 1
+        available -= line_tokens[latest]
+    middle = lines[opening:latest]
+
+    bridge = []
+    if summarize and middle:
+        try:
+            chunk, chunk_tokens = [], 0
+            for position, (line, tokens) in enumerate(zip(middle, line_tokens[opening:latest]), start=1):
+                chunk.append(line)
+                chunk_tokens += tokens
+                if chunk_tokens >= EVALUATION_SUMMARY_CHUNK_TOKENS or position == len(middle):
+                    bridge.append(" ".join(summarize("", _line_turns(chunk)).split()))
+                    chunk, chunk_tokens = [], 0
+            # Very long sessions: fold the chunk summaries into one
+            if len(bridge) > 1 and count_tokens(" ".join(bridge), model) > reserve:
+                bridge = [" ".join(summarize(" ".join(bridge), []).split())]
+            bridge = [f"[Summary of {len(middle)} turns: {' '.join(bridge)}]"]
+            stats["summarized_turns"] = len(middle)
+        except Exception as e:
+            if strict:
+                raise
+            print(f"Error summarizing transcript for evaluation: {e}")
+            bridge = []
+    if middle and not bridge:
+        bridge.append(f"[{len(middle)} turns omitted]")
+        stats["omitted_turns"] = len(middle)
+
+    kept, stats["truncated_lines"] = _fit_lines(lines[:opening] + bridge + lines[latest:], max_tokens, model)
+    transcript = "\n".join(kept)
+    stats["tokens"] = count_tokens(transcript, model)
+    return transcript, stats
@@ -0,0 +1,405 @@
+"""
+Whisper transcription service shared by every Streamlit process on a host.
+
+A fixed pool of worker processes each holds one loaded model. Sessions send
+utterances over a local socket; utterances that arrive together are decoded as
+one batch, and when the queue is full new requests are turned away at once
+instead of piling up.
+
+Usage:
+    python transcription_service.py --workers 4 --address 127.0.0.1:8765
+
+Then point the app at it:
+    WHISPER_SERVICE_ADDRESS=127.0.0.1:8765 streamlit run Home.py
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+import numpy as np
+from config import get_setting
+from conversation_poller import backoff_delay
+from metrics import record, record_queue_depth, span
+from whisper_calibration import calibrated_defaults
+
+# "host:port" or a Unix socket path; unset means transcribe inside the app process
+WHISPER_SERVICE_ADDRESS = get_setting("WHISPER_SERVICE_ADDRESS")
+# Shared secret for the service; requests are pickled, so there is no default and anyone with it can run code
+WHISPER_SERVICE_AUTHKEY = get_setting("WHISPER_SERVICE_AUTHKEY")
+# Upper bound for the delay between attempts to restart a worker that keeps failing to load
+WORKER_RESTART_MAX_SECONDS = 60.0
+WHISPER_SERVICE_WORKERS = get_setting("WHISPER_SERVICE_WORKERS", max(1, (os.cpu_count() or 1) // 4), cast=int)
+# Requests waiting beyond this are rejected so callers can back off
+WHISPER_SERVICE_QUEUE_SIZE = get_setting("WHISPER_SERVICE_QUEUE_SIZE", 32, cast=int)
+WHISPER_SERVICE_MAX_BATCH = get_setting("WHISPER_SERVICE_MAX_BATCH", 8, cast=int)
+# How long a free worker waits for more utterances to batch with the first one
+WHISPER_SERVICE_BATCH_WINDOW_MS = get_setting("WHISPER_SERVICE_BATCH_WINDOW_MS", 30, cast=int)
+WHISPER_SERVICE_TIMEOUT_SECONDS = get_setting("WHISPER_SERVICE_TIMEOUT_SECONDS", 60.0, cast=float)
+# Transcribe inside the app process when the service can't be reached, instead of asking the trainee to retry
+WHISPER_SERVICE_FALLBACK = get_setting("WHISPER_SERVICE_FALLBACK", False, cast=bool)
+
+# Whisper decodes at most 30 seconds at a time, so longer utterances are split into clips
+CLIP_SECONDS = 30
+
+class ServiceBusy(Exception):
+    """The transcription queue is full; retry later."""
+
+def parse_address(address):
+    """Turn "host:port" into a (host, port) tuple; anything else is a Unix socket path."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return (host, int(port))
+    return address
+
+def transcribe_batch(pipeline, utterances, sample_rate=16000, language=None):
+    """
+    Transcribe several utterances in one batched inference call.
+
+    The utterances are concatenated and each is passed as its own clip, so the
+    batched pipeline decodes them side by side; segments are then mapped back to
+    the utterance they came from.
+
+    Args:
+        pipeline (BatchedInferencePipeline): The worker's pipeline.
+        utterances (list): float32 mono arrays.
+        sample_rate (int): Sample rate of the audio.
+        language (str, optional): Language code, skipping detection.
+
+    Returns:
+        list: One transcript per utterance.
+    """
+    clips = []
+    owners = []
+    offset = 0
+    for index, utterance in enumerate(utterances):
+        for start in range(0, len(utterance), CLIP_SECONDS * sample_rate):
+            end = min(len(utterance), start + CLIP_SECONDS * sample_rate)
+            clips.append({"start": (offset + start) / sample_rate, "end": (offset + end) / sample_rate})
+            owners.append(index)
+        offset += len(utterance)
+
+    texts = [[] for _ in utterances]
+    if not clips:
+        return ["" for _ in utterances]
+
+    segments, _ = pipeline.transcribe(
+        np.concatenate(utterances),
+        language=language,
+        clip_timestamps=clips,
+        batch_size=len(clips),
+        without_timestamps=True
+    )
+    clip_starts = np.array([clip["start"] for clip in clips])
+    for segment in segments:
+        clip = max(0, int(np.searchsorted(clip_starts, segment.start + 1e-3, side="right")) - 1)
+        texts[owners[clip]].append(segment.text.strip())
+    return [" ".join(text).strip() for text in texts]
+
+def _worker_main(conn, model_size, device, compute_type, cpu_threads, language):
+    """Entry point of a worker process: load the model once, then decode batches."""
+    from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+    try:
+        start = time.perf_counter()
+        model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+        pipeline = BatchedInferencePipeline(model=model)
+        conn.send(("ready", time.perf_counter() - start))
+    except Exception as e:
+        conn.send(("failed", str(e)))
+        return
+
+    while True:
+        try:
+            batch = conn.recv()
+        except EOFError:
+            return
+        try:
+            utterances = [samples.astype(np.float32) / 32768.0 for samples in batch]
+            conn.send(("ok", transcribe_batch(pipeline, utterances, language=language)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+class _Job:
+    def __init__(self, samples):
+        self.samples = samples
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.status = None
+        self.value = None
+
+    def resolve(self, status, value):
+        self.status, self.value = status, value
+        self.done.set()
+
+class TranscriptionService:
+    """
+    Worker pool behind a multiprocessing.connection listener.
+
+    Each worker process is driven by a feeder thread that takes the oldest job,
+    gathers whatever else arrives within the batch window (up to the batch size)
+    and sends the batch to its worker. When all workers are busy, jobs wait in a
+    bounded queue, so the next free worker picks up a bigger batch; when the queue
+    is full, requests are answered "busy" immediately.
+    """
+
+    def __init__(self, address, workers=WHISPER_SERVICE_WORKERS, queue_size=WHISPER_SERVICE_QUEUE_SIZE,
+                 max_batch=WHISPER_SERVICE_MAX_BATCH, batch_window_ms=WHISPER_SERVICE_BATCH_WINDOW_MS,
+                 model_size="small", device="cpu", compute_type="int8", cpu_threads=0, language=None,
+                 authkey=WHISPER_SERVICE_AUTHKEY):
+        """
+        Args:
+            address (str): "host:port" or Unix socket path to listen on.
+            workers (int): Number of worker processes (one model each).
+            queue_size (int): Jobs that may wait before requests are rejected.
+            max_batch (int): Most utterances decoded in one batch.
+            batch_window_ms (int): Time a free worker waits to fill a batch.
+            model_size (str): Whisper model size.
+            device (str): Inference device.
+            compute_type (str): CTranslate2 compute type.
+            cpu_threads (int): Threads per worker; 0 splits the cores evenly.
+            language (str, optional): Language code passed to Whisper.
+            authkey (str): Shared secret clients must present.
+
+        Raises:
+            ValueError: If no authkey is set.
+        """
+        if not authkey:
+            raise ValueError("WHISPER_SERVICE_AUTHKEY must be set to run the transcription service")
+        self.address = parse_address(address)
+        self.workers = workers
+        self.max_batch = max_batch
+        self.batch_window = batch_window_ms / 1000
+        self.model_args = (model_size, device, compute_type,
+                           cpu_threads or max(1, (os.cpu_count() or 1) // workers), language)
+        self.authkey = authkey.encode("utf-8")
+
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._context = multiprocessing.get_context("spawn")
+        self._stats_lock = threading.Lock()
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "batches": 0, "batched_utterances": 0,
+                      "audio_seconds": 0.0}
+
+    def _spawn_worker(self):
+        parent, child = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child, *self.model_args), daemon=True)
+        process.start()
+        child.close()
+        try:
+            status, value = parent.recv()
+        except EOFError:
+            process.join(5)
+            status, value = "error", f"worker exited with code {process.exitcode}"
+        if status != "ready":
+            process.kill()
+            parent.close()
+            raise RuntimeError(f"Worker failed to load the model: {value}")
+        print(f"Transcription worker {process.pid} ready (model loaded in {value:.1f}s)")
+        return process, parent
+
+    def _respawn_worker(self):
+        # A feeder without a worker would leave every later request waiting, so keep trying
+        attempt = 0
+        while True:
+            try:
+                return self._spawn_worker()
+            except Exception as e:
+                delay = backoff_delay(attempt, maximum=WORKER_RESTART_MAX_SECONDS)
+                print(f"Error restarting transcription worker: {e}; retrying in {delay:.0f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def _next_batch(self):
+        batch = [self._jobs.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._jobs.get(timeout=remaining) if remaining > 0 else self._jobs.get_nowait())
+            except queue.Empty:
+                break
+        record_queue_depth("transcription", self._jobs.qsize())
+        return batch
+
+    def _feed(self, process, conn):
+        while True:
+            batch = self._next_batch()
+            now = time.perf_counter()
+            for job in batch:
+                record("transcription_queue_wait", now - job.enqueued_at)
+
+            try:
+                with span("transcription_batch", size=len(batch)):
+                    conn.send([job.samples for job in batch])
+                    status, value = conn.recv()
+            except (EOFError, OSError) as e:
+                print(f"Transcription worker {process.pid} died: {e}; restarting it")
+                for job in batch:
+                    job.resolve("error", "Transcription worker failed")
+                conn.close()
+                process, conn = self._respawn_worker()
+                continue
+
+            with self._stats_lock:
+                self.stats["batches"] += 1
+                self.stats["batched_utterances"] += len(batch)
+                self.stats["audio_seconds"] += sum(len(job.samples) for job in batch) / 16000
+                self.stats["completed" if status == "ok" else "failed"] += len(batch)
+            for index, job in enumerate(batch):
+                job.resolve(status, value[index] if status == "ok" else value)
+
+    def _handle(self, conn):
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == "stats":
+                    conn.send(("ok", self.get_stats()))
+                    continue
+
+                job = _Job(message[1])
+                try:
+                    self._jobs.put_nowait(job)
+                except queue.Full:
+                    with self._stats_lock:
+                        self.stats["rejected"] += 1
+                    conn.send(("busy", self._jobs.qsize()))
+                    continue
+                record_queue_depth("transcription", self._jobs.qsize())
+
+                job.done.wait()
+                conn.send((job.status, job.value))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def get_stats(self):
+        """
+        Report throughput and batching counters.
+
+        Returns:
+            dict: Counters plus queue_depth, workers and mean_batch_size.
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self._jobs.qsize()
+        stats["workers"] = self.workers
+        stats["mean_batch_size"] = stats["batched_utterances"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def serve_forever(self):
+        """Start the workers and accept client connections until interrupted."""
+        for _ in range(self.workers):
+            process, conn = self._spawn_worker()
+            threading.Thread(target=self._feed, args=(process, conn), daemon=True).start()
+
+        # A deep backlog so a burst of sessions connecting at once isn't refused
+        with Listener(self.address, backlog=64, authkey=self.authkey) as listener:
+            print(f"Transcription service listening on {self.address} with {self.workers} workers")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError) as e:
+                    # e.g. a client with the wrong authkey
+                    print(f"Rejected transcription client: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+_local = threading.local()
+
+def _drop_connection(conn):
+    conn.close()
+    _local.conn = None
+
+def _request(message, address, timeout):
+    """
+    Send a request over this thread's connection, reconnecting once if it was dropped.
+
+    A timeout is final: the service may still be working on the request, so
+    sending it again would only decode the same utterance twice.
+    """
+    for attempt in range(2):
+        conn = getattr(_local, "conn", None)
+        if conn is None:
+            if not WHISPER_SERVICE_AUTHKEY:
+                raise RuntimeError("WHISPER_SERVICE_AUTHKEY is not set")
+            conn = Client(parse_address(address), authkey=WHISPER_SERVICE_AUTHKEY.encode("utf-8"))
+            _local.conn = conn
+        try:
+            conn.send(message)
+            if conn.poll(timeout):
+                return conn.recv()
+        except (EOFError, OSError):
+            _drop_connection(conn)
+            if attempt == 1:
+                raise
+            continue
+        # A late reply would arrive on this connection, so it can't be reused
+        _drop_connection(conn)
+        raise TimeoutError(f"No reply from the transcription service within {timeout:.0f}s")
+
+def transcribe_remote(samples, address=WHISPER_SERVICE_ADDRESS, timeout=WHISPER_SERVICE_TIMEOUT_SECONDS):
+    """
+    Transcribe an utterance with the transcription service.
+
+    Args:
+        samples (numpy.ndarray): 16 kHz mono audio (int16, or float32 in -1..1).
+        address (str): Address of the service.
+        timeout (float): Seconds to wait for the transcript.
+
+    Returns:
+        str: The transcript.
+
+    Raises:
+        ServiceBusy: The service queue is full.
+        OSError, EOFError, TimeoutError: The service could not be reached.
+    """
+    if samples.dtype != np.int16:
+        samples = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+    status, value = _request(("transcribe", samples), address, timeout)
+    if status == "busy":
+        raise ServiceBusy(f"{value} utterances already waiting")
+    if status != "ok":
+        raise RuntimeError(value)
+    return value
+
+def service_stats(address=WHISPER_SERVICE_ADDRESS):
+    """Return the counters of a running transcription service."""
+    _, stats = _request(("stats",), address, WHISPER_SERVICE_TIMEOUT_SECONDS)
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the shared Whisper transcription service.")
+    parser.add_argument("--address", default=WHISPER_SERVICE_ADDRESS or "127.0.0.1:8765")
+    parser.add_argument("--workers", type=int, default=WHISPER_SERVICE_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=WHISPER_SERVICE_QUEUE_SIZE)
+    parser.add_argument("--max-batch", type=int, default=WHISPER_SERVICE_MAX_BATCH)
+    parser.add_argument("--batch-window-ms", type=int, default=WHISPER_SERVICE_BATCH_WINDOW_MS)
+    device = get_setting("WHISPER_DEVICE", "cpu")
+    # Threads are split between the workers, so only the model and compute type are calibrated defaults
+    calibrated = calibrated_defaults(device)
+    parser.add_argument("--model", default=get_setting("WHISPER_MODEL_SIZE", calibrated.get("model_size", "small")))
+    parser.add_argument("--device", default=device)
+    parser.add_argument("--compute-type", default=get_setting("WHISPER_COMPUTE_TYPE", calibrated.get("compute_type", "int8")))
+    parser.add_argument("--cpu-threads", type=int, default=0, help="Threads per worker (0: split cores evenly)")
+    parser.add_argument("--language", default=get_setting("WHISPER_LANGUAGE"))
+    args = parser.parse_args(argv)
+
+    if not WHISPER_SERVICE_AUTHKEY:
+        parser.error("WHISPER_SERVICE_AUTHKEY is not set")
+
+    service = TranscriptionService(
+        args.address, workers=args.workers, queue_size=args.queue_size, max_batch=args.max_batch,
+        batch_window_ms=args.batch_window_ms, model_size=args.model, device=args.device,
+        compute_type=args.compute_type, cpu_threads=args.cpu_threads, language=args.language
+    )
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
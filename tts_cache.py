@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from config import get_setting
+
+TTS_CACHE_DIR = get_setting("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "voice_roleplay_tts_cache"))
+TTS_CACHE_MAX_MB = get_setting("TTS_CACHE_MAX_MB", 200.0, cast=float)
+TTS_CACHE_ENABLED = get_setting("TTS_CACHE_ENABLED", True, cast=bool)
+# Temporary files older than this are left over from interrupted writes, not writes in progress
+TEMP_FILE_MAX_AGE_SECONDS = 3600
+
+class TTSCache:
+    """
+    Disk-backed cache of synthesized speech, keyed by a hash of the TTS request.
+
+    Each entry is one file named after its key. Reads bump the file's mtime, and
+    when the cache grows past its size cap the least recently used files are
+    deleted. Files are written to a temporary name and renamed into place, so
+    concurrent sessions (or processes) sharing the directory never see partial audio.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=int(TTS_CACHE_MAX_MB * 1024 * 1024)):
+        """
+        Args:
+            directory (str): Directory holding the cached audio files.
+            max_bytes (int): Size cap for the cache directory.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None
+
+    @staticmethod
+    def key(text, voice_id, model_id, output_format):
+        """Return the cache key for a TTS request."""
+        payload = json.dumps([text, voice_id, model_id, output_format], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.audio")
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".audio"):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _remove_stale_temp_files(self):
+        cutoff = time.time() - TEMP_FILE_MAX_AGE_SECONDS
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    try:
+                        if entry.name.endswith(".tmp") and entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+        except OSError as e:
+            print(f"Error cleaning up TTS cache: {e}")
+
+    def get(self, key):
+        """
+        Return the cached audio for a key, or None on a miss.
+
+        Args:
+            key (str): Key from `TTSCache.key`.
+
+        Returns:
+            bytes: The cached audio, or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """
+        Store audio under a key, evicting least recently used entries if needed.
+
+        Args:
+            key (str): Key from `TTSCache.key`.
+            data (bytes): The complete audio.
+        """
+        path, temp_path = self._path(key), None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            # An entry written again (e.g. by another session) replaces the old file rather than adding to it
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing TTS cache entry: {e}")
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            return
+
+        with self._lock:
+            if self._size is None:
+                # First write in this process: also clear what interrupted writes left behind
+                self._remove_stale_temp_files()
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Rescan so files written by other processes are counted too
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+    def tee(self, key, chunks):
+        """
+        Pass audio chunks through while collecting them, and cache the audio once complete.
+
+        Args:
+            key (str): Key from `TTSCache.key`.
+            chunks (iterable): Audio chunks, e.g. the ElevenLabs TTS generator.
+
+        Yields:
+            bytes: The same chunks.
+        """
+        collected = []
+        for chunk in chunks:
+            collected.append(chunk)
+            yield chunk
+        # Only reached when the source finished without an error
+        self.put(key, b"".join(collected))
+
+    def stats(self):
+        """
+        Report hit-rate counters and disk usage.
+
+        Returns:
+            dict: hits, misses, hit_rate, entries and bytes.
+        """
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries)
+            }
+
+tts_cache = TTSCache()
@@ -0,0 +1,240 @@
+import threading
+import numpy as np
+from config import get_setting
+
+VAD_ENABLED = get_setting("VAD_ENABLED", True, cast=bool)
+# "energy" (frame RMS, no model) or "silero" (the ONNX model bundled with faster-whisper)
+VAD_BACKEND = get_setting("VAD_BACKEND", "energy")
+VAD_FRAME_MS = get_setting("VAD_FRAME_MS", 30, cast=int)
+# Frames louder than this RMS (0-1), or this many times the noise floor, count as speech
+VAD_MIN_THRESHOLD = get_setting("VAD_MIN_THRESHOLD", 0.01, cast=float)
+VAD_NOISE_RATIO = get_setting("VAD_NOISE_RATIO", 3.0, cast=float)
+# Pauses longer than this split an utterance; shorter ones are kept
+VAD_MIN_SILENCE_MS = get_setting("VAD_MIN_SILENCE_MS", 600, cast=int)
+VAD_MIN_SPEECH_MS = get_setting("VAD_MIN_SPEECH_MS", 120, cast=int)
+# Audio kept around each speech segment so word edges aren't clipped
+VAD_PADDING_MS = get_setting("VAD_PADDING_MS", 150, cast=int)
+# Gap inserted between segments when they are joined for a single transcription
+VAD_JOIN_GAP_MS = get_setting("VAD_JOIN_GAP_MS", 200, cast=int)
+# Trailing silence after speech that ends a recording
+VAD_ENDPOINT_SILENCE_SECONDS = get_setting("VAD_ENDPOINT_SILENCE_SECONDS", 0.8, cast=float)
+
+_stats = {"utterances": 0, "input_seconds": 0.0, "speech_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+def _as_float(samples):
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / 32768.0
+    return samples.astype(np.float32, copy=False)
+
+def frame_rms(samples, frame_size):
+    """
+    Compute the RMS level of consecutive frames.
+
+    Args:
+        samples (numpy.ndarray): int16 or float32 mono audio.
+        frame_size (int): Samples per frame; a trailing partial frame is dropped.
+
+    Returns:
+        numpy.ndarray: One RMS value (0-1) per frame.
+    """
+    frames = len(samples) // frame_size
+    if frames == 0:
+        return np.empty(0, dtype=np.float32)
+    audio = _as_float(samples[:frames * frame_size]).reshape(frames, frame_size)
+    return np.sqrt(np.einsum("ij,ij->i", audio, audio) / frame_size)
+
+def _energy_segments(samples, sample_rate, min_silence_ms, min_speech_ms):
+    frame_size = int(sample_rate * VAD_FRAME_MS / 1000)
+    rms = frame_rms(samples, frame_size)
+    if rms.size == 0:
+        return []
+
+    # Adapt to the room: the quietest tenth of the frames is taken as the noise floor,
+    # capped at half the loud level for takes that are nearly all speech
+    noise_floor, loud = np.percentile(rms, [10, 90])
+    threshold = max(VAD_MIN_THRESHOLD, min(noise_floor * VAD_NOISE_RATIO, loud * 0.5))
+    speech = np.concatenate(([False], rms > threshold, [False]))
+    edges = np.flatnonzero(np.diff(speech.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    if starts.size == 0:
+        return []
+
+    # Merge runs separated by short pauses, then drop blips that are too short for speech
+    gaps = starts[1:] - ends[:-1]
+    keep = np.concatenate(([True], gaps * VAD_FRAME_MS >= min_silence_ms))
+    starts = starts[keep]
+    ends = np.concatenate((ends[:-1][keep[1:]], ends[-1:]))
+    long_enough = (ends - starts) * VAD_FRAME_MS >= min_speech_ms
+    return [(int(s) * frame_size, int(e) * frame_size) for s, e in zip(starts[long_enough], ends[long_enough])]
+
+def _silero_segments(samples, sample_rate, min_silence_ms, min_speech_ms):
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    options = VadOptions(min_silence_duration_ms=min_silence_ms, min_speech_duration_ms=min_speech_ms, speech_pad_ms=0)
+    timestamps = get_speech_timestamps(_as_float(samples), options, sampling_rate=sample_rate)
+    return [(item["start"], item["end"]) for item in timestamps]
+
+def speech_segments(samples, sample_rate=16000, min_silence_ms=VAD_MIN_SILENCE_MS,
+                    min_speech_ms=VAD_MIN_SPEECH_MS, padding_ms=VAD_PADDING_MS, backend=None):
+    """
+    Find the speech in a recording.
+
+    Args:
+        samples (numpy.ndarray): int16 or float32 mono audio.
+        sample_rate (int): Sample rate of the audio.
+        min_silence_ms (int): Pauses at least this long separate segments.
+        min_speech_ms (int): Shorter bursts are ignored.
+        padding_ms (int): Audio kept before and after each segment.
+        backend (str, optional): "energy" or "silero". Defaults to VAD_BACKEND.
+
+    Returns:
+        list: (start, end) sample offsets of each speech segment.
+    """
+    backend = backend or VAD_BACKEND
+    if backend == "silero":
+        segments = _silero_segments(samples, sample_rate, min_silence_ms, min_speech_ms)
+    else:
+        segments = _energy_segments(samples, sample_rate, min_silence_ms, min_speech_ms)
+
+    padding = int(sample_rate * padding_ms / 1000)
+    padded = []
+    for start, end in segments:
+        start, end = max(0, start - padding), min(len(samples), end + padding)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+def trim_silence(samples, sample_rate=16000):
+    """
+    Cut leading and trailing silence.
+
+    Returns:
+        numpy.ndarray: The audio from the first to the last speech, or an empty array.
+    """
+    segments = speech_segments(samples, sample_rate)
+    if not segments:
+        return samples[:0]
+    return samples[segments[0][0]:segments[-1][1]]
+
+def split_on_pauses(samples, sample_rate=16000):
+    """
+    Split a recording into its speech segments, dropping the pauses between them.
+
+    Returns:
+        list: numpy arrays (views into `samples`), one per segment.
+    """
+    return [samples[start:end] for start, end in speech_segments(samples, sample_rate)]
+
+def prepare_for_transcription(samples, sample_rate=16000):
+    """
+    Remove silence from a recording before it goes to Whisper.
+
+    Speech segments are joined with a short gap, so long pauses and silence at
+    either end are never decoded, and the saving is added to `get_vad_stats()`.
+
+    Args:
+        samples (numpy.ndarray): int16 or float32 mono audio.
+        sample_rate (int): Sample rate of the audio.
+
+    Returns:
+        tuple: (audio, stats) where audio has only the speech (empty if there was
+            none) and stats has input_seconds, speech_seconds and saved_seconds.
+    """
+    segments = split_on_pauses(samples, sample_rate)
+    if segments:
+        gap = np.zeros(int(sample_rate * VAD_JOIN_GAP_MS / 1000), dtype=samples.dtype)
+        pieces = [segments[0]]
+        for segment in segments[1:]:
+            pieces += [gap, segment]
+        audio = np.concatenate(pieces)
+    else:
+        audio = samples[:0]
+
+    input_seconds = len(samples) / sample_rate
+    speech_seconds = len(audio) / sample_rate
+    with _stats_lock:
+        _stats["utterances"] += 1
+        _stats["input_seconds"] += input_seconds
+        _stats["speech_seconds"] += speech_seconds
+
+    return audio, {
+        "input_seconds": input_seconds,
+        "speech_seconds": speech_seconds,
+        "saved_seconds": input_seconds - speech_seconds
+    }
+
+def get_vad_stats():
+    """
+    Report how much audio VAD kept away from Whisper in this process.
+
+    Returns:
+        dict: utterances, input_seconds, speech_seconds, saved_seconds and saved_ratio.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["saved_seconds"] = stats["input_seconds"] - stats["speech_seconds"]
+    stats["saved_ratio"] = stats["saved_seconds"] / stats["input_seconds"] if stats["input_seconds"] else 0.0
+    return stats
+
+class EndpointDetector:
+    """
+    Detects the end of an utterance in a live recording.
+
+    Feed it the recorder's chunks; it reports the end once speech has been heard
+    and then followed by `silence_seconds` of silence. The speech threshold adapts
+    to the quietest frames heard so far, which rises slowly while it is silent.
+    """
+
+    def __init__(self, sample_rate=16000, silence_seconds=VAD_ENDPOINT_SILENCE_SECONDS,
+                 min_speech_ms=VAD_MIN_SPEECH_MS):
+        """
+        Args:
+            sample_rate (int): Sample rate of the audio.
+            silence_seconds (float): Trailing silence that ends the utterance.
+            min_speech_ms (int): Speech needed before an end can be detected.
+        """
+        self.frame_size = int(sample_rate * VAD_FRAME_MS / 1000)
+        self.silence_frames = int(silence_seconds * 1000 / VAD_FRAME_MS)
+        self.min_speech_frames = max(1, int(min_speech_ms / VAD_FRAME_MS))
+        self._pending = np.empty(0, dtype=np.float32)
+        self._noise_floor = None
+        self._speech_frames = 0
+        self._silent_frames = 0
+
+    def feed(self, chunk):
+        """
+        Add a chunk of audio.
+
+        Args:
+            chunk (numpy.ndarray | bytes): int16 or float32 mono audio.
+
+        Returns:
+            bool: True once the utterance has ended.
+        """
+        if isinstance(chunk, (bytes, bytearray)):
+            chunk = np.frombuffer(chunk, dtype=np.int16)
+        self._pending = np.concatenate((self._pending, _as_float(chunk)))
+        usable = len(self._pending) // self.frame_size * self.frame_size
+        rms = frame_rms(self._pending[:usable], self.frame_size)
+        self._pending = self._pending[usable:]
+
+        for level in rms:
+            if self._noise_floor is None or level < self._noise_floor:
+                self._noise_floor = level
+            threshold = max(VAD_MIN_THRESHOLD, self._noise_floor * VAD_NOISE_RATIO)
+            if level > threshold:
+                self._speech_frames += 1
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+                # Track the noise floor slowly during silence
+                self._noise_floor = min(self._noise_floor * 0.95 + level * 0.05, self._noise_floor * 1.5)
+
+        return self.ended
+
+    @property
+    def ended(self):
+        return self._speech_frames >= self.min_speech_frames and self._silent_frames >= self.silence_frames
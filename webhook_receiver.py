@@ -0,0 +1,142 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from elevenlabs.core.unchecked_base_model import construct_type
+from elevenlabs.types import GetConversationResponseModel
+from config import get_setting
+from elevenlabs_handler import store_finished_conversation
+
+# Secret shown when the post-call webhook is created in the ElevenLabs dashboard
+WEBHOOK_SECRET = get_setting("ELEVENLABS_WEBHOOK_SECRET")
+WEBHOOK_HOST = get_setting("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = get_setting("WEBHOOK_PORT", 8503, cast=int)
+# Signed requests older than this are rejected as replays
+WEBHOOK_TOLERANCE_SECONDS = get_setting("WEBHOOK_TOLERANCE_SECONDS", 1800, cast=int)
+WEBHOOK_ENABLED = get_setting("WEBHOOK_ENABLED", bool(WEBHOOK_SECRET), cast=bool)
+# Larger bodies are refused before they are read; a long call's transcript is well under this
+WEBHOOK_MAX_BODY_BYTES = get_setting("WEBHOOK_MAX_BODY_BYTES", 10 * 1024 * 1024, cast=int)
+
+_server = None
+_server_lock = threading.Lock()
+
+def verify_signature(body, header, secret=WEBHOOK_SECRET, tolerance=WEBHOOK_TOLERANCE_SECONDS, now=None):
+    """
+    Check the `ElevenLabs-Signature` header of a webhook request.
+
+    The header has the form "t=<unix time>,v0=<hex digest>", where the digest is
+    the HMAC-SHA256 of "<unix time>.<raw body>" keyed with the webhook secret.
+
+    Args:
+        body (bytes): The raw request body.
+        header (str): Value of the ElevenLabs-Signature header.
+        secret (str): The webhook secret.
+        tolerance (int): Maximum age of the request in seconds.
+        now (float, optional): Current unix time, for testing.
+
+    Returns:
+        bool: True if the signature is valid and recent.
+    """
+    if not secret or not header:
+        return False
+
+    parts = dict(part.split("=", 1) for part in header.split(",") if "=" in part)
+    timestamp, signature = parts.get("t"), parts.get("v0")
+    if not timestamp or not signature or not timestamp.isdigit():
+        return False
+
+    if abs((now or time.time()) - int(timestamp)) > tolerance:
+        return False
+
+    expected = hmac.new(secret.encode("utf-8"), timestamp.encode("utf-8") + b"." + body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def parse_conversation(payload):
+    """
+    Convert a post-call transcription webhook into a conversation object.
+
+    Args:
+        payload (dict): The decoded webhook body.
+
+    Returns:
+        The conversation in the same shape as `get_conversation` returns, or None
+        if the payload is not a post-call transcription.
+    """
+    if payload.get("type") != "post_call_transcription":
+        return None
+
+    data = payload.get("data") or {}
+    if not data.get("conversation_id"):
+        return None
+    # The webhook is only sent once the call has ended
+    data.setdefault("status", "done")
+    return construct_type(type_=GetConversationResponseModel, object_=data)
+
+class _WebhookRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = self.headers.get("Content-Length", "")
+        if not length.isdigit():
+            # The body can't be delimited, so the connection can't be reused either
+            self.close_connection = True
+            self._reply(400)
+            return
+        if int(length) > WEBHOOK_MAX_BODY_BYTES:
+            self.close_connection = True
+            self._reply(413)
+            return
+        body = self.rfile.read(int(length))
+
+        if not verify_signature(body, self.headers.get("ElevenLabs-Signature")):
+            self._reply(401)
+            return
+
+        try:
+            conversation = parse_conversation(json.loads(body))
+        except (ValueError, AttributeError) as e:
+            print(f"Error parsing webhook payload: {e}")
+            self._reply(400)
+            return
+
+        if conversation is not None:
+            store_finished_conversation(conversation)
+        # Other event types (e.g. audio) are acknowledged so they aren't retried
+        self._reply(200)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_webhook_receiver():
+    """
+    Start the post-call webhook receiver in a daemon thread, once per process.
+
+    Returns:
+        bool: True if the receiver is running.
+    """
+    global _server
+
+    if not WEBHOOK_ENABLED:
+        return False
+    if not WEBHOOK_SECRET:
+        print("ELEVENLABS_WEBHOOK_SECRET is not set; webhooks are disabled")
+        return False
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((WEBHOOK_HOST, WEBHOOK_PORT), _WebhookRequestHandler)
+                _server.daemon_threads = True
+            except OSError as e:
+                print(f"Error starting webhook receiver: {e}")
+                return False
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"Webhook receiver listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}")
+        return True
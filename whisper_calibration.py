@@ -0,0 +1,330 @@
+"""
+Pick the Whisper model size, compute type and thread count for this host.
+
+Every candidate configuration transcribes a reference clip; the most accurate one
+whose real-time factor (decode time / audio length) meets WHISPER_TARGET_RTF is
+chosen and saved per host, so later starts load it without calibrating again.
+
+Usage:
+    python whisper_calibration.py --synthesize          # create the reference clip via ElevenLabs
+    python whisper_calibration.py --target-rtf 0.3
+    python whisper_calibration.py --clip my_take.wav --text "what was said" --models base,small
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import threading
+import time
+import wave
+import numpy as np
+from config import get_setting
+
+WHISPER_TARGET_RTF = get_setting("WHISPER_TARGET_RTF", 0.3, cast=float)
+WHISPER_CALIBRATION_FILE = get_setting("WHISPER_CALIBRATION_FILE", "whisper_calibration.json")
+# Run the calibration when the app starts if this host has no saved results
+WHISPER_CALIBRATE_ON_STARTUP = get_setting("WHISPER_CALIBRATE_ON_STARTUP", False, cast=bool)
+WHISPER_CALIBRATION_MODELS = get_setting("WHISPER_CALIBRATION_MODELS", "tiny,base,small,medium")
+WHISPER_CALIBRATION_COMPUTE_TYPES = get_setting("WHISPER_CALIBRATION_COMPUTE_TYPES", "int8,int8_float32,float32")
+# Comma-separated thread counts; empty tries a quarter, half and all of the cores
+WHISPER_CALIBRATION_THREADS = get_setting("WHISPER_CALIBRATION_THREADS", "")
+WHISPER_CALIBRATION_REPEATS = get_setting("WHISPER_CALIBRATION_REPEATS", 2, cast=int)
+
+REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration_data")
+REFERENCE_CLIP = os.path.join(REFERENCE_DIR, "reference.wav")
+REFERENCE_TEXT = os.path.join(REFERENCE_DIR, "reference.txt")
+SAMPLE_RATE = 16000
+
+# Smallest to largest; a larger model is assumed at least as accurate when error rates tie
+MODEL_ORDER = ["tiny", "base", "small", "medium", "large-v3"]
+
+_saved = {}
+_saved_lock = threading.Lock()
+
+def _split(value):
+    return [item.strip() for item in str(value).split(",") if item.strip()]
+
+def host_key(device="cpu"):
+    """Identify this host's hardware so results are reused only where they apply."""
+    return f"{platform.node()}/{platform.machine()}/{os.cpu_count()}cpu/{device}"
+
+def thread_candidates(cpu_count=None):
+    """Return the thread counts worth trying: a quarter, half and all of the cores."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return sorted({max(1, cpu_count // 4), max(1, cpu_count // 2), cpu_count})
+
+def _words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    """
+    Compute the word error rate of a transcription.
+
+    Args:
+        reference (str): The correct transcript.
+        hypothesis (str): The transcription to score.
+
+    Returns:
+        float: (substitutions + insertions + deletions) / reference words.
+    """
+    ref, hyp = _words(reference), _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Levenshtein distance over words, one row of the table at a time
+    previous = np.arange(len(hyp) + 1)
+    for i, word in enumerate(ref, 1):
+        current = np.empty_like(previous)
+        current[0] = i
+        substitutions = previous[:-1] + np.array([word != h for h in hyp], dtype=int)
+        for j in range(1, len(hyp) + 1):
+            current[j] = min(substitutions[j - 1], previous[j] + 1, current[j - 1] + 1)
+        previous = current
+    return float(previous[-1]) / len(ref)
+
+def load_reference_clip(path=REFERENCE_CLIP):
+    """Load a 16 kHz mono 16-bit WAV file as float32 samples."""
+    with wave.open(path, "rb") as wav:
+        if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError("The calibration clip must be a 16 kHz mono 16-bit WAV file")
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    return samples.astype(np.float32) / 32768.0
+
+def synthesize_reference_clip(path=REFERENCE_CLIP, text_path=REFERENCE_TEXT):
+    """Speak the reference text with ElevenLabs and save it as the calibration clip."""
+    from elevenlabs_handler import get_client
+
+    with open(text_path, "r", encoding="utf-8") as file:
+        text = file.read().strip()
+
+    audio = get_client().text_to_speech.convert(
+        text=text,
+        voice_id=get_setting("TTS_VOICE_ID", "JBFqnCBsd6RMkjVDRZzb"),
+        model_id=get_setting("TTS_MODEL_ID", "eleven_multilingual_v2"),
+        output_format=f"pcm_{SAMPLE_RATE}"
+    )
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(b"".join(audio))
+    return path
+
+def benchmark_config(samples, reference_text, model_size, device, compute_type, cpu_threads,
+                     repeats=WHISPER_CALIBRATION_REPEATS):
+    """
+    Load one configuration and time it on the reference clip.
+
+    Args:
+        samples (numpy.ndarray): float32 16 kHz mono audio.
+        reference_text (str): What is said in the clip.
+        model_size (str): Whisper model size.
+        device (str): Inference device.
+        compute_type (str): CTranslate2 compute type.
+        cpu_threads (int): Threads used by the model.
+        repeats (int): Timed transcriptions after a warm-up run; the median is kept.
+
+    Returns:
+        dict: The configuration with load_seconds, rtf, wer and text, or an error.
+    """
+    from faster_whisper import WhisperModel
+
+    result = {"model_size": model_size, "device": device, "compute_type": compute_type, "cpu_threads": cpu_threads}
+    try:
+        start = time.perf_counter()
+        model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+        result["load_seconds"] = time.perf_counter() - start
+
+        timings = []
+        for _ in range(max(1, repeats) + 1):
+            start = time.perf_counter()
+            segments, _ = model.transcribe(samples, beam_size=5)
+            text = " ".join(segment.text for segment in segments).strip()
+            timings.append(time.perf_counter() - start)
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+
+    # The first run includes one-off warm-up costs
+    result["rtf"] = float(np.median(timings[1:])) / (len(samples) / SAMPLE_RATE)
+    result["wer"] = word_error_rate(reference_text, text)
+    result["text"] = text
+    return result
+
+def choose_config(results, target_rtf=WHISPER_TARGET_RTF):
+    """
+    Pick the most accurate configuration that meets the real-time factor target.
+
+    Ties on error rate go to the larger model, then the faster configuration. If
+    nothing meets the target, the fastest configuration is returned.
+
+    Returns:
+        dict: The chosen result, or None if every configuration failed.
+    """
+    usable = [result for result in results if "error" not in result]
+    if not usable:
+        return None
+
+    fast_enough = [result for result in usable if result["rtf"] <= target_rtf]
+    if not fast_enough:
+        return min(usable, key=lambda result: result["rtf"])
+
+    def accuracy(result):
+        size = result["model_size"]
+        rank = MODEL_ORDER.index(size) if size in MODEL_ORDER else -1
+        return (round(result["wer"], 3), -rank, result["rtf"])
+    return min(fast_enough, key=accuracy)
+
+def calibrate(clip=REFERENCE_CLIP, reference_text=None, models=None, compute_types=None, threads=None,
+              device="cpu", target_rtf=WHISPER_TARGET_RTF, repeats=WHISPER_CALIBRATION_REPEATS,
+              path=WHISPER_CALIBRATION_FILE, save=True):
+    """
+    Benchmark every candidate configuration and save the choice for this host.
+
+    Model sizes are tried smallest first; once no configuration of a size meets
+    the target, larger sizes are skipped since they would only be slower.
+
+    Args:
+        clip (str): 16 kHz mono WAV file to transcribe.
+        reference_text (str, optional): What is said in the clip. Defaults to reference.txt.
+        models (list, optional): Model sizes to try. Defaults to WHISPER_CALIBRATION_MODELS.
+        compute_types (list, optional): Compute types to try. Defaults to WHISPER_CALIBRATION_COMPUTE_TYPES.
+        threads (list, optional): Thread counts to try. Defaults to WHISPER_CALIBRATION_THREADS.
+        device (str): Inference device.
+        target_rtf (float): Highest acceptable real-time factor.
+        repeats (int): Timed transcriptions per configuration.
+        path (str): File the results are saved to.
+        save (bool): If False, only return the results.
+
+    Returns:
+        dict: host, target_rtf, choice, results and calibrated_at.
+    """
+    if reference_text is None:
+        with open(REFERENCE_TEXT, "r", encoding="utf-8") as file:
+            reference_text = file.read().strip()
+    samples = load_reference_clip(clip)
+    models = models or _split(WHISPER_CALIBRATION_MODELS)
+    compute_types = compute_types or _split(WHISPER_CALIBRATION_COMPUTE_TYPES)
+    threads = threads or [int(count) for count in _split(WHISPER_CALIBRATION_THREADS)] or thread_candidates()
+
+    results = []
+    for model_size in sorted(models, key=lambda size: MODEL_ORDER.index(size) if size in MODEL_ORDER else len(MODEL_ORDER)):
+        size_results = []
+        for compute_type in compute_types:
+            for cpu_threads in threads:
+                result = benchmark_config(samples, reference_text, model_size, device, compute_type, cpu_threads, repeats)
+                if "error" in result:
+                    print(f"{model_size} {compute_type} x{cpu_threads}: {result['error']}")
+                else:
+                    print(f"{model_size} {compute_type} x{cpu_threads}: RTF {result['rtf']:.3f}, WER {result['wer']:.1%}")
+                size_results.append(result)
+        results += size_results
+        loaded = [result for result in size_results if "error" not in result]
+        if loaded and not any(result["rtf"] <= target_rtf for result in loaded):
+            break
+
+    calibration = {
+        "host": host_key(device),
+        "target_rtf": target_rtf,
+        "choice": choose_config(results, target_rtf),
+        "results": results,
+        "calibrated_at": time.time()
+    }
+    if save and calibration["choice"] is not None:
+        save_calibration(calibration, path)
+    return calibration
+
+def save_calibration(calibration, path=WHISPER_CALIBRATION_FILE):
+    """Store a host's calibration next to those of other hosts in the results file."""
+    with _saved_lock:
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                hosts = json.load(file)
+        except (OSError, ValueError):
+            hosts = {}
+        hosts[calibration["host"]] = calibration
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(hosts, file, indent=2)
+        _saved[(path, calibration["host"])] = calibration
+
+def load_calibration(device="cpu", path=WHISPER_CALIBRATION_FILE):
+    """
+    Return this host's saved calibration.
+
+    Returns:
+        dict: The calibration from `calibrate()`, or None if this host has none.
+    """
+    key = (path, host_key(device))
+    with _saved_lock:
+        if key not in _saved:
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    _saved[key] = json.load(file).get(key[1])
+            except (OSError, ValueError):
+                _saved[key] = None
+        return _saved[key]
+
+def calibrated_defaults(device="cpu", path=WHISPER_CALIBRATION_FILE):
+    """
+    Return the saved choice for this host as model settings.
+
+    Returns:
+        dict: model_size, compute_type and cpu_threads, or an empty dict if uncalibrated.
+    """
+    calibration = load_calibration(device, path)
+    choice = (calibration or {}).get("choice")
+    if not choice:
+        return {}
+    return {key: choice[key] for key in ("model_size", "compute_type", "cpu_threads")}
+
+def ensure_calibrated(device="cpu", path=WHISPER_CALIBRATION_FILE):
+    """
+    Calibrate at startup when WHISPER_CALIBRATE_ON_STARTUP is set and this host has no results.
+
+    Returns:
+        dict: The calibrated defaults (empty if there are none).
+    """
+    if WHISPER_CALIBRATE_ON_STARTUP and load_calibration(device, path) is None:
+        if not os.path.exists(REFERENCE_CLIP):
+            print(f"Skipping Whisper calibration: no reference clip at {REFERENCE_CLIP}")
+        else:
+            print("Calibrating Whisper for this host; this can take a few minutes")
+            try:
+                calibrate(device=device, path=path)
+            except Exception as e:
+                print(f"Error calibrating Whisper: {e}")
+    return calibrated_defaults(device, path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Choose the Whisper configuration for this host.")
+    parser.add_argument("--clip", default=REFERENCE_CLIP, help="16 kHz mono WAV clip to transcribe")
+    parser.add_argument("--text", help="What is said in the clip (default: calibration_data/reference.txt)")
+    parser.add_argument("--synthesize", action="store_true", help="Create the reference clip with ElevenLabs first")
+    parser.add_argument("--models", default=WHISPER_CALIBRATION_MODELS)
+    parser.add_argument("--compute-types", default=WHISPER_CALIBRATION_COMPUTE_TYPES)
+    parser.add_argument("--threads", default=WHISPER_CALIBRATION_THREADS, help="Comma-separated thread counts")
+    parser.add_argument("--device", default=get_setting("WHISPER_DEVICE", "cpu"))
+    parser.add_argument("--target-rtf", type=float, default=WHISPER_TARGET_RTF)
+    parser.add_argument("--repeats", type=int, default=WHISPER_CALIBRATION_REPEATS)
+    parser.add_argument("--output", default=WHISPER_CALIBRATION_FILE)
+    args = parser.parse_args(argv)
+
+    if args.synthesize:
+        print(f"Wrote {synthesize_reference_clip(args.clip)}")
+
+    calibration = calibrate(
+        clip=args.clip, reference_text=args.text, models=_split(args.models),
+        compute_types=_split(args.compute_types), threads=[int(count) for count in _split(args.threads)],
+        device=args.device, target_rtf=args.target_rtf, repeats=args.repeats, path=args.output
+    )
+    choice = calibration["choice"]
+    if choice is None:
+        raise SystemExit("No configuration could be loaded")
+    met = "meets" if choice["rtf"] <= args.target_rtf else "misses"
+    print(f"\nChose {choice['model_size']} {choice['compute_type']} with {choice['cpu_threads']} threads: "
+          f"RTF {choice['rtf']:.3f} ({met} the {args.target_rtf} target), WER {choice['wer']:.1%}")
+    print(f"Saved to {args.output} for {calibration['host']}")
+
+if __name__ == "__main__":
+    main()